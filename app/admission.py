@@ -0,0 +1,298 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+from app.metrics import LatencyStats
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+# LLM-backed requests running at once (batching merges their generations)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "4"))
+# Slots only chat turns may use, so they never wait behind long plans
+ADMISSION_CHAT_RESERVED_SLOTS = int(os.getenv("ADMISSION_CHAT_RESERVED_SLOTS", "1"))
+# Requests waiting for a slot, on top of the running ones
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+# Longest a request of each class may wait for a slot (seconds); a request
+# whose estimated wait is longer is rejected up front
+ADMISSION_MAX_WAIT = {
+    "chat": float(os.getenv("ADMISSION_CHAT_MAX_WAIT", "15")),
+    "clarification": float(os.getenv("ADMISSION_CLARIFICATION_MAX_WAIT", "30")),
+    "plan": float(os.getenv("ADMISSION_PLAN_MAX_WAIT", "300")),
+    "summary": float(os.getenv("ADMISSION_SUMMARY_MAX_WAIT", "120")),
+}
+# Lower runs first; a waiting request moves up one level per ADMISSION_AGING_SECONDS
+ADMISSION_PRIORITY = {"chat": 0, "clarification": 1, "plan": 2, "summary": 3}
+ADMISSION_AGING_SECONDS = float(os.getenv("ADMISSION_AGING_SECONDS", "30"))
+
+# Service-time guesses (seconds) until requests of the class have been measured
+INITIAL_SERVICE_SECONDS = {"chat": 10.0, "clarification": 20.0, "plan": 120.0, "summary": 10.0}
+# Weight of the newest measurement in the moving service-time average
+SERVICE_TIME_SMOOTHING = 0.2
+
+tracing.registry.describe("admission_rejections_total", "LLM requests rejected by admission control, by class and reason.")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; served as 429 with Retry-After."""
+
+    def __init__(self, kind: str, reason: str, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.kind = kind
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Ticket:
+    """
+        description:
+            One admitted request. Reserved when the request arrives, queued
+            by `acquire()` and running once a slot is granted; `release()`
+            frees the slot and the session (idempotent). Use it as
+            `async with admission.admit(...)`, or reserve in the request
+            and acquire in a background job.
+
+            A request ticket claims its session on arrival. A background
+            ticket claims it only when it gets its slot, so the session's
+            chat keeps working while a plan job retrieves context (other
+            classes are still turned away); the plan waits for a running
+            chat turn to finish.
+    """
+
+    def __init__(self, controller: "AdmissionController", kind: str, session_id: Optional[str], background: bool):
+        self.controller = controller
+        self.kind = kind
+        self.session_id = session_id
+        self.background = background
+        self.priority = ADMISSION_PRIORITY[kind]
+        self.seq = next(controller._seq)
+        self.reserved_at = time.monotonic()
+        self.queued_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.state = "reserved"
+        self._granted: Optional[asyncio.Future] = None
+
+    async def acquire(self):
+        """Wait for a slot; on rejection or cancellation the reservation is released."""
+        try:
+            await self.controller._acquire(self)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        self.controller._release(self)
+
+    async def __aenter__(self) -> "Ticket":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """
+        description:
+            Admission control in front of the LLM: at most `max_concurrency`
+            LLM-backed requests run, `queue_size` more may wait, and each
+            session has at most one generation in flight.
+
+            Waiting requests are served by class priority (chat turns before
+            clarification questions before full plans before chat-history
+            summaries), aged so that the later classes are not starved, and `chat_reserved_slots` of the slots only
+            ever run chat turns: a plan holds its slot for minutes, so
+            priority alone would not keep chat latency short. A request is rejected on arrival when the queue
+            is full or when its estimated wait - the remaining work ahead of
+            it, from a moving average of each class's service time, divided
+            by the concurrency - exceeds its class's ADMISSION_MAX_WAIT, and
+            again if it is still waiting at that deadline. Rejections carry a
+            Retry-After estimate. Background tickets (plan jobs and summary
+            folds, which no client waits on) are only checked on arrival.
+
+            All methods run on the event loop; no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: Dict[str, float] = ADMISSION_MAX_WAIT,
+        aging_seconds: float = ADMISSION_AGING_SECONDS,
+        chat_reserved_slots: int = ADMISSION_CHAT_RESERVED_SLOTS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        # Slots open to every class; at least one, so plans can always run
+        self.shared_slots = max(1, self.max_concurrency - max(0, chat_reserved_slots))
+        self.queue_size = max(0, queue_size)
+        self.max_wait = dict(max_wait)
+        self.aging_seconds = max(aging_seconds, 1e-3)
+        self.service_seconds = dict(INITIAL_SERVICE_SECONDS)
+        self._seq = count()
+        self._sessions: Dict[str, Ticket] = {}
+        self._pending: List[Ticket] = []  # reserved or queued
+        self._running: List[Ticket] = []
+
+        # Metrics
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self.wait_time = {kind: LatencyStats() for kind in ADMISSION_PRIORITY}
+
+    # ------------------------------------------------------------------
+    # 🔹 ADMISSION
+    # ------------------------------------------------------------------
+    def admit(self, kind: str, session_id: Optional[str] = None, background: bool = False) -> Ticket:
+        """Reserve a place for a request of class `kind`, or raise AdmissionRejected."""
+        if kind not in ADMISSION_PRIORITY:
+            raise ValueError(f"Unknown admission class '{kind}'")
+
+        active = self._sessions.get(session_id) if session_id else None
+        if active is None and session_id and kind != "chat":
+            # A background ticket waiting for its slot leaves the session to chat only
+            active = next((t for t in self._pending if t.background and t.session_id == session_id), None)
+        if active is not None:
+            self._reject(
+                kind, "session_busy",
+                f"A {active.kind} request is already in progress for this session",
+                self._remaining(active),
+            )
+
+        ticket = Ticket(self, kind, session_id, background)
+        wait = self.estimate_wait(ticket.priority)
+        if len(self._pending) >= self.queue_size and len(self._running) + len(self._pending) >= self.max_concurrency:
+            self._reject(kind, "queue_full", f"Server is busy ({len(self._pending)} requests waiting)", wait)
+        if wait > self.max_wait[kind]:
+            self._reject(
+                kind, "overloaded",
+                f"Server is busy (estimated wait {wait:.0f}s exceeds {self.max_wait[kind]:.0f}s)",
+                wait - self.max_wait[kind],
+            )
+
+        self._pending.append(ticket)
+        if session_id and not background:
+            self._sessions[session_id] = ticket
+        return ticket
+
+    def estimate_wait(self, priority: int) -> float:
+        """Seconds until a new request of this priority would get a slot."""
+        ahead = [t for t in self._pending if t.priority <= priority]
+        if priority == 0:
+            running, slots = self._running, self.max_concurrency
+        else:
+            running, slots = [t for t in self._running if t.priority > 0], self.shared_slots
+        if len(running) + len(ahead) < slots:
+            return 0.0
+        work = sum(self._remaining(t) for t in running)
+        work += sum(self.service_seconds[t.kind] for t in ahead)
+        return work / slots
+
+    def _remaining(self, ticket: Ticket) -> float:
+        estimate = self.service_seconds[ticket.kind]
+        if ticket.started_at is None:
+            return estimate
+        return max(estimate - (time.monotonic() - ticket.started_at), 0.0)
+
+    def _reject(self, kind: str, reason: str, detail: str, retry_after: float):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        tracing.registry.inc("admission_rejections_total", kind=kind, reason=reason)
+        raise AdmissionRejected(kind, reason, detail, retry_after)
+
+    # ------------------------------------------------------------------
+    # 🔹 SLOTS
+    # ------------------------------------------------------------------
+    async def _acquire(self, ticket: Ticket):
+        if ticket.state != "reserved":
+            return
+        ticket.state = "queued"
+        ticket.queued_at = time.monotonic()
+        ticket._granted = asyncio.get_running_loop().create_future()
+        self._dispatch()
+
+        with tracing.span("admission.wait", kind=ticket.kind):
+            if not ticket._granted.done():
+                timeout = None
+                if not ticket.background:
+                    timeout = max(ticket.reserved_at + self.max_wait[ticket.kind] - time.monotonic(), 0.0)
+                # shield: a timeout or disconnect must not cancel a slot granted meanwhile
+                done, _ = await asyncio.wait({asyncio.shield(ticket._granted)}, timeout=timeout)
+                if not done:
+                    self._release(ticket)
+                    self._reject(
+                        ticket.kind, "timeout",
+                        f"Timed out after {self.max_wait[ticket.kind]:.0f}s waiting for the model",
+                        self.estimate_wait(ticket.priority),
+                    )
+        self.wait_time[ticket.kind].observe(ticket.started_at - ticket.queued_at)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while len(self._running) < self.max_concurrency:
+            shared_free = sum(t.priority > 0 for t in self._running) < self.shared_slots
+            queued = [
+                t for t in self._pending
+                if t.state == "queued" and (t.priority == 0 or shared_free) and self._session_free(t)
+            ]
+            if not queued:
+                return
+            ticket = min(queued, key=lambda t: (t.priority - (now - t.queued_at) / self.aging_seconds, t.seq))
+            self._pending.remove(ticket)
+            self._running.append(ticket)
+            ticket.state = "running"
+            ticket.started_at = now
+            if ticket.session_id:
+                self._sessions[ticket.session_id] = ticket
+            self.admitted += 1
+            ticket._granted.set_result(True)
+
+    def _session_free(self, ticket: Ticket) -> bool:
+        holder = self._sessions.get(ticket.session_id) if ticket.session_id else None
+        return holder is None or holder is ticket
+
+    def _release(self, ticket: Ticket):
+        if ticket.state == "done":
+            return
+        if ticket.state == "running":
+            self._running.remove(ticket)
+            seconds = time.monotonic() - ticket.started_at
+            previous = self.service_seconds[ticket.kind]
+            self.service_seconds[ticket.kind] = previous + SERVICE_TIME_SMOOTHING * (seconds - previous)
+        else:
+            self._pending.remove(ticket)
+        ticket.state = "done"
+        if ticket.session_id and self._sessions.get(ticket.session_id) is ticket:
+            del self._sessions[ticket.session_id]
+        self._dispatch()
+
+    # ------------------------------------------------------------------
+    # 🔹 METRICS
+    # ------------------------------------------------------------------
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "shared_slots": self.shared_slots,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_seconds": {k: round(v, 3) for k, v in self.service_seconds.items()},
+            "estimated_wait_seconds": {
+                kind: round(self.estimate_wait(priority), 3) for kind, priority in ADMISSION_PRIORITY.items()
+            },
+            "wait_time_seconds": {kind: stats.snapshot() for kind, stats in self.wait_time.items()},
+        }
+
+
+admission = AdmissionController()
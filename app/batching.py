@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from app.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+        description:
+            Collects items submitted concurrently from many coroutines and hands
+            them to `process_batch` as one list. A batch is flushed as soon as it
+            reaches `max_batch_size` or `max_wait_ms` after its first item arrived.
+
+            Batches are processed one at a time; items arriving while a batch is
+            running queue up and form the next batch, so the worker keeps admitting
+            new work as soon as the previous batch finishes.
+
+            `process_batch` must return one result per item, in order. A result
+            that is an exception instance is raised to that item's caller only.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        name: str = "batcher",
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.batch_size = LatencyStats()  # reused as a rolling distribution of sizes
+        self.batch_time = LatencyStats()
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Anything already waiting joins without extra delay.
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            live = [(item, future) for item, future in batch if not future.done()]
+            if not live:
+                continue
+
+            started = self._loop.time()
+            try:
+                results = await self.process_batch([item for item, _ in live])
+                if len(results) != len(live):
+                    raise RuntimeError(
+                        f"{self.name}: process_batch returned {len(results)} results for {len(live)} items"
+                    )
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(live)} failed: {e}")
+                results = [e] * len(live)
+
+            self.batches += 1
+            self.items += len(live)
+            self.batch_size.observe(len(live))
+            self.batch_time.observe(self._loop.time() - started)
+
+            for (_, future), result in zip(live, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def metrics(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "batch_size": self.batch_size.snapshot(),
+            "batch_time_seconds": self.batch_time.snapshot(),
+        }
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+from app.admission import admission, AdmissionRejected
+from app.jobs import JobRunner
+from app.llm_service import llm_client
+from app.session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_MIN_TURNS = int(os.getenv("CHAT_HISTORY_MIN_TURNS", "4"))
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "8"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1536"))
+
+
+class ChatHistoryManager:
+    """
+        description:
+            Bounds what each per-topic chat turn sends to the model.
+
+            The stored history holds only messages not yet summarized. Once it
+            grows past `max_turns` user/assistant turns, a background job folds
+            everything except the last `min_turns` turns into the topic's
+            running summary and deletes those messages from the store. A fold
+            is an LLM call, so it takes a lowest-priority admission ticket; a
+            fold turned away under load is skipped, and the next turn
+            schedules it again.
+
+            The prompt gets the summary (in the system prompt) plus the recent
+            turns verbatim, trimmed oldest first to `token_budget` tokens. The
+            window only shifts when a fold completes, not on every turn, so the
+            chat's cached KV prefix stays valid in between.
+    """
+
+    def __init__(
+        self,
+        store,
+        llm,
+        min_turns: int = CHAT_HISTORY_MIN_TURNS,
+        max_turns: int = CHAT_HISTORY_MAX_TURNS,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+    ):
+        self.store = store
+        self.llm = llm
+        self.min_turns = max(1, min_turns)
+        self.max_turns = max(self.min_turns, max_turns)
+        self.token_budget = token_budget
+        self.summaries = JobRunner(max_concurrency=1, name="chat-summaries")
+
+        # Metrics
+        self.folded_messages = 0
+        self.trimmed_messages = 0
+
+    async def window(self, session_id: str, topic: str) -> Tuple[List[Dict[str, str]], str]:
+        """
+            returns:
+                (recent messages to send verbatim, running summary of older ones)
+        """
+        history = await asyncio.to_thread(self.store.get_chat_history, session_id, topic)
+        summary = await asyncio.to_thread(self.store.get_chat_summary, session_id, topic)
+
+        # If summarization lags behind, older messages wait for the fold instead
+        history = history[-2 * self.max_turns:]
+
+        counts = await self.llm.acount_tokens([m["content"] for m in history] + [summary])
+        total = sum(counts)
+        start = 0
+        # Drop whole turns from the front until the budget fits; keep the latest turn
+        while total > self.token_budget and start < len(history) - 2:
+            total -= counts[start] + counts[start + 1]
+            start += 2
+        self.trimmed_messages += start
+        return history[start:], summary
+
+    async def record_turn(self, session_id: str, topic: str, user_message: str, reply: str):
+        """Store a turn and, when the history is long enough, schedule a fold."""
+        await asyncio.to_thread(self.store.append_chat_messages, session_id, topic, [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": reply},
+        ])
+        history = await asyncio.to_thread(self.store.get_chat_history, session_id, topic)
+        if len(history) > 2 * self.max_turns:
+            self.summaries.submit(
+                f"{session_id}:{topic}", lambda: self._fold(session_id, topic)
+            )
+
+    async def _fold(self, session_id: str, topic: str):
+        history = await asyncio.to_thread(self.store.get_chat_history, session_id, topic)
+        older = history[:len(history) - 2 * self.min_turns]
+        if not older:
+            return
+        summary = await asyncio.to_thread(self.store.get_chat_summary, session_id, topic)
+        # No session claim: the fold must not turn away the session's own chat
+        try:
+            ticket = admission.admit("summary", background=True)
+        except AdmissionRejected as e:
+            logger.info(f"Chat summary of {session_id}/{topic} deferred: {e}")
+            return
+        async with ticket:
+            new_summary = await self.llm.summarize_chat(topic, summary, older)
+        await asyncio.to_thread(self.store.fold_chat_history, session_id, topic, new_summary, len(older))
+        self.folded_messages += len(older)
+        logger.info(f"Folded {len(older)} chat messages of {session_id}/{topic} into the summary")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "min_turns": self.min_turns,
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "folded_messages": self.folded_messages,
+            "trimmed_messages": self.trimmed_messages,
+            "summary_jobs": self.summaries.metrics(),
+        }
+
+
+chat_history = ChatHistoryManager(session_store, llm_client)
@@ -0,0 +1,436 @@
+import os
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONSTRAINED_DECODING = os.getenv("LLM_CONSTRAINED_DECODING", "true").lower() == "true"
+CONSTRAINT_TOP_K = int(os.getenv("LLM_CONSTRAINT_TOP_K", "32"))
+MAX_WHITESPACE = 24  # per gap between JSON tokens; stops whitespace loops
+
+_WS = frozenset(b" \t\n\r")
+_DIGITS = frozenset(b"0123456789")
+_HEX = frozenset(b"0123456789abcdefABCDEF")
+_ESCAPES = frozenset(b'"\\/bfnrtu')
+_NUMBER_DONE = ("zero", "int", "frac", "exp_digits")
+
+# Matcher states are immutable tuples of frames, so checking a candidate token
+# never copies anything: advancing returns a new state or None if invalid.
+#   ("value", schema, ws)                       expecting a value
+#   ("obj", schema, phase, next_prop, ws, pending)
+#                                               inside an object; `pending` is the
+#                                               schema of the value after ':'
+#   ("key", schema, next_prop, prefix)          inside an object key
+#   ("arr", schema, phase, count, ws)           inside an array
+#   ("str", escape)                             inside a string value
+#   ("num", phase, integer_only)                inside a number
+#   ("lit", remaining)                          inside true / false / null
+COMPLETE: Tuple = ()
+
+
+class JsonSchema:
+    """
+        description:
+            A JSON schema (as produced by pydantic `model_json_schema`) compiled
+            for incremental matching. Supports objects with ordered properties
+            and `required`, arrays with `minItems` / `maxItems`, strings,
+            numbers, integers, booleans, null, `anyOf`, `$ref` / `$defs`, and
+            free-form values for `Any` fields.
+
+            Object properties must appear in schema order; optional ones may
+            be skipped. That keeps the output in the same layout as the
+            prompt's JSON skeleton.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.root = schema
+        self.defs = schema.get("$defs", {})
+
+    def resolve(self, schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        while schema is not None and "$ref" in schema:
+            schema = self.defs[schema["$ref"].split("/")[-1]]
+        return schema
+
+    def alternatives(self, schema: Optional[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        schema = self.resolve(schema)
+        if schema is None:
+            return [None]
+        if "anyOf" in schema:
+            return [alt for option in schema["anyOf"] for alt in self.alternatives(option)]
+        types = schema.get("type")
+        if isinstance(types, list):
+            return [{**schema, "type": t} for t in types]
+        return [schema]
+
+    def initial_state(self) -> Tuple:
+        return (("value", self.root, 0),)
+
+
+def _type(schema: Optional[Dict[str, Any]]) -> Optional[str]:
+    return None if schema is None else schema.get("type")
+
+
+def _allowed_keys(schema: Optional[Dict[str, Any]], next_prop: int) -> Optional[List[Tuple[int, str]]]:
+    """Keys allowed next: the remaining properties up to the first required one (None = any key)."""
+    if schema is None or "properties" not in schema:
+        return None
+    names = list(schema["properties"])
+    required = set(schema.get("required", []))
+    allowed = []
+    for index in range(next_prop, len(names)):
+        allowed.append((index, names[index]))
+        if names[index] in required:
+            break
+    return allowed
+
+
+def _can_close_object(schema: Optional[Dict[str, Any]], next_prop: int) -> bool:
+    if schema is None or "properties" not in schema:
+        return True
+    names = list(schema["properties"])
+    required = set(schema.get("required", []))
+    return not any(name in required for name in names[next_prop:])
+
+
+class JsonMatcher:
+    """Advances immutable matcher states one byte at a time."""
+
+    def __init__(self, schema: JsonSchema):
+        self.schema = schema
+
+    def advance(self, state: Tuple, data: bytes) -> Optional[Tuple]:
+        for byte in data:
+            state = self._step(state, byte)
+            if state is None:
+                return None
+        return state
+
+    # ------------------------------------------------------------------
+    # Frame transitions
+    # ------------------------------------------------------------------
+    def _finish_value(self, stack: Tuple) -> Tuple:
+        """A value just ended: tell the enclosing object/array."""
+        if not stack:
+            return COMPLETE
+        parent = stack[-1]
+        if parent[0] == "obj":
+            return stack[:-1] + (("obj", parent[1], "after_value", parent[3], 0, None),)
+        # array
+        return stack[:-1] + (("arr", parent[1], "after_value", parent[3] + 1, 0),)
+
+    def _start_value(self, stack: Tuple, schema: Optional[Dict[str, Any]], byte: int) -> Optional[Tuple]:
+        """Begin a value described by `schema` with its first byte."""
+        for alt in self.schema.alternatives(schema):
+            kind = _type(alt)
+            if byte == ord('"') and kind in (None, "string"):
+                return stack + (("str", 0),)
+            if byte == ord("{") and kind in (None, "object"):
+                return stack + (("obj", alt, "start", 0, 0, None),)
+            if byte == ord("[") and kind in (None, "array"):
+                return stack + (("arr", alt, "start", 0, 0),)
+            if (byte == ord("-") or byte in _DIGITS) and kind in (None, "number", "integer"):
+                phase = "sign" if byte == ord("-") else ("zero" if byte == ord("0") else "int")
+                return stack + (("num", phase, kind == "integer"),)
+            if byte in (ord("t"), ord("f")) and kind in (None, "boolean"):
+                return stack + (("lit", b"rue" if byte == ord("t") else b"alse"),)
+            if byte == ord("n") and kind in (None, "null"):
+                return stack + (("lit", b"ull"),)
+        return None
+
+    def _step(self, state: Tuple, byte: int) -> Optional[Tuple]:
+        if state is COMPLETE or not state:
+            return None
+        stack, frame = state[:-1], state[-1]
+        kind = frame[0]
+
+        if kind == "value":
+            _, schema, ws = frame
+            if byte in _WS:
+                return stack + (("value", schema, ws + 1),) if ws < MAX_WHITESPACE else None
+            return self._start_value(stack, schema, byte)
+
+        if kind == "str":
+            escape = frame[1]
+            if escape == 0:
+                if byte == ord('"'):
+                    return self._finish_value(stack)
+                if byte == ord("\\"):
+                    return stack + (("str", 1),)
+                return state if byte >= 0x20 else None
+            if escape == 1:
+                if byte not in _ESCAPES:
+                    return None
+                return stack + (("str", 2 if byte == ord("u") else 0),)
+            # \uXXXX: escape counts 2..5
+            if byte not in _HEX:
+                return None
+            return stack + (("str", 0 if escape == 5 else escape + 1),)
+
+        if kind == "lit":
+            remaining = frame[1]
+            if byte != remaining[0]:
+                return None
+            if len(remaining) == 1:
+                return self._finish_value(stack)
+            return stack + (("lit", remaining[1:]),)
+
+        if kind == "num":
+            return self._step_number(stack, frame, byte)
+
+        if kind == "obj":
+            return self._step_object(stack, frame, byte)
+
+        if kind == "key":
+            return self._step_key(stack, frame, byte)
+
+        if kind == "arr":
+            return self._step_array(stack, frame, byte)
+
+        return None
+
+    def _step_number(self, stack: Tuple, frame: Tuple, byte: int) -> Optional[Tuple]:
+        _, phase, integer_only = frame
+        digit = byte in _DIGITS
+        nxt = None
+        if phase == "sign":
+            nxt = ("zero" if byte == ord("0") else "int") if digit else None
+        elif phase == "zero":
+            if byte == ord(".") and not integer_only:
+                nxt = "dot"
+            elif byte in (ord("e"), ord("E")) and not integer_only:
+                nxt = "exp"
+        elif phase == "int":
+            if digit:
+                nxt = "int"
+            elif byte == ord(".") and not integer_only:
+                nxt = "dot"
+            elif byte in (ord("e"), ord("E")) and not integer_only:
+                nxt = "exp"
+        elif phase in ("dot", "frac"):
+            if digit:
+                nxt = "frac"
+            elif phase == "frac" and byte in (ord("e"), ord("E")):
+                nxt = "exp"
+        elif phase in ("exp", "exp_sign"):
+            if digit:
+                nxt = "exp_digits"
+            elif phase == "exp" and byte in (ord("+"), ord("-")):
+                nxt = "exp_sign"
+        elif phase == "exp_digits" and digit:
+            nxt = "exp_digits"
+
+        if nxt is not None:
+            return stack + (("num", nxt, integer_only),)
+        if phase in _NUMBER_DONE:
+            # The byte ends the number and belongs to the enclosing container
+            parent = self._finish_value(stack)
+            return self._step(parent, byte) if parent else None
+        return None
+
+    def _step_object(self, stack: Tuple, frame: Tuple, byte: int) -> Optional[Tuple]:
+        _, schema, phase, next_prop, ws, pending = frame
+        if byte in _WS:
+            if ws >= MAX_WHITESPACE:
+                return None
+            return stack + (("obj", schema, phase, next_prop, ws + 1, pending),)
+
+        if byte == ord('"') and phase in ("start", "comma"):
+            if _allowed_keys(schema, next_prop) == []:
+                return None
+            return stack + (("obj", schema, "key", next_prop, 0, None), ("key", schema, next_prop, b""))
+        if byte == ord("}") and phase in ("start", "after_value"):
+            return self._finish_value(stack) if _can_close_object(schema, next_prop) else None
+        if byte == ord(",") and phase == "after_value":
+            if _allowed_keys(schema, next_prop) == []:
+                return None
+            return stack + (("obj", schema, "comma", next_prop, 0, None),)
+        if byte == ord(":") and phase == "colon":
+            return stack + (("obj", schema, "value", next_prop, 0, None), ("value", pending, 0))
+        return None
+
+    def _step_key(self, stack: Tuple, frame: Tuple, byte: int) -> Optional[Tuple]:
+        _, schema, next_prop, prefix = frame
+        obj = stack[:-1]
+        allowed = _allowed_keys(schema, next_prop)
+
+        if allowed is None:
+            # Free-form object: any simple key (no escapes), any value
+            if byte == ord('"'):
+                return obj + (("obj", schema, "colon", next_prop, 0, None),)
+            if byte < 0x20 or byte == ord("\\"):
+                return None
+            return obj + (stack[-1], ("key", schema, next_prop, prefix + bytes([byte])))
+
+        if byte == ord('"'):
+            for index, name in allowed:
+                if name.encode("utf-8") == prefix:
+                    return obj + (("obj", schema, "colon", index + 1, 0, schema["properties"][name]),)
+            return None
+        extended = prefix + bytes([byte])
+        if any(name.encode("utf-8").startswith(extended) for _, name in allowed):
+            return obj + (stack[-1], ("key", schema, next_prop, extended))
+        return None
+
+    def _step_array(self, stack: Tuple, frame: Tuple, byte: int) -> Optional[Tuple]:
+        _, schema, phase, count, ws = frame
+        items = schema.get("items") if schema else None
+        min_items = schema.get("minItems", 0) if schema else 0
+        max_items = schema.get("maxItems") if schema else None
+
+        if byte in _WS:
+            if ws >= MAX_WHITESPACE:
+                return None
+            return stack + (("arr", schema, phase, count, ws + 1),)
+        if byte == ord("]") and phase in ("start", "after_value") and count >= min_items:
+            return self._finish_value(stack)
+        if byte == ord(",") and phase == "after_value":
+            if max_items is not None and count >= max_items:
+                return None
+            return stack + (("arr", schema, "comma", count, 0),)
+        if phase in ("start", "comma"):
+            if max_items is not None and count >= max_items:
+                return None
+            return self._start_value(stack + (("arr", schema, "item", count, 0),), items, byte)
+        return None
+
+
+# ------------------------------------------------------------------
+# 🔹 TOKEN BYTES
+# ------------------------------------------------------------------
+_BYTE_TOKEN_RE = re.compile(r"^<0x([0-9A-Fa-f]{2})>$")
+
+
+def _byte_level_decoder() -> Dict[str, int]:
+    """Inverse of the GPT-2 byte-level BPE alphabet (byte -> printable char)."""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    chars = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            chars.append(256 + extra)
+            extra += 1
+    return {chr(char): byte for byte, char in zip(printable, chars)}
+
+
+def token_bytes_table(tokenizer) -> List[Optional[bytes]]:
+    """
+    Raw bytes of every vocabulary token (None for special tokens), so the
+    matcher can check tokens that split multi-byte UTF-8 characters.
+    """
+    special = set(tokenizer.all_special_ids)
+    size = len(tokenizer)
+    tokens = tokenizer.convert_ids_to_tokens(list(range(size)))
+
+    decoder = getattr(getattr(tokenizer, "backend_tokenizer", None), "decoder", None)
+    byte_level = decoder is not None and "ByteLevel" in repr(decoder)
+    byte_decoder = _byte_level_decoder() if byte_level else {}
+
+    table: List[Optional[bytes]] = []
+    for token_id, token in enumerate(tokens):
+        if token is None or token_id in special:
+            table.append(None)
+        elif byte_level and all(char in byte_decoder for char in token):
+            table.append(bytes(byte_decoder[char] for char in token))
+        elif _BYTE_TOKEN_RE.match(token):
+            table.append(bytes([int(token[3:5], 16)]))
+        elif not byte_level:
+            table.append(token.replace("▁", " ").encode("utf-8"))
+        else:
+            table.append(tokenizer.decode([token_id]).encode("utf-8"))
+    return table
+
+
+# ------------------------------------------------------------------
+# 🔹 LOGITS PROCESSOR
+# ------------------------------------------------------------------
+class JsonSchemaLogitsProcessor:
+    """
+        description:
+            transformers logits processor that only lets the model emit JSON
+            matching each row's schema, one matcher state per batch row. Rows
+            whose schema is None are left unconstrained, so free-text and JSON
+            requests can share one padded batch.
+
+            Each step, the `top_k` highest-scoring tokens are checked against
+            the row's state and every other token is masked out. If none of
+            them fit, the whole vocabulary is scanned, best score first. Once
+            the root value closes, only EOS is allowed, so generation stops
+            right after the closing bracket.
+    """
+
+    def __init__(
+        self,
+        schemas: List[Optional[JsonSchema]],
+        token_bytes: List[Optional[bytes]],
+        eos_token_id: int,
+        top_k: int = CONSTRAINT_TOP_K,
+    ):
+        matchers: Dict[int, JsonMatcher] = {}
+        self.matchers = [
+            matchers.setdefault(id(schema), JsonMatcher(schema)) if schema else None
+            for schema in schemas
+        ]
+        self.token_bytes = token_bytes
+        self.eos_token_id = eos_token_id
+        self.top_k = top_k
+        self.states: List[Optional[Tuple]] = [
+            schema.initial_state() if schema else None for schema in schemas
+        ]
+        self._prompt_length: Optional[int] = None
+        self.full_scans = 0
+
+    def _valid(self, matcher: JsonMatcher, state: Tuple, token_id: int) -> bool:
+        data = self.token_bytes[token_id] if token_id < len(self.token_bytes) else None
+        return bool(data) and matcher.advance(state, data) is not None
+
+    def _allowed(self, matcher: JsonMatcher, state: Tuple, scores) -> List[int]:
+        import torch
+
+        values, indices = torch.topk(scores, min(self.top_k, scores.shape[-1]))
+        allowed = [
+            token_id
+            for token_id, value in zip(indices.tolist(), values.tolist())
+            if value != float("-inf") and self._valid(matcher, state, token_id)
+        ]
+        if allowed:
+            return allowed
+
+        self.full_scans += 1
+        for token_id in torch.argsort(scores, descending=True).tolist():
+            if self._valid(matcher, state, token_id):
+                return [token_id]
+        return []
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1]
+        else:
+            for row, token_id in enumerate(input_ids[:, -1].tolist()):
+                state = self.states[row]
+                if state:  # not finished or dead
+                    data = self.token_bytes[token_id] if token_id < len(self.token_bytes) else None
+                    self.states[row] = self.matchers[row].advance(state, data) if data else None
+
+        constrained = torch.full_like(scores, float("-inf"))
+        for row in range(scores.shape[0]):
+            matcher, state = self.matchers[row], self.states[row]
+            if matcher is None:
+                constrained[row] = scores[row]
+                continue
+            allowed = self._allowed(matcher, state, scores[row]) if state else []
+            if not allowed:
+                # Complete, or no valid continuation: end the sequence
+                constrained[row, self.eos_token_id] = 0.0
+                continue
+            index = torch.tensor(allowed, device=scores.device)
+            kept = scores[row, index]
+            # A warper may already have masked the only valid tokens
+            constrained[row, index] = torch.where(torch.isinf(kept), torch.zeros_like(kept), kept)
+        return constrained
+
+    def is_complete(self, row: int = 0) -> bool:
+        return self.states[row] == COMPLETE
@@ -0,0 +1,128 @@
+import os
+import re
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLAN_PROMPT_TOKEN_BUDGET = int(os.getenv("PLAN_PROMPT_TOKEN_BUDGET", "1536"))
+# Per section in sectioned plan generation; each section has its own, narrower retrieval
+PLAN_SECTION_PROMPT_TOKEN_BUDGET = int(os.getenv("PLAN_SECTION_PROMPT_TOKEN_BUDGET", "1024"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "48"))
+CHUNK_SEPARATOR = "\n\n"
+
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)")
+
+
+def format_document(doc) -> str:
+    """Render one retrieved chunk the way it is shown to the model."""
+    return f"Source: {doc.metadata.get('source', 'unknown')}\nContent: {doc.page_content}"
+
+
+def compress_whitespace(text: str) -> str:
+    """PDF extraction leaves runs of spaces and blank lines; they only cost tokens."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _cut_at_sentence(text: str) -> str:
+    """Drop a trailing partial sentence, unless that would drop most of the text."""
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(text)]
+    if ends and ends[-1] >= len(text) // 2:
+        return text[:ends[-1]]
+    return text
+
+
+class ContextAssembler:
+    """
+        description:
+            Turns ranked RAG chunks into a prompt context that fits a token
+            budget, measured with the generating model's own tokenizer:
+
+              1. whitespace is compressed and near-duplicate chunks (word
+                 3-shingle Jaccard >= `dedup_threshold`) are removed, keeping
+                 the higher-ranked copy;
+              2. chunks are packed in rank order while they fit;
+              3. the first chunk that does not fit is truncated to the
+                 remaining budget (at a sentence boundary when possible), and
+                 every lower-ranked chunk is dropped.
+
+            `count_tokens(texts)` returns one token count per text and
+            `truncate(text, max_tokens)` cuts a text to at most that many tokens.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[List[str]], List[int]],
+        truncate: Callable[[str, int], str],
+        dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+        min_chunk_tokens: int = CONTEXT_MIN_CHUNK_TOKENS,
+    ):
+        self.count_tokens = count_tokens
+        self.truncate = truncate
+        self.dedup_threshold = dedup_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def _dedupe(self, texts: List[str]) -> List[str]:
+        kept, kept_shingles = [], []
+        for text in texts:
+            shingles = _shingles(text)
+            duplicate = any(
+                len(shingles & other) / len(shingles | other) >= self.dedup_threshold
+                for other in kept_shingles
+            )
+            if not duplicate:
+                kept.append(text)
+                kept_shingles.append(shingles)
+        return kept
+
+    def assemble(self, docs: List[Any], token_budget: int) -> Tuple[str, Dict[str, Any]]:
+        """
+            returns:
+                (context string, stats with the token counts and chunk accounting)
+        """
+        texts = [compress_whitespace(format_document(doc)) for doc in docs]
+        unique = self._dedupe(texts)
+        stats: Dict[str, Any] = {
+            "context_budget_tokens": max(0, token_budget),
+            "chunks_retrieved": len(docs),
+            "chunks_deduplicated": len(texts) - len(unique),
+            "chunks_used": 0,
+            "chunks_truncated": 0,
+            "chunks_dropped": 0,
+            "context_tokens": 0,
+        }
+        if not unique:
+            return "", stats
+
+        separator_tokens = self.count_tokens([CHUNK_SEPARATOR])[0]
+        counts = self.count_tokens(unique)
+        selected: List[str] = []
+        remaining = token_budget
+
+        for text, tokens in zip(unique, counts):
+            cost = tokens + (separator_tokens if selected else 0)
+            if cost <= remaining:
+                selected.append(text)
+                remaining -= cost
+                continue
+
+            room = remaining - (separator_tokens if selected else 0)
+            if room >= self.min_chunk_tokens:
+                selected.append(_cut_at_sentence(self.truncate(text, room)))
+                stats["chunks_truncated"] = 1
+            stats["chunks_dropped"] = len(unique) - len(selected)
+            break
+
+        context = CHUNK_SEPARATOR.join(selected)
+        stats["chunks_used"] = len(selected)
+        stats["context_tokens"] = self.count_tokens([context])[0] if context else 0
+        return context, stats
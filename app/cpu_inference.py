@@ -0,0 +1,165 @@
+import os
+import logging
+import platform
+import time
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# torch: eager transformers model | onnx: ONNX Runtime via optimum (optional dependency)
+LLM_CPU_RUNTIME = os.getenv("LLM_CPU_RUNTIME", "torch")
+# int8: dynamic int8 quantization of the Linear layers | none: float32 weights
+LLM_CPU_QUANTIZATION = os.getenv("LLM_CPU_QUANTIZATION", "int8")
+# 0 = one intra-op thread per available core
+LLM_CPU_THREADS = int(os.getenv("LLM_CPU_THREADS", "0"))
+# ONNX exports (and their int8 versions) are cached here, one directory per model
+LLM_ONNX_DIR = os.getenv("LLM_ONNX_DIR", "onnx_models")
+# Kernel target of ONNX int8 quantization: avx512_vnni | avx512 | avx2 | arm64 | auto (from the host CPU)
+LLM_ONNX_QUANTIZATION_ARCH = os.getenv("LLM_ONNX_QUANTIZATION_ARCH", "auto")
+
+ONNX_QUANTIZATION_ARCHES = ("avx512_vnni", "avx512", "avx2", "arm64")
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity / container cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configure_cpu_threads(threads: int = LLM_CPU_THREADS) -> int:
+    """
+    Set the torch thread counts. Decoding one token is a chain of small
+    matmuls, so all cores go to intra-op parallelism and inter-op
+    parallelism is turned off. Returns the intra-op thread count; ONNX
+    Runtime gets the same split from `onnx_session_options`.
+    """
+    import torch
+
+    threads = threads or available_cores()
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before the first parallel op; keep whatever is set
+        pass
+    logger.info(f"CPU inference threads: {threads} intra-op, {torch.get_num_interop_threads()} inter-op")
+    return threads
+
+
+def onnx_session_options(threads: int):
+    """ONNX Runtime session options with the thread split of `configure_cpu_threads`."""
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return options
+
+
+def onnx_quantization_arch(arch: str = LLM_ONNX_QUANTIZATION_ARCH) -> str:
+    """The int8 kernel target for this host: the best instruction set its CPU flags offer."""
+    if arch != "auto":
+        if arch not in ONNX_QUANTIZATION_ARCHES:
+            raise ValueError(
+                f"Unknown LLM_ONNX_QUANTIZATION_ARCH: {arch!r} (expected one of {ONNX_QUANTIZATION_ARCHES} or 'auto')"
+            )
+        return arch
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    flags = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags.update(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        pass
+    if "avx512_vnni" in flags or "avx512vnni" in flags:
+        return "avx512_vnni"
+    if {"avx512f", "avx512bw", "avx512vl"} <= flags:
+        return "avx512"
+    return "avx2"
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization: Linear weights stored as int8, activations quantized per batch."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_cpu_model(
+    model_name: str,
+    runtime: str = LLM_CPU_RUNTIME,
+    quantization: str = LLM_CPU_QUANTIZATION,
+    threads: int = LLM_CPU_THREADS,
+) -> Tuple[Any, Any, Dict[str, Any]]:
+    """
+        description:
+            Load `model_name` for CPU generation.
+
+        returns:
+            (model, tokenizer, info) where info records the runtime,
+            quantization, thread count and load time.
+    """
+    from transformers import AutoTokenizer
+
+    threads = configure_cpu_threads(threads)
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+
+    if runtime == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        except ImportError as e:
+            raise RuntimeError(
+                "LLM_CPU_RUNTIME=onnx needs optimum with ONNX Runtime: pip install optimum[onnxruntime]"
+            ) from e
+
+        # Export and quantization take minutes, so their output is reused across starts
+        export_dir = os.path.join(LLM_ONNX_DIR, model_name.replace("/", "--"))
+        file_name = "model_quantized.onnx" if quantization == "int8" else "model.onnx"
+        session_options = onnx_session_options(threads)
+
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            if not os.path.exists(os.path.join(export_dir, "model.onnx")):
+                logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+                exported = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+                exported.save_pretrained(export_dir)
+                del exported
+            if quantization == "int8":
+                arch = onnx_quantization_arch()
+                logger.info(f"Quantizing the ONNX export of {model_name} to int8 ({arch})")
+                ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx").quantize(
+                    save_dir=export_dir,
+                    quantization_config=getattr(AutoQuantizationConfig, arch)(is_static=False, per_channel=False),
+                )
+        model = ORTModelForCausalLM.from_pretrained(
+            export_dir, file_name=file_name, use_cache=True, session_options=session_options
+        )
+    elif runtime == "torch":
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=torch.float32, trust_remote_code=True
+        ).eval()
+        if quantization == "int8":
+            model = quantize_int8(model)
+    else:
+        raise ValueError(f"Unknown LLM_CPU_RUNTIME: {runtime!r} (expected 'torch' or 'onnx')")
+
+    info = {
+        "device": "cpu",
+        "runtime": runtime,
+        "quantization": quantization,
+        "threads": threads,
+        "load_seconds": time.perf_counter() - started,
+    }
+    logger.info(f"Loaded {model_name} for CPU: {info}")
+    return model, tokenizer, info
@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from app.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the inference queue cannot accept more work."""
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: BaseException = None):
+    # The awaiting request may have been cancelled (client disconnect).
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferenceExecutor:
+    """
+        description:
+            Runs blocking model calls (transformers pipeline, generate) on
+            dedicated worker threads fed by a bounded request queue, so the
+            FastAPI event loop keeps serving other requests while a long
+            generation is running.
+
+            A single worker is the default because the GPU pipeline is not
+            safe to call concurrently.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_queue_size: int = INFERENCE_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._busy = 0
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_time = LatencyStats()
+        self.run_time = LatencyStats()
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"inference-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Inference executor started with {self.workers} worker(s).")
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Queue a blocking call and await its result without blocking the loop."""
+        self._ensure_workers()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item = (fn, args, kwargs, loop, future, time.perf_counter(), contextvars.copy_context())
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.rejected += 1
+            raise InferenceQueueFull(
+                f"Inference queue is full ({self._queue.maxsize} pending requests)."
+            )
+
+        self.submitted += 1
+        return await future
+
+    def _worker(self):
+        while True:
+            fn, args, kwargs, loop, future, enqueued_at, ctx = self._queue.get()
+            started = time.perf_counter()
+            self.wait_time.observe(started - enqueued_at)
+
+            with self._lock:
+                self._busy += 1
+            try:
+                if future.cancelled():
+                    continue
+                result = ctx.run(fn, *args, **kwargs)
+                self.completed += 1
+                loop.call_soon_threadsafe(_resolve, future, result)
+            except BaseException as e:
+                self.failed += 1
+                loop.call_soon_threadsafe(_resolve, future, None, e)
+            finally:
+                self.run_time.observe(time.perf_counter() - started)
+                with self._lock:
+                    self._busy -= 1
+                self._queue.task_done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self._queue.maxsize,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_time_seconds": self.wait_time.snapshot(),
+            "run_time_seconds": self.run_time.snapshot(),
+        }
+
+
+inference_executor = InferenceExecutor()
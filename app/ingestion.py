@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Any, Optional, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_QUEUE_CHUNKS = int(os.getenv("INGEST_QUEUE_CHUNKS", "2000"))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+MANIFEST_FILE = "ingest_manifest.json"
+
+_DONE = object()
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(content_hash: str, index: int) -> str:
+    """Deterministic chunk id: the same file content always yields the same ids."""
+    return f"{content_hash[:32]}-{index:05d}"
+
+
+class IngestionManifest:
+    """
+        description:
+            Persistent record of what has been ingested into the vector store:
+            file path -> size, mtime, content hash and the chunk ids it produced.
+
+            `plan` compares it against the files currently on disk to decide
+            which PDFs are new or changed (re-ingest), unchanged (skip) or
+            deleted (remove their vectors). Size + mtime are checked first; the
+            content is only hashed when they differ.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)  # atomic: never leave a half-written manifest
+
+    def plan(self, file_paths: List[str]) -> Tuple[List[Tuple[str, str]], List[str], List[str]]:
+        """
+            returns:
+                (to_ingest as [(path, content_hash)], removed paths, unchanged paths)
+        """
+        current = {os.path.abspath(p) for p in file_paths}
+        to_ingest, unchanged = [], []
+
+        for path in sorted(current):
+            stat = os.stat(path)
+            entry = self.files.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                unchanged.append(path)
+                continue
+
+            content_hash = file_sha256(path)
+            if entry and entry["sha256"] == content_hash:
+                # Touched but identical: just refresh the stat info
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+                unchanged.append(path)
+                continue
+            to_ingest.append((path, content_hash))
+
+        removed = [path for path in self.files if path not in current]
+        return to_ingest, removed, unchanged
+
+    def record(self, path: str, content_hash: str, chunk_ids: List[str]):
+        stat = os.stat(path)
+        self.files[path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": content_hash,
+            "chunk_ids": chunk_ids,
+        }
+
+    def forget(self, path: str) -> List[str]:
+        """
+        Drop a file from the manifest, returning the chunk ids it owned that no
+        other file shares (identical PDFs under two names map to the same ids).
+        """
+        entry = self.files.pop(path, None)
+        if not entry:
+            return []
+        shared = {i for other in self.files.values() for i in other["chunk_ids"]}
+        return [i for i in entry["chunk_ids"] if i not in shared]
+
+
+def load_and_split_pdf(file_path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """
+        description:
+            Parse one PDF and split it into chunks. Runs inside a worker
+            process, so it must stay a picklable top-level function.
+
+        returns:
+            (number of pages, list of chunk Documents)
+    """
+    pages = PyPDFLoader(file_path).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return len(pages), splitter.split_documents(pages)
+
+
+class IngestionPipeline:
+    """
+        description:
+            Three-stage, incremental ingestion pipeline:
+
+              1. parse + split: new or changed PDFs (per the manifest) are
+                 processed in parallel by a process pool, with at most `workers`
+                 files in flight;
+              2. a bounded chunk queue connects the stages, so a slow embedding
+                 stage applies back-pressure instead of letting parsed pages pile
+                 up in memory;
+              3. embed + store: the calling thread consumes the queue and upserts
+                 `max_batch`-sized batches to the vector store (and the BM25
+                 index, when given) under deterministic chunk ids, so
+                 re-running is idempotent.
+
+            Vectors of deleted files, and the previous vectors of changed files,
+            are removed. Peak memory is bounded by the in-flight files plus the
+            queue size, not by the size of the corpus.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        max_batch: int,
+        manifest: Optional[IngestionManifest] = None,
+        lexical_index=None,
+        workers: int = INGEST_WORKERS,
+        queue_chunks: int = INGEST_QUEUE_CHUNKS,
+    ):
+        self.vector_store = vector_store
+        self.max_batch = max_batch
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.workers = max(1, workers)
+        self.queue_chunks = max(max_batch, queue_chunks)
+
+    def _produce(self, files: List[Tuple[str, str]], chunks: "queue.Queue", stats: Dict[str, Any]):
+        """Parse files in the process pool and feed their chunks into the queue."""
+        # spawn: workers only need the PDF stack, not the parent's model threads.
+        # Spawned workers re-import the __main__ script, so entry points keep
+        # app.rag / model imports inside their main() (see ingest_data.py)
+        context = multiprocessing.get_context("spawn")
+        # Identical PDFs share chunk ids: parse and store each content once (a
+        # batch with repeated ids is rejected) and record every path with its ids
+        copies: Dict[str, List[str]] = {}
+        for path, content_hash in files:
+            copies.setdefault(content_hash, []).append(path)
+        pending = [(paths[0], content_hash) for content_hash, paths in copies.items()]
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                in_flight = {}
+                while pending or in_flight:
+                    while pending and len(in_flight) < self.workers:
+                        path, content_hash = pending.pop(0)
+                        in_flight[pool.submit(load_and_split_pdf, path)] = (path, content_hash)
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, content_hash = in_flight.pop(future)
+                        try:
+                            pages, docs = future.result()
+                        except Exception as e:
+                            stats["failed_files"].extend(copies[content_hash])
+                            logger.error(f"Error loading {os.path.basename(path)}: {e}")
+                            continue
+
+                        ids = [chunk_id(content_hash, i) for i in range(len(docs))]
+                        stats["files"] += 1
+                        stats["pages"] += pages
+                        for copy in copies[content_hash]:
+                            stats["file_chunks"][copy] = (content_hash, ids)
+                        stats["duplicate_files"] += len(copies[content_hash]) - 1
+                        logger.info(f"Loaded {os.path.basename(path)} ({pages} pages, {len(docs)} chunks)")
+                        for doc, doc_id in zip(docs, ids):
+                            doc.metadata["chunk_id"] = doc_id
+                            chunks.put((doc_id, doc))  # blocks while the embedding stage catches up
+        finally:
+            chunks.put(_DONE)
+
+    def run(self, file_paths: List[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        stats: Dict[str, Any] = {
+            "files": 0, "duplicate_files": 0, "pages": 0, "chunks": 0, "skipped_files": 0, "removed_files": 0,
+            "failed_files": [], "failed_batches": 0, "file_chunks": {}, "failed_ids": set(),
+        }
+
+        if self.manifest is not None:
+            if not self.manifest.exists and self.vector_store._collection.count() > 0:
+                logger.warning(
+                    "Vector store has data but no ingestion manifest; chunks from earlier "
+                    "ingestions cannot be matched and may be duplicated. Rebuild the store to avoid this."
+                )
+            to_ingest, removed, unchanged = self.manifest.plan(file_paths)
+            stats["skipped_files"] = len(unchanged)
+            for path in removed:
+                self._delete(self.manifest.forget(path))
+                stats["removed_files"] += 1
+                logger.info(f"Removed vectors of deleted file {os.path.basename(path)}")
+            # Changed files: drop their old chunks (the new version may have fewer)
+            for path, _ in to_ingest:
+                self._delete(self.manifest.forget(path))
+        else:
+            to_ingest = [(os.path.abspath(p), file_sha256(p)) for p in file_paths]
+
+        logger.info(
+            f"{len(to_ingest)} new/changed, {stats['skipped_files']} unchanged, "
+            f"{stats['removed_files']} deleted PDFs"
+        )
+
+        if to_ingest:
+            self._consume(to_ingest, stats)
+
+        if self.manifest is not None:
+            for path, (content_hash, ids) in stats["file_chunks"].items():
+                # Files with a failed batch stay out of the manifest and are retried next run
+                if not stats["failed_ids"].intersection(ids):
+                    self.manifest.record(path, content_hash, ids)
+            self.manifest.save()
+
+        stats["failed_ids"] = len(stats["failed_ids"])
+        del stats["file_chunks"]
+        stats["seconds"] = time.perf_counter() - started
+        logger.info(
+            f"Ingested {stats['chunks']} chunks from {stats['files']} files "
+            f"({stats['pages']} pages) in {stats['seconds']:.1f}s"
+        )
+        return stats
+
+    def _consume(self, files: List[Tuple[str, str]], stats: Dict[str, Any]):
+        chunks: "queue.Queue" = queue.Queue(maxsize=self.queue_chunks)
+        producer = threading.Thread(
+            target=self._produce, args=(files, chunks, stats), name="ingest-producer", daemon=True
+        )
+        producer.start()
+
+        batch = []
+        while True:
+            item = chunks.get()
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (len(batch) >= self.max_batch or item is _DONE):
+                self._store_batch(batch, stats)
+                batch = []
+            if item is _DONE:
+                break
+
+        producer.join()
+
+    def _store_batch(self, batch: List[Tuple[str, Any]], stats: Dict[str, Any]):
+        ids = [doc_id for doc_id, _ in batch]
+        try:
+            # Chroma upserts by id, so a retried batch never duplicates vectors
+            self.vector_store.add_documents([doc for _, doc in batch], ids=ids)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(ids)
+                for doc_id, doc in batch:
+                    self.lexical_index.add(doc_id, doc.page_content)
+            stats["chunks"] += len(batch)
+            logger.info(f"Stored batch of {len(batch)} chunks ({stats['chunks']} total)")
+        except Exception as e:
+            stats["failed_batches"] += 1
+            stats["failed_ids"].update(ids)
+            logger.error(f"Failed batch: {e}")
+
+    def _delete(self, ids: List[str]):
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+        for start in range(0, len(ids), self.max_batch):
+            self.vector_store.delete(ids=ids[start:start + self.max_batch])
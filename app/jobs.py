@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PLAN_JOB_CONCURRENCY = int(os.getenv("PLAN_JOB_CONCURRENCY", "2"))
+
+
+class JobRunner:
+    """
+        description:
+            Runs long-lived background coroutines (e.g. business-plan generation)
+            keyed by an id, with at most `max_concurrency` running at once.
+            Extra jobs wait for a slot; submitting a key that is already queued
+            or running is a no-op, so client retries cannot start duplicates.
+
+            Jobs are responsible for recording their own outcome (e.g. in the
+            session); the runner only logs unhandled errors.
+    """
+
+    def __init__(self, max_concurrency: int = PLAN_JOB_CONCURRENCY, name: str = "jobs"):
+        self.max_concurrency = max(1, max_concurrency)
+        self.name = name
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._running = 0
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def is_active(self, key: str) -> bool:
+        task = self._jobs.get(key)
+        return task is not None and not task.done()
+
+    def submit(self, key: str, job: Callable[[], Awaitable[Any]]) -> bool:
+        """Schedule `job()` under `key`. Returns False if that key is already active."""
+        if self.is_active(key):
+            return False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.submitted += 1
+        self._jobs[key] = asyncio.get_running_loop().create_task(self._run(key, job))
+        return True
+
+    async def _run(self, key: str, job: Callable[[], Awaitable[Any]]):
+        try:
+            async with self._semaphore:
+                self._running += 1
+                try:
+                    await job()
+                    self.completed += 1
+                finally:
+                    self._running -= 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"{self.name}: job {key} failed: {e}")
+        finally:
+            self._jobs.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "waiting": len(self._jobs) - self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+plan_jobs = JobRunner(name="plan-jobs")
@@ -0,0 +1,167 @@
+import copy
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KV_CACHE_ENABLED = os.getenv("KV_CACHE_ENABLED", "true").lower() == "true"
+KV_CACHE_MAX_MB = float(os.getenv("KV_CACHE_MAX_MB", "1024"))
+# Below this many matching tokens, copying the cache costs more than re-prefilling
+KV_CACHE_MIN_REUSE_TOKENS = int(os.getenv("KV_CACHE_MIN_REUSE_TOKENS", "16"))
+
+
+@dataclass
+class KVEntry:
+    token_ids: List[int]
+    past_key_values: Any
+    nbytes: int
+    pinned: bool = False
+
+
+def common_prefix_length(a: List[int], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class KVCacheStore:
+    """
+        description:
+            Keyed store of transformer past-key-values with an LRU memory cap.
+
+            Each entry remembers the exact token ids its cache covers. A
+            lookup compares the prompt ids with the candidate entries, takes
+            the longest common prefix, and returns a private copy of that
+            entry's cache cropped to the prefix. Generation then only prefills
+            the tokens after it. Matching on token ids instead of text keeps
+            this correct when a chat template re-renders earlier turns
+            slightly differently: only the differing tail is recomputed.
+
+            Pinned entries (static system-prompt prefixes) are never evicted;
+            the others (per-session chat state) are evicted least recently
+            used first once `max_bytes` is exceeded.
+    """
+
+    def __init__(
+        self,
+        bytes_per_token: int,
+        max_bytes: int = int(KV_CACHE_MAX_MB * 1024 * 1024),
+        min_reuse_tokens: int = KV_CACHE_MIN_REUSE_TOKENS,
+        enabled: bool = KV_CACHE_ENABLED,
+    ):
+        self.bytes_per_token = bytes_per_token
+        self.max_bytes = max_bytes
+        self.min_reuse_tokens = min_reuse_tokens
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, KVEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def lookup(self, token_ids: List[int], keys: List[Optional[str]]) -> Tuple[Any, int]:
+        """
+            returns:
+                (a private, cropped copy of the best matching cache or None,
+                 number of prompt tokens it covers)
+        """
+        if not self.enabled:
+            return None, 0
+
+        best: Optional[KVEntry] = None
+        best_len = 0
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key) if key else None
+                if entry is None:
+                    continue
+                # Keep at least one prompt token to run through the model
+                length = min(common_prefix_length(entry.token_ids, token_ids), len(token_ids) - 1)
+                if length > best_len:
+                    best, best_len = entry, length
+                    self._entries.move_to_end(key)
+
+        if best is None or best_len < self.min_reuse_tokens:
+            self.misses += 1
+            self.prefilled_tokens += len(token_ids)
+            return None, 0
+
+        # Entries are never mutated once stored, so copying outside the lock is safe;
+        # generate() extends the cache in place, hence the copy.
+        past_key_values = copy.deepcopy(best.past_key_values)
+        if best_len < len(best.token_ids):
+            past_key_values.crop(best_len)
+        self.hits += 1
+        self.reused_tokens += best_len
+        self.prefilled_tokens += len(token_ids) - best_len
+        return past_key_values, best_len
+
+    def put(self, key: str, token_ids: List[int], past_key_values: Any, pinned: bool = False):
+        if not self.enabled:
+            return
+        nbytes = len(token_ids) * self.bytes_per_token
+        if nbytes > self.max_bytes:
+            logger.warning(f"KV cache entry {key} ({nbytes / 2**20:.1f} MiB) exceeds the cap; not cached")
+            self.remove(key)
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+            self._entries[key] = KVEntry(list(token_ids), past_key_values, nbytes, pinned)
+            self.total_bytes += nbytes
+            for victim in [k for k, e in self._entries.items() if not e.pinned]:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.total_bytes -= self._entries.pop(victim).nbytes
+                self.evictions += 1
+
+    def remove(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry.nbytes
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "pinned_entries": sum(1 for e in self._entries.values() if e.pinned),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "reused_tokens": self.reused_tokens,
+            "prefilled_tokens": self.prefilled_tokens,
+            "evictions": self.evictions,
+        }
+
+
+def kv_bytes_per_token(model) -> int:
+    """Size of one token's keys + values across all layers, from the model config."""
+    config = model.config
+    text_config = config.get_text_config() if hasattr(config, "get_text_config") else config
+    heads = text_config.num_attention_heads
+    kv_heads = getattr(text_config, "num_key_value_heads", None) or heads
+    head_dim = getattr(text_config, "head_dim", None) or text_config.hidden_size // heads
+    dtype = getattr(model, "dtype", None)
+    itemsize = dtype.itemsize if hasattr(dtype, "itemsize") else 2
+    return 2 * text_config.num_hidden_layers * kv_heads * head_dim * itemsize
@@ -0,0 +1,163 @@
+import os
+import re
+import math
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BM25_INDEX_FILE = "bm25_index.json"
+
+# Keeps numbers with decimals/percentages ("3.5%", "2025") and splits "TAM/SAM"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*%?")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the their this "
+    "to was were will with which what who how can our your we you they".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+        description:
+            In-memory Okapi BM25 inverted index over document chunks, keyed by
+            the same chunk ids as the vector store. It catches exact terms
+            (acronyms such as CAC / LTV / TAM, figures, country names) that
+            dense MiniLM embeddings tend to miss.
+
+            Only term frequencies are kept; chunk text stays in Chroma. The
+            index is persisted as JSON next to the vector store.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.doc_ids: List[Optional[str]] = []   # position -> chunk id (None once removed)
+        self.doc_len: List[int] = []
+        self.id_to_pos: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {position: term frequency}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.id_to_pos)
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+    def add(self, doc_id: str, text: str):
+        """Index a chunk; re-adding an existing id replaces it."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self.id_to_pos:
+                self._remove([doc_id])
+            pos = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            length = sum(terms.values())
+            self.doc_len.append(length)
+            self.total_len += length
+            self.id_to_pos[doc_id] = pos
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[pos] = tf
+
+    def remove(self, doc_ids: List[str]):
+        with self._lock:
+            self._remove([doc_id for doc_id in doc_ids if doc_id in self.id_to_pos])
+
+    def _remove(self, doc_ids: List[str]):
+        """
+        Caller holds the lock. One pass over the postings per call, so remove
+        whole files at once; removal only happens on re-ingestion.
+        """
+        if not doc_ids:
+            return
+        positions = set()
+        for doc_id in doc_ids:
+            pos = self.id_to_pos.pop(doc_id)
+            positions.add(pos)
+            self.doc_ids[pos] = None
+            self.total_len -= self.doc_len[pos]
+            self.doc_len[pos] = 0
+        for term in list(self.postings):
+            plist = self.postings[term]
+            for pos in positions.intersection(plist):
+                del plist[pos]
+            if not plist:
+                del self.postings[term]
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.id_to_pos)
+            if not n_docs or not terms:
+                return []
+            avg_len = self.total_len / n_docs
+            scores: Dict[int, float] = {}
+            for term in terms:
+                plist = self.postings.get(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+                for pos, tf in plist.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[pos] / avg_len)
+                    scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self.doc_ids[pos], score) for pos, score in top]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: str):
+        with self._lock:
+            # Compact positions so removed documents are not persisted
+            live = [pos for pos, doc_id in enumerate(self.doc_ids) if doc_id is not None]
+            remap = {old: new for new, old in enumerate(live)}
+            data = {
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": [self.doc_ids[pos] for pos in live],
+                "doc_len": [self.doc_len[pos] for pos in live],
+                "postings": {
+                    term: [[remap[pos], tf] for pos, tf in plist.items()]
+                    for term, plist in self.postings.items()
+                },
+            }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index.k1, index.b = data["k1"], data["b"]
+        index.doc_ids = data["doc_ids"]
+        index.doc_len = data["doc_len"]
+        index.total_len = sum(index.doc_len)
+        index.id_to_pos = {doc_id: pos for pos, doc_id in enumerate(index.doc_ids)}
+        index.postings = {term: dict((pos, tf) for pos, tf in plist) for term, plist in data["postings"].items()}
+        logger.info(f"Loaded BM25 index with {len(index)} chunks from {path}")
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists: score(id) = sum(1 / (k + rank))."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
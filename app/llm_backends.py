@@ -0,0 +1,888 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from app import tracing
+from app.inference import inference_executor
+from app.batching import MicroBatcher
+from app.metrics import LatencyStats
+from app.kv_cache import KVCacheStore, kv_bytes_per_token
+from app.stopping import (
+    BalancedJsonStoppingCriteria,
+    FirstTokenTimer,
+    RowFinishedCallback,
+    RowTokenLimits,
+    TokenBudgets,
+)
+from app.constrained import (
+    CONSTRAINED_DECODING,
+    JsonSchema,
+    JsonSchemaLogitsProcessor,
+    token_bytes_table,
+)
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "local")  # local | openai
+LLM_MODEL = os.getenv("LLM_MODEL", "Qwen/Qwen3-4B-Instruct-2507")
+# Local backend: cuda = 4-bit bitsandbytes on the GPU, cpu = app.cpu_inference, auto = cuda if available
+LLM_DEVICE = os.getenv("LLM_DEVICE", "auto")
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", "8"))
+LLM_MAX_BATCH_WAIT_MS = float(os.getenv("LLM_MAX_BATCH_WAIT_MS", "20"))
+
+# OpenAI-compatible inference server (vLLM, llama.cpp server, TGI, app.stub_server)
+LLM_API_BASE = os.getenv("LLM_API_BASE", "http://localhost:8001/v1")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_API_TIMEOUT = float(os.getenv("LLM_API_TIMEOUT", "300"))
+LLM_API_MAX_CONNECTIONS = int(os.getenv("LLM_API_MAX_CONNECTIONS", "64"))
+LLM_API_RETRIES = int(os.getenv("LLM_API_RETRIES", "2"))
+# Tokenizer used for prompt budgets with a remote backend; falls back to an estimate
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", LLM_MODEL)
+
+_RETRY_STATUS = {429, 502, 503, 504}
+_CHARS_PER_TOKEN = 4
+
+
+class LLMBackendError(RuntimeError):
+    """Raised when the inference server returns an error or cannot be reached."""
+
+
+@dataclass
+class GenerationRequest:
+    prompt_text: str
+    max_new_tokens: int
+    cache_key: Optional[str] = None      # keep the KV state under this key (chat sessions)
+    static_prefix: Optional[str] = None  # rendered prompt prefix worth caching (system prompts)
+    json_schema: Optional[str] = None    # constrain the output to json_schemas[json_schema]
+    task: Optional[str] = None           # token-budget / output-length bucket (TASK_TOKEN_LIMITS)
+    on_result: Optional[Callable[[str], None]] = None  # called by the worker once this row of a batch ends
+    timings: Dict[str, float] = field(default_factory=dict)  # stage timestamps + token counts, see tracing.record_generation
+
+
+class LLMBackend(ABC):
+    """
+        description:
+            Where generation runs. LLMClient builds the prompts and parses the
+            outputs; a backend turns chat messages into text.
+
+            `task` selects the learned max_new_tokens budget (TokenBudgets),
+            `json_schema` names an entry of `json_schemas` the output must
+            match, `cache_key` / `cache_system_prompt` are hints for prompt
+            KV caching that a backend may ignore.
+    """
+
+    def __init__(self, json_schemas: Dict[str, JsonSchema]):
+        self.json_schemas = json_schemas
+        self.token_budgets = TokenBudgets()
+        self.time_to_first_token = LatencyStats()
+
+    @abstractmethod
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> str:
+        ...
+
+    @abstractmethod
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Yield decoded text chunks as the model produces them."""
+
+    @abstractmethod
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        ...
+
+    @abstractmethod
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        ...
+
+    @abstractmethod
+    def count_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        ...
+
+    @abstractmethod
+    def metrics(self) -> Dict[str, Any]:
+        ...
+
+    async def aclose(self) -> None:
+        """Release connections; called on application shutdown."""
+
+    def compile(self) -> bool:
+        """Compile the model for faster decoding (torch.compile); False if not applicable."""
+        return False
+
+
+# ------------------------------------------------------------------
+# 🔹 LOCAL TRANSFORMERS PIPELINE
+# ------------------------------------------------------------------
+class LocalPipelineBackend(LLMBackend):
+    """
+        description:
+            In-process transformers pipeline: 4-bit Qwen3-4B on the GPU, or
+            on GPU-less nodes an int8 / ONNX Runtime model on the CPU (see
+            app.cpu_inference). Concurrent requests are micro-batched and run
+            on the inference executor; single requests reuse cached prefix KV
+            state; JSON outputs are constrained token by token.
+    """
+
+    def __init__(self, json_schemas: Dict[str, JsonSchema], model: str = LLM_MODEL, device: str = LLM_DEVICE):
+        super().__init__(json_schemas)
+        logger.info("Initializing Local LLM Pipeline...")
+        from transformers import pipeline
+        import torch
+
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        if device == "cpu":
+            from app.cpu_inference import load_cpu_model
+
+            cpu_model, tokenizer, self.device_info = load_cpu_model(model)
+            self._pipeline = pipeline("text-generation", model=cpu_model, tokenizer=tokenizer)
+        else:
+            from transformers import BitsAndBytesConfig
+
+            # 4-bit Quantization Config
+            quant_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+            )
+
+            # Use the requested model
+            self._pipeline = pipeline(
+                "text-generation",
+                model=model,
+                model_kwargs={"quantization_config": quant_config},
+                device_map="auto",
+                trust_remote_code=True
+            )
+            self.device_info = {"device": "cuda", "runtime": "torch", "quantization": "bnb-4bit"}
+
+        # Batched generation with a decoder-only model needs left padding
+        tokenizer = self._pipeline.tokenizer
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        self._batcher = MicroBatcher(
+            self._process_generation_batch,
+            max_batch_size=LLM_MAX_BATCH_SIZE,
+            max_wait_ms=LLM_MAX_BATCH_WAIT_MS,
+            name="llm-batcher",
+        )
+        self.throughput = {
+            "generated_tokens": 0,
+            "generation_seconds": 0.0,
+            "last_batch_size": 0,
+            "last_batch_tokens_per_second": 0.0,
+        }
+        self._token_bytes = None  # vocabulary bytes for constrained decoding
+        self.kv_cache = KVCacheStore(
+            bytes_per_token=kv_bytes_per_token(self._pipeline.model)
+        )
+        if self.device_info["runtime"] == "onnx":
+            # ONNX Runtime models keep their own past-key-value format; no prefix reuse
+            self.kv_cache.enabled = False
+        logger.info(f"Local Pipeline backend initialized ({self.device_info})")
+
+    def compile(self) -> bool:
+        if self.device_info["runtime"] != "torch":
+            return False
+        try:
+            # dynamic=True: prompt length and batch size vary per call, avoid a recompile for each
+            self._pipeline.model.compile(dynamic=True)
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable for this model ({e}); running eager")
+            return False
+        logger.info("Model forward pass compiled with torch.compile")
+        return True
+
+    def _system_prefix(self, system_prompt: str) -> str:
+        """The rendered chat-template text of a system message on its own."""
+        return self._pipeline.tokenizer.apply_chat_template(
+            [{"role": "system", "content": system_prompt}],
+            tokenize=False,
+            add_generation_prompt=False,
+        )
+
+    def _build_request(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        static_prefix: Optional[str] = None,
+        json_schema: Optional[str] = None,
+    ) -> GenerationRequest:
+        """Render the chat template; max_new_tokens is the task's learned budget."""
+        prompt_text = self._pipeline.tokenizer.apply_chat_template(
+            messages, 
+            tokenize=False, 
+            add_generation_prompt=True
+        )
+        return GenerationRequest(
+            prompt_text,
+            self.token_budgets.budget(task),
+            cache_key,
+            static_prefix,
+            json_schema,
+            task,
+        )
+
+    def _static_prefix(self, messages: List[Dict[str, str]], cache_system_prompt: bool) -> Optional[str]:
+        if cache_system_prompt and messages and messages[0]["role"] == "system":
+            return self._system_prefix(messages[0]["content"])
+        return None
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> str:
+        """
+        Render the chat template and queue the prompt on the batching
+        scheduler; batches run on the inference executor, so the event
+        loop is never blocked by generation.
+        """
+        request = self._build_request(
+            messages, task, cache_key, self._static_prefix(messages, cache_system_prompt), json_schema
+        )
+        request.timings["enqueued_at"] = time.perf_counter()
+
+        # In a padded batch, a row that ends early is handed back right away
+        # instead of waiting for the longest row.
+        loop = asyncio.get_running_loop()
+        early = loop.create_future()
+        request.on_result = lambda text: loop.call_soon_threadsafe(
+            lambda: early.done() or early.set_result(text)
+        )
+        submitted = asyncio.ensure_future(self._batcher.submit(request))
+        try:
+            done, _ = await asyncio.wait({submitted, early}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            submitted.cancel()
+            raise
+        if early in done:
+            # The batch result (or error) arrives later and is no longer needed
+            submitted.add_done_callback(lambda f: f.cancelled() or f.exception())
+            text = early.result()
+        else:
+            text = submitted.result()
+        tracing.record_generation(task, request.timings)
+        return text
+
+    async def _process_generation_batch(self, requests: List[GenerationRequest]) -> List[Any]:
+        """Called by the batcher with every prompt collected in the current window."""
+        return await inference_executor.run(self._run_batch, requests)
+
+    def _run_batch(self, requests: List[GenerationRequest]) -> List[Any]:
+        """
+        Blocking batched pipeline call. Only ever invoked on an inference worker thread.
+        A request alone in its window takes the single-sequence path, which can
+        reuse cached prefix KV state. Otherwise all requests run as one padded
+        batch: output schemas are applied per row, and the batch runs with the
+        largest token limit while each row stops at its own.
+        """
+        if len(requests) == 1:
+            try:
+                return [self._generate_cached(requests[0])]
+            except Exception as e:
+                logger.error(f"Generation failed: {e}")
+                return [e]
+
+        prompts = [request.prompt_text for request in requests]
+        json_schemas = [request.json_schema for request in requests]
+        limits = [request.max_new_tokens for request in requests]
+        if tracing.TRACING_ENABLED:
+            self._record_prompt_tokens(requests)
+        first_token = FirstTokenTimer()
+        extra = [first_token, self._row_finished_callback(requests, first_token)]
+        if len(set(limits)) > 1:
+            extra.append(RowTokenLimits(limits))
+        started = time.perf_counter()
+        try:
+            outputs = self._pipeline(
+                prompts,
+                batch_size=len(prompts),
+                max_new_tokens=max(limits),
+                do_sample=True,
+                temperature=0.7,
+                return_full_text=False,
+                logits_processor=self._logits_processors(json_schemas),
+                stopping_criteria=self._stopping_criteria(json_schemas, extra),
+            )
+        except Exception as e:
+            logger.error(f"Batched generation failed ({len(prompts)} prompts): {e}")
+            return [e] * len(requests)
+
+        finished = time.perf_counter()
+        texts = [output[0]["generated_text"] for output in outputs]
+        counts = self._record_throughput(texts, finished - started)
+        for request, count in zip(requests, counts):
+            self.token_budgets.observe(request.task, count, request.max_new_tokens)
+            # Rows that ended early already recorded their own finish
+            if "finished_at" not in request.timings:
+                request.timings.update(first_token_at=first_token.at, finished_at=finished, output_tokens=count)
+        return texts
+
+    def _record_prompt_tokens(self, requests: List[GenerationRequest]):
+        """Tokenize a batch's prompts for the trace (the pipeline does its own tokenization)."""
+        started = time.perf_counter()
+        counts = self.count_tokens([request.prompt_text for request in requests])
+        tokenized = time.perf_counter()
+        for request, count in zip(requests, counts):
+            request.timings.update(
+                started_at=started, tokenized_at=tokenized, prompt_tokens=count, batch_size=len(requests)
+            )
+
+    def _row_finished_callback(self, requests: List[GenerationRequest], first_token: FirstTokenTimer) -> RowFinishedCallback:
+        """Pass each row's text to its request's `on_result` as soon as the row ends."""
+        tokenizer = self._pipeline.tokenizer
+
+        def on_finished(row: int, token_ids: List[int]):
+            requests[row].timings.update(
+                first_token_at=first_token.at, finished_at=time.perf_counter(), output_tokens=len(token_ids)
+            )
+            if requests[row].on_result is not None:
+                requests[row].on_result(tokenizer.decode(token_ids, skip_special_tokens=True))
+
+        # generate() pads finished rows with the generation config's pad token
+        config = self._pipeline.model.generation_config
+        config_eos = config.eos_token_id if isinstance(config.eos_token_id, list) else [config.eos_token_id]
+        stop_token_ids = [
+            t for t in (tokenizer.eos_token_id, tokenizer.pad_token_id, config.pad_token_id, *config_eos)
+            if t is not None
+        ]
+        return RowFinishedCallback(stop_token_ids, on_finished, len(requests))
+
+    def _vocabulary_bytes(self) -> List[Optional[bytes]]:
+        if self._token_bytes is None:
+            self._token_bytes = token_bytes_table(self._pipeline.tokenizer)
+        return self._token_bytes
+
+    def _logits_processors(self, json_schemas: List[Optional[str]]):
+        """Constrained decoding for the rows with an output schema, or None if there are none."""
+        if not any(json_schemas) or not CONSTRAINED_DECODING:
+            return None
+        from transformers import LogitsProcessorList
+
+        return LogitsProcessorList([
+            JsonSchemaLogitsProcessor(
+                [self.json_schemas[name] if name else None for name in json_schemas],
+                self._vocabulary_bytes(),
+                eos_token_id=self._pipeline.tokenizer.eos_token_id,
+            )
+        ])
+
+    def _stopping_criteria(self, json_schemas: List[Optional[str]], extra: Optional[List[Any]] = None):
+        """Stop JSON rows once their top-level value is balanced, plus any `extra` criteria."""
+        from transformers import StoppingCriteriaList
+
+        criteria = list(extra or [])
+        if any(json_schemas):
+            criteria.append(BalancedJsonStoppingCriteria(
+                self._vocabulary_bytes(),
+                len(json_schemas),
+                watched=[bool(name) for name in json_schemas],
+            ))
+        return StoppingCriteriaList(criteria) if criteria else None
+
+    def _prefix_key(self, static_prefix: str) -> str:
+        """Prefill a static prompt prefix once and pin its KV cache."""
+        import torch
+
+        key = "prefix:" + hashlib.sha1(static_prefix.encode("utf-8")).hexdigest()[:16]
+        if key in self.kv_cache or not self.kv_cache.enabled:
+            return key
+
+        model = self._pipeline.model
+        input_ids = self._pipeline.tokenizer(
+            static_prefix, add_special_tokens=False, return_tensors="pt"
+        )["input_ids"].to(model.device)
+        with torch.no_grad():
+            output = model(input_ids=input_ids, use_cache=True)
+        self.kv_cache.put(key, input_ids[0].tolist(), output.past_key_values, pinned=True)
+        logger.info(f"Cached KV state for a {input_ids.shape[1]}-token static prompt prefix")
+        return key
+
+    def _generate_cached(self, request: GenerationRequest, streamer=None, extra_stopping=None) -> str:
+        """
+        Blocking single-sequence generation that starts from the longest cached
+        prefix (a pinned static prefix or this chat's previous turn), so only
+        the new prompt tokens are prefilled. With `cache_key`, the resulting
+        KV state (prompt + reply) is kept for the next turn.
+        Only ever invoked on an inference worker thread.
+        """
+        import torch
+
+        tokenizer = self._pipeline.tokenizer
+        model = self._pipeline.model
+        request.timings["started_at"] = time.perf_counter()
+        input_ids = tokenizer(
+            request.prompt_text, add_special_tokens=False, return_tensors="pt"
+        )["input_ids"].to(model.device)
+        token_ids = input_ids[0].tolist()
+        request.timings["tokenized_at"] = time.perf_counter()
+
+        keys = [
+            request.cache_key,
+            self._prefix_key(request.static_prefix) if request.static_prefix else None,
+        ]
+        past_key_values, reused = self.kv_cache.lookup(token_ids, keys)
+        if reused:
+            logger.info(f"Reusing cached KV state for {reused}/{len(token_ids)} prompt tokens")
+
+        first_token = FirstTokenTimer()
+        started = time.perf_counter()
+        with torch.no_grad():
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                max_new_tokens=request.max_new_tokens,
+                do_sample=True,
+                temperature=0.7,
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                stopping_criteria=self._stopping_criteria([request.json_schema], [first_token, *(extra_stopping or [])]),
+                logits_processor=self._logits_processors([request.json_schema]),
+                return_dict_in_generate=True,
+            )
+        sequence = output.sequences[0]
+        text = tokenizer.decode(sequence[len(token_ids):], skip_special_tokens=True)
+        finished = time.perf_counter()
+        (count,) = self._record_throughput([text], finished - started)
+        self.token_budgets.observe(request.task, count, request.max_new_tokens)
+        request.timings.update(
+            first_token_at=first_token.at, finished_at=finished, batch_size=1,
+            prompt_tokens=len(token_ids), cached_tokens=reused, output_tokens=count,
+        )
+
+        if request.cache_key and self.kv_cache.enabled and output.past_key_values is not None:
+            cached_length = output.past_key_values.get_seq_length()
+            self.kv_cache.put(request.cache_key, sequence[:cached_length].tolist(), output.past_key_values)
+        return text
+
+    def _record_throughput(self, texts: List[str], elapsed: float) -> List[int]:
+        """Record batch throughput; returns the token count of each text."""
+        counts = [
+            len(ids) for ids in self._pipeline.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        ]
+        generated = sum(counts)
+        tokens_per_second = generated / elapsed if elapsed > 0 else 0.0
+        self.throughput["generated_tokens"] += generated
+        self.throughput["generation_seconds"] += elapsed
+        self.throughput["last_batch_size"] = len(texts)
+        self.throughput["last_batch_tokens_per_second"] = tokens_per_second
+        logger.info(
+            f"Generated batch of {len(texts)}: {generated} tokens in {elapsed:.2f}s "
+            f"({tokens_per_second:.1f} tok/s)"
+        )
+        return counts
+
+    # ------------------------------------------------------------------
+    # 🔹 STREAMING GENERATION
+    # ------------------------------------------------------------------
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yield decoded text chunks as the model produces them.
+        Streaming runs unbatched on the inference executor; stopping early
+        (client disconnect) signals the worker to end the generation.
+        """
+        from transformers import AsyncTextIteratorStreamer
+
+        request = self._build_request(
+            messages, task, cache_key, self._static_prefix(messages, cache_system_prompt), json_schema
+        )
+        streamer = AsyncTextIteratorStreamer(
+            self._pipeline.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        cancelled = threading.Event()
+        started = request.timings["enqueued_at"] = time.perf_counter()
+        job = asyncio.ensure_future(
+            inference_executor.run(self._run_streaming, request, streamer, cancelled)
+        )
+
+        first_token = True
+        try:
+            async for text in streamer:
+                if not text:
+                    continue
+                if first_token:
+                    ttft = time.perf_counter() - started
+                    self.time_to_first_token.observe(ttft)
+                    logger.info(f"Time to first token: {ttft:.2f}s")
+                    first_token = False
+                yield text
+        finally:
+            cancelled.set()
+            # Surface generation errors to the caller once the stream is drained.
+            await job
+            tracing.record_generation(task, request.timings)
+
+    def _run_streaming(self, request: GenerationRequest, streamer, cancelled: threading.Event):
+        """Blocking streamed generation. Only ever invoked on an inference worker thread."""
+        from transformers import StoppingCriteria
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancelled.is_set()
+
+        try:
+            self._generate_cached(request, streamer=streamer, extra_stopping=[_Cancelled()])
+        except Exception:
+            # Unblock the consumer, then let the error propagate to it.
+            streamer.end()
+            raise
+
+    def metrics(self) -> Dict[str, Any]:
+        total_seconds = self.throughput["generation_seconds"]
+        return {
+            "backend": "local",
+            **self.device_info,
+            **self._batcher.metrics(),
+            **self.throughput,
+            "avg_tokens_per_second": (
+                self.throughput["generated_tokens"] / total_seconds if total_seconds else 0.0
+            ),
+            "time_to_first_token_seconds": self.time_to_first_token.snapshot(),
+            "kv_cache": self.kv_cache.metrics(),
+            "token_budgets": self.token_budgets.metrics(),
+        }
+
+    # ------------------------------------------------------------------
+    # 🔹 TOKEN COUNTING
+    # ------------------------------------------------------------------
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token counts with the generating model's tokenizer (one batched call)."""
+        encoded = self._pipeline.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        ids = self._pipeline.tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= max_tokens:
+            return text
+        return self._pipeline.tokenizer.decode(ids[:max_tokens], skip_special_tokens=True)
+
+    def count_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens of the full chat-templated prompt, as the model will see it."""
+        prompt_text = self._pipeline.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+        return self.count_tokens([prompt_text])[0]
+
+
+# ------------------------------------------------------------------
+# 🔹 OPENAI-COMPATIBLE HTTP SERVER
+# ------------------------------------------------------------------
+class OpenAICompatibleBackend(LLMBackend):
+    """
+        description:
+            Sends chat completions to an external OpenAI-compatible inference
+            server (vLLM, llama.cpp server, TGI, or app.stub_server), so the
+            model can be scaled separately from the web tier.
+
+            One pooled httpx.AsyncClient with keep-alive connections is shared
+            by all requests (recreated if the event loop changes). Connection
+            errors and 429 / 5xx responses are retried with exponential
+            backoff; a stream is only retried before its first token. JSON
+            outputs are requested with `response_format` = json_schema, which
+            the server enforces. Batching and prefix caching are left to the
+            server; `cache_key` / `cache_system_prompt` are ignored.
+
+            Prompt token counts use the model's tokenizer when it can be
+            loaded (LLM_TOKENIZER), else an estimate of 4 characters per token.
+    """
+
+    def __init__(
+        self,
+        json_schemas: Dict[str, JsonSchema],
+        base_url: str = LLM_API_BASE,
+        model: str = LLM_MODEL,
+        api_key: str = LLM_API_KEY,
+        timeout: float = LLM_API_TIMEOUT,
+        max_connections: int = LLM_API_MAX_CONNECTIONS,
+        retries: int = LLM_API_RETRIES,
+        tokenizer: Optional[str] = LLM_TOKENIZER,
+    ):
+        super().__init__(json_schemas)
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = max(0, retries)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tokenizer = self._load_tokenizer(tokenizer) if tokenizer else None
+
+        # Metrics
+        self.requests = 0
+        self.retried = 0
+        self.errors = 0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self.request_time = LatencyStats()
+        logger.info(f"OpenAI-compatible backend at {self.base_url} (model {model})")
+
+    @staticmethod
+    def _load_tokenizer(name: str):
+        try:
+            from transformers import AutoTokenizer
+
+            return AutoTokenizer.from_pretrained(name)
+        except Exception as e:
+            logger.warning(f"Tokenizer {name} unavailable ({e}); estimating token counts")
+            return None
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _payload(self, messages: List[Dict[str, str]], task: str, json_schema: Optional[str], stream: bool) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.token_budgets.budget(task),
+            "temperature": 0.7,
+            "stream": stream,
+        }
+        if json_schema and CONSTRAINED_DECODING:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": json_schema.replace(":", "_"),
+                    "schema": self.json_schemas[json_schema].root,
+                    "strict": True,
+                },
+            }
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    async def _backoff(self, attempt: int, reason: str):
+        self.retried += 1
+        delay = 0.5 * (2 ** attempt)
+        logger.warning(f"LLM request failed ({reason}); retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def _error(response: httpx.Response) -> LLMBackendError:
+        return LLMBackendError(f"Inference server returned {response.status_code}: {response.text[:500]}")
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> str:
+        payload = self._payload(messages, task, json_schema, stream=False)
+        self.requests += 1
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._http().post("/chat/completions", json=payload)
+            except httpx.TransportError as e:
+                if attempt < self.retries:
+                    await self._backoff(attempt, repr(e))
+                    continue
+                self.errors += 1
+                raise LLMBackendError(f"Inference server unreachable: {e!r}") from e
+            if response.status_code in _RETRY_STATUS and attempt < self.retries:
+                await self._backoff(attempt, f"HTTP {response.status_code}")
+                continue
+            if response.status_code != 200:
+                self.errors += 1
+                raise self._error(response)
+            break
+
+        finished = time.perf_counter()
+        data = response.json()
+        text = data["choices"][0]["message"].get("content") or ""
+        usage = data.get("usage") or {}
+        self._record(task, payload["max_tokens"], usage.get("completion_tokens"), text, finished - started)
+        tracing.record_generation(task, {
+            "started_at": started, "finished_at": finished, "attempts": attempt + 1,
+            **self._usage_timings(usage),
+        })
+        return text
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        cache_key: Optional[str] = None,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion (server-sent events)."""
+        payload = self._payload(messages, task, json_schema, stream=True)
+        self.requests += 1
+        started = time.perf_counter()
+        chunks: List[str] = []
+        completion_tokens = None
+        usage = {}
+        first_token_at = None
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._http().stream("POST", "/chat/completions", json=payload) as response:
+                    if response.status_code in _RETRY_STATUS and attempt < self.retries:
+                        await self._backoff(attempt, f"HTTP {response.status_code}")
+                        continue
+                    if response.status_code != 200:
+                        await response.aread()
+                        self.errors += 1
+                        raise self._error(response)
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        if event.get("usage"):
+                            usage = event["usage"]
+                            completion_tokens = usage.get("completion_tokens")
+                        for choice in event.get("choices") or []:
+                            text = (choice.get("delta") or {}).get("content")
+                            if not text:
+                                continue
+                            if not chunks:
+                                first_token_at = time.perf_counter()
+                                ttft = first_token_at - started
+                                self.time_to_first_token.observe(ttft)
+                                logger.info(f"Time to first token: {ttft:.2f}s")
+                            chunks.append(text)
+                            yield text
+                break
+            except httpx.TransportError as e:
+                if not chunks and attempt < self.retries:
+                    await self._backoff(attempt, repr(e))
+                    continue
+                self.errors += 1
+                raise LLMBackendError(f"Inference server stream failed: {e!r}") from e
+
+        finished = time.perf_counter()
+        self._record(task, payload["max_tokens"], completion_tokens, "".join(chunks), finished - started)
+        tracing.record_generation(task, {
+            "started_at": started, "first_token_at": first_token_at, "finished_at": finished,
+            **self._usage_timings(usage),
+        })
+
+    @staticmethod
+    def _usage_timings(usage: Dict[str, Any]) -> Dict[str, int]:
+        timings = {}
+        if usage.get("prompt_tokens") is not None:
+            timings["prompt_tokens"] = usage["prompt_tokens"]
+        if usage.get("completion_tokens") is not None:
+            timings["output_tokens"] = usage["completion_tokens"]
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if cached is not None:
+            timings["cached_tokens"] = cached
+        return timings
+
+    def _record(self, task: str, max_tokens: int, completion_tokens: Optional[int], text: str, elapsed: float):
+        if completion_tokens is None:
+            completion_tokens = self.count_tokens([text])[0]
+        self.token_budgets.observe(task, completion_tokens, max_tokens)
+        self.generated_tokens += completion_tokens
+        self.generation_seconds += elapsed
+        self.request_time.observe(elapsed)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if self._tokenizer is None:
+            return [(len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN for text in texts]
+        encoded = self._tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        if self._tokenizer is None:
+            return text[:max_tokens * _CHARS_PER_TOKEN]
+        ids = self._tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= max_tokens:
+            return text
+        return self._tokenizer.decode(ids[:max_tokens], skip_special_tokens=True)
+
+    def count_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        if self._tokenizer is not None and getattr(self._tokenizer, "chat_template", None):
+            prompt_text = self._tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            return self.count_tokens([prompt_text])[0]
+        # Role markers and separators cost a few tokens per message
+        return sum(self.count_tokens([m["content"] for m in messages])) + 4 * len(messages)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "openai",
+            "api_base": self.base_url,
+            "model": self.model,
+            "requests": self.requests,
+            "retries": self.retried,
+            "errors": self.errors,
+            "generated_tokens": self.generated_tokens,
+            "generation_seconds": self.generation_seconds,
+            "request_time_seconds": self.request_time.snapshot(),
+            "time_to_first_token_seconds": self.time_to_first_token.snapshot(),
+            "token_budgets": self.token_budgets.metrics(),
+        }
+
+
+def create_llm_backend(json_schemas: Dict[str, JsonSchema], backend: str = LLM_BACKEND) -> LLMBackend:
+    if backend == "openai":
+        return OpenAICompatibleBackend(json_schemas)
+    if backend == "local":
+        return LocalPipelineBackend(json_schemas)
+    raise ValueError(f"Unknown LLM_BACKEND: {backend!r} (expected 'local' or 'openai')")
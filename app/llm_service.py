@@ -1,47 +1,153 @@
-import httpx
+import asyncio
 import json
 import logging
-import os
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from pydantic import TypeAdapter
 
 from app.schemas import (
     ClarificationQuestion,
     BusinessPlan,
 )
+from app.context_budget import (
+    ContextAssembler,
+    PLAN_PROMPT_TOKEN_BUDGET,
+    PLAN_SECTION_PROMPT_TOKEN_BUDGET,
+)
+from app.constrained import JsonSchema
+from app.llm_backends import LLMBackend, create_llm_backend
+from app.readiness import components
+from app import tracing
 
 logger = logging.getLogger(__name__)
 
+# Static instructions + JSON skeleton live in the system prompt, ahead of any
+# per-request text, so their KV cache can be computed once and reused.
+PLAN_JSON_SKELETON = """{
+    "executive_summary": "A brief summary of the business...",
+    "market_analysis": {
+        "market_size": "Estimate of market value...",
+        "growth_trends": ["trend 1", "trend 2"],
+        "competitors": ["comp 1", "comp 2"],
+        "opportunities": ["opp 1"],
+        "risks": ["risk 1"],
+        "relevant_use_cases": ["case 1"]
+    },
+    "business_model": {
+        "value_proposition": ["prop 1"],
+        "customer_segments": ["seg 1"],
+        "revenue_streams": ["stream 1"],
+        "cost_structure": ["cost 1"],
+        "key_activities": ["act 1"],
+        "key_resources": ["res 1"],
+        "key_partners": ["partner 1"],
+        "channels": ["channel 1"],
+        "customer_relationships": ["rel 1"]
+    },
+    "kpis": [
+        {
+            "name": "Revenue Growth",
+            "description": "Monthly growth rate",
+            "formula": "(Rev - LastRev)/LastRev",
+            "importance": "High",
+            "frequency": "Monthly"
+        }
+    ],
+    "assumptions_constraints": ["assume stable economy"],
+    "recommendations": "Start small and validate."
+}"""
+PLAN_SYSTEM_PROMPT = f"""You are a JSON-speaking business expert. You generate a Business Plan for the user's idea in JSON format.
+
+Strictly follow this JSON structure. Do not output markdown, just the JSON object:
+{PLAN_JSON_SKELETON}"""
+
+# Sectioned plan generation: BusinessPlan field -> (what to write, retrieval terms).
+# Each section is generated from its own prompt and RAG query; see generate_plan_sections.
+PLAN_SECTIONS: Dict[str, Tuple[str, str]] = {
+    "executive_summary": (
+        "a concise executive summary of the business in 3-5 sentences",
+        "business overview value proposition target market",
+    ),
+    "market_analysis": (
+        "a market analysis: market size, growth trends, competitors, opportunities, risks and relevant use cases",
+        "market size growth trends competitors opportunities risks",
+    ),
+    "business_model": (
+        "the Business Model Canvas",
+        "business model revenue streams customer segments cost structure partners channels",
+    ),
+    "kpis": (
+        "3-6 key performance indicators to track",
+        "key performance indicators metrics benchmarks",
+    ),
+    "assumptions_constraints": (
+        "the key assumptions and constraints the plan relies on",
+        "assumptions constraints regulation requirements",
+    ),
+    "recommendations": (
+        "actionable recommendations for the next steps",
+        "recommendations strategy go-to-market launch",
+    ),
+}
+_PLAN_SKELETON = json.loads(PLAN_JSON_SKELETON)
+SECTION_SYSTEM_PROMPTS: Dict[str, str] = {
+    section: f"""You are a JSON-speaking business expert. You write one section of a Business Plan for the user's idea: {focus}.
+
+Strictly follow this JSON structure. Do not output markdown, just the JSON object:
+{json.dumps({section: _PLAN_SKELETON[section]}, indent=4)}"""
+    for section, (focus, _) in PLAN_SECTIONS.items()
+}
+FALLBACK_SUMMARY_PREFIX = "Plan generation failed."
+
+# Output schemas for constrained decoding, referenced by name in GenerationRequest
+JSON_SCHEMAS: Dict[str, JsonSchema] = {
+    "business_plan": JsonSchema(BusinessPlan.model_json_schema()),
+    "clarification_questions": JsonSchema({
+        "type": "array",
+        "items": ClarificationQuestion.model_json_schema(),
+        "minItems": 3,
+        "maxItems": 5,
+    }),
+}
+
+
+def _section_schema(section: str) -> JsonSchema:
+    """A one-key object holding `section` of the BusinessPlan schema."""
+    plan_schema = BusinessPlan.model_json_schema()
+    return JsonSchema({
+        "type": "object",
+        "properties": {section: plan_schema["properties"][section]},
+        "required": [section],
+        "$defs": plan_schema.get("$defs", {}),
+    })
+
+
+JSON_SCHEMAS.update({f"plan_section:{section}": _section_schema(section) for section in PLAN_SECTIONS})
+
 
 class LLMClient:
     _instance = None
-    _pipeline = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            logger.info("Initializing Local LLM Pipeline...")
-            from transformers import pipeline, BitsAndBytesConfig
-            import torch
-
-            # 4-bit Quantization Config
-            quant_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_use_double_quant=True,
-            )
-
-            # Use the requested model
-            cls._pipeline = pipeline(
-                "text-generation",
-                model="Qwen/Qwen3-4B-Instruct-2507",
-                model_kwargs={"quantization_config": quant_config},
-                device_map="auto",
-                trust_remote_code=True
+            # LLM_BACKEND: in-process transformers pipeline or an OpenAI-compatible server.
+            # Loaded in the background (see app/readiness.py), not at import time.
+            cls._instance._backend = components.register("llm", lambda: create_llm_backend(JSON_SCHEMAS))
+            cls._instance.context_assembler = ContextAssembler(
+                count_tokens=cls._instance.count_tokens,
+                truncate=cls._instance.truncate_to_tokens,
             )
-            logger.info("LLMClient Singleton Initialized (Local Pipeline 4-bit)")
+            cls._instance.last_plan_prompt = {}
+            cls._instance.last_section_prompts = {}
+            logger.info("LLMClient Singleton Initialized")
         return cls._instance
 
+    @property
+    def backend(self) -> LLMBackend:
+        """The loaded backend (waits for it on worker threads, never on the event loop)."""
+        return self._backend.get()
+
     # ------------------------------------------------------------------
     # 🔹 LOW LEVEL GENERATION
     # ------------------------------------------------------------------
@@ -49,31 +155,70 @@ class LLMClient:
         self,
         prompt: str,
         system_prompt: str,
+        task: str,
+        cache_system_prompt: bool = False,
+        json_schema: Optional[str] = None,
     ) -> str:
         """
-        Call Local Transformers Pipeline
+        Generate a reply to one system + user prompt on the configured backend
         """
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt},
         ]
-        
-        # Apply chat template
-        prompt_text = self._pipeline.tokenizer.apply_chat_template(
-            messages, 
-            tokenize=False, 
-            add_generation_prompt=True
+        return await self._complete(
+            messages,
+            task=task,
+            cache_system_prompt=cache_system_prompt,
+            json_schema=json_schema,
         )
 
-        outputs = self._pipeline(
-            prompt_text,
-            max_new_tokens=4096, # Increased to prevent truncation
-            do_sample=True,
-            temperature=0.7,
-            return_full_text=False
-        )
-        
-        return outputs[0]["generated_text"]
+    async def _complete(self, messages: List[Dict[str, str]], task: str, **kwargs) -> str:
+        """One traced backend generation; the backend adds queue/prefill/decode spans."""
+        backend = await self._backend.aget()
+        with tracing.span("llm.generate", task=task):
+            return await backend.generate(messages, task=task, **kwargs)
+
+    async def _stream(self, messages: List[Dict[str, str]], task: str, **kwargs) -> AsyncIterator[str]:
+        backend = await self._backend.aget()
+        with tracing.span("llm.stream", task=task):
+            async for chunk in backend.stream(messages, task=task, **kwargs):
+                yield chunk
+
+    def metrics(self) -> Dict[str, Any]:
+        backend = self._backend.peek()
+        return {
+            **(backend.metrics() if backend else {"backend": self._backend.status()}),
+            "last_plan_prompt": self.last_plan_prompt,
+            "last_section_prompts": self.last_section_prompts,
+        }
+
+    async def aclose(self) -> None:
+        backend = self._backend.peek()
+        if backend is not None:
+            await backend.aclose()
+
+    # ------------------------------------------------------------------
+    # 🔹 TOKEN COUNTING
+    # ------------------------------------------------------------------
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token counts with the generating model's tokenizer (one batched call)."""
+        return self.backend.count_tokens(texts)
+
+    async def acount_tokens(self, texts: List[str]) -> List[int]:
+        """`count_tokens` for the event loop: waits for the model, tokenizes off the loop."""
+        backend = await self._backend.aget()
+        return await asyncio.to_thread(backend.count_tokens, texts)
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        return self.backend.truncate_to_tokens(text, max_tokens)
+
+    def _count_prompt_tokens(self, prompt: str, system_prompt: str) -> int:
+        """Tokens of the full chat-templated prompt, as the model will see it."""
+        return self.backend.count_prompt_tokens([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ])
 
     # ------------------------------------------------------------------
     # 🔹 UTIL: SAFE JSON EXTRACTION
@@ -127,26 +272,29 @@ Identify 3–5 missing critical details.
 
 Return ONLY a JSON array:
 [
-  {{ "id": "q1", "text": "question" }}
+  {{ "question_id": "q1", "question_text": "question" }}
 ]
 """
 
         response = await self._generate(
             prompt,
             system_prompt="You are a strict JSON generator. Output only valid JSON.",
+            task="clarification_questions",
+            json_schema="clarification_questions",
         )
 
         try:
-            match = re.search(r"\[.*\]", response, re.DOTALL)
-            if not match:
-                raise ValueError("No JSON array found")
+            with tracing.span("llm.parse", task="clarification_questions"):
+                match = re.search(r"\[.*\]", response, re.DOTALL)
+                if not match:
+                    raise ValueError("No JSON array found")
 
-            data = json.loads(match.group(0))
+                data = json.loads(match.group(0))
 
             return [
                 ClarificationQuestion(
-                    question_id=item["id"],
-                    question_text=item["text"],
+                    question_id=item.get("question_id", item.get("id")),
+                    question_text=item.get("question_text", item.get("text")),
                 )
                 for item in data
             ]
@@ -208,63 +356,118 @@ Return ONLY a JSON array:
     # ------------------------------------------------------------------
     # 🔹 BUSINESS PLAN
     # ------------------------------------------------------------------
-    async def generate_business_plan(
+    def _build_plan_prompt(
         self,
         idea_text: str,
         clarifications: Dict[str, str],
         rag_context: str,
-    ) -> BusinessPlan:
+    ) -> str:
 
         context_str = "\n".join(
             f"Q: {q}\nA: {a}" for q, a in clarifications.items()
         )
 
+        # The JSON structure is in PLAN_SYSTEM_PROMPT (a cached static prefix)
         prompt = f"""
-        You are a business expert. Generate a Business Plan for the idea: "{idea_text}" in JSON format.
+        Generate a Business Plan for the idea: "{idea_text}" in JSON format.
         
         Context: {context_str}
         Market Data: {rag_context}
         
-        Strictly follow this JSON structure. Do not output markdown, just the JSON object:
-        {{
-            "executive_summary": "A brief summary of the business...",
-            "market_analysis": {{
-                "market_size": "Estimate of market value...",
-                "growth_trends": ["trend 1", "trend 2"],
-                "competitors": ["comp 1", "comp 2"],
-                "opportunities": ["opp 1"],
-                "risks": ["risk 1"],
-                "relevant_use_cases": ["case 1"]
-            }},
-            "business_model": {{
-                "value_proposition": ["prop 1"],
-                "customer_segments": ["seg 1"],
-                "revenue_streams": ["stream 1"],
-                "cost_structure": ["cost 1"],
-                "key_activities": ["act 1"],
-                "key_resources": ["res 1"],
-                "key_partners": ["partner 1"],
-                "channels": ["channel 1"],
-                "customer_relationships": ["rel 1"]
-            }},
-            "kpis": [
-                {{
-                    "name": "Revenue Growth",
-                    "description": "Monthly growth rate",
-                    "formula": "(Rev - LastRev)/LastRev",
-                    "importance": "High",
-                    "frequency": "Monthly"
-                }}
-            ],
-            "assumptions_constraints": ["assume stable economy"],
-            "recommendations": "Start small and validate."
-        }}
+        Output only the JSON object.
         """
+        return prompt
 
+    def _assemble_context(
+        self,
+        system_prompt: str,
+        build_prompt,
+        docs: List[Any],
+        token_budget: int,
+        label: str,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Fit the retrieved chunks (best first) into what is left of the
+        prompt-token budget once `build_prompt("")` is counted.
+        """
+        with tracing.span("prompt.assemble", label=label) as span:
+            base_tokens = self._count_prompt_tokens(build_prompt(""), system_prompt)
+            rag_context, stats = self.context_assembler.assemble(docs, token_budget - base_tokens)
+            stats["prompt_budget_tokens"] = token_budget
+            stats["base_prompt_tokens"] = base_tokens
+            stats["prompt_tokens"] = self._count_prompt_tokens(build_prompt(rag_context), system_prompt)
+            span.set(prompt_tokens=stats["prompt_tokens"], chunks_used=stats["chunks_used"])
+        if base_tokens > token_budget:
+            logger.warning(
+                f"{label} prompt without context is {base_tokens} tokens, over the {token_budget} token budget"
+            )
+        logger.info(
+            f"{label} prompt: {stats['prompt_tokens']}/{token_budget} tokens "
+            f"({stats['context_tokens']} context, {stats['chunks_used']}/{stats['chunks_retrieved']} chunks, "
+            f"{stats['chunks_deduplicated']} duplicates, {stats['chunks_truncated']} truncated, "
+            f"{stats['chunks_dropped']} dropped)"
+        )
+        return rag_context, stats
+
+    def assemble_plan_context(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        docs: List[Any],
+        token_budget: int = PLAN_PROMPT_TOKEN_BUDGET,
+    ) -> str:
+        """
+        Fit the retrieved chunks into the plan prompt-token budget.
+        Blocking (tokenization); the resulting counts are logged and kept
+        in `last_plan_prompt` for /api/metrics.
+        """
+        rag_context, self.last_plan_prompt = self._assemble_context(
+            PLAN_SYSTEM_PROMPT,
+            lambda context: self._build_plan_prompt(idea_text, clarifications, context),
+            docs,
+            token_budget,
+            "Plan",
+        )
+        return rag_context
+
+    async def generate_business_plan(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+    ) -> BusinessPlan:
+
+        prompt = self._build_plan_prompt(idea_text, clarifications, rag_context)
         response = await self._generate(
             prompt,
-            system_prompt="You are a JSON-speaking business expert.",
+            system_prompt=PLAN_SYSTEM_PROMPT,
+            task="business_plan",
+            cache_system_prompt=True,
+            json_schema="business_plan",
         )
+        return self.parse_business_plan(response)
+
+    async def stream_business_plan(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+    ) -> AsyncIterator[str]:
+        """Stream the raw plan JSON; pass the joined text to `parse_business_plan`."""
+        prompt = self._build_plan_prompt(idea_text, clarifications, rag_context)
+        messages = [
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+        async for chunk in self._stream(
+            messages,
+            task="business_plan",
+            cache_system_prompt=True,
+            json_schema="business_plan",
+        ):
+            yield chunk
+
+    def parse_business_plan(self, response: str) -> BusinessPlan:
         
         logger.info(f"--------------------------------------------------")
         logger.info(f"Raw LLM Response (First 500 chars): {response[:500]}...")
@@ -274,37 +477,142 @@ Return ONLY a JSON array:
             return self._create_fallback_plan(response)
 
         try:
-            data = self._extract_json_object(response)
-            clean = self._sanitize_plan_data(data)
-            return BusinessPlan(**clean)
+            with tracing.span("llm.parse", task="business_plan"):
+                data = self._extract_json_object(response)
+                clean = self._sanitize_plan_data(data)
+                return BusinessPlan(**clean)
 
         except Exception as e:
             logger.error(f"Plan parsing failed: {e}\n{response}")
             return self._create_fallback_plan(str(e))
 
+    # ------------------------------------------------------------------
+    # 🔹 SECTIONED BUSINESS PLAN
+    # ------------------------------------------------------------------
+    def _build_section_prompt(
+        self,
+        section: str,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+    ) -> str:
+
+        context_str = "\n".join(
+            f"Q: {q}\nA: {a}" for q, a in clarifications.items()
+        )
+        focus, _ = PLAN_SECTIONS[section]
+
+        # The JSON structure is in SECTION_SYSTEM_PROMPTS[section] (a cached static prefix)
+        prompt = f"""
+        Write {focus} for the idea: "{idea_text}" in JSON format.
+        
+        Context: {context_str}
+        Market Data: {rag_context}
+        
+        Output only the JSON object.
+        """
+        return prompt
+
+    @staticmethod
+    def section_query(section: str, idea_text: str, clarifications: Dict[str, str]) -> str:
+        """The RAG query for one section: the idea and answers plus the section's terms."""
+        _, terms = PLAN_SECTIONS[section]
+        return " ".join([idea_text, *clarifications.values(), terms])
+
+    def assemble_section_context(
+        self,
+        section: str,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        docs: List[Any],
+        token_budget: int = PLAN_SECTION_PROMPT_TOKEN_BUDGET,
+    ) -> str:
+        """Same as `assemble_plan_context`, for one section's prompt."""
+        rag_context, stats = self._assemble_context(
+            SECTION_SYSTEM_PROMPTS[section],
+            lambda context: self._build_section_prompt(section, idea_text, clarifications, context),
+            docs,
+            token_budget,
+            f"Plan section {section}",
+        )
+        self.last_section_prompts[section] = stats
+        return rag_context
+
+    async def generate_plan_sections(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        contexts: Dict[str, str],
+    ) -> AsyncIterator[Tuple[str, Any, bool]]:
+        """
+        Generate every BusinessPlan section from its own prompt and yield
+        (section, data, ok) in completion order. The section requests are
+        submitted together, so the batcher runs them as one batch; a section
+        that fails yields its placeholder value with ok=False.
+        """
+        pending = [
+            asyncio.ensure_future(self._generate_section(section, idea_text, clarifications, contexts[section]))
+            for section in PLAN_SECTIONS
+        ]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _generate_section(
+        self,
+        section: str,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+    ) -> Tuple[str, Any, bool]:
+        prompt = self._build_section_prompt(section, idea_text, clarifications, rag_context)
+        try:
+            response = await self._generate(
+                prompt,
+                system_prompt=SECTION_SYSTEM_PROMPTS[section],
+                task=f"plan_section:{section}",
+                cache_system_prompt=True,
+                json_schema=f"plan_section:{section}",
+            )
+            with tracing.span("llm.parse", task=f"plan_section:{section}"):
+                data = self._extract_json_object(response)[section]
+                field = BusinessPlan.model_fields[section]
+                value = TypeAdapter(field.annotation).validate_python(data)
+                return section, TypeAdapter(field.annotation).dump_python(value), True
+        except Exception as e:
+            logger.error(f"Plan section {section} failed: {e}")
+            return section, self._sanitize_plan_data({})[section], False
+
     # ------------------------------------------------------------------
     # 🔹 FALLBACK
     # ------------------------------------------------------------------
     def _create_fallback_plan(self, error_message: str) -> BusinessPlan:
         data = self._sanitize_plan_data({})
         data["executive_summary"] = (
-            f"Plan generation failed. System Message: {error_message}"
+            f"{FALLBACK_SUMMARY_PREFIX} System Message: {error_message}"
         )
         data["recommendations"] = (
             "Check HF_TOKEN, model availability, and request format."
         )
         return BusinessPlan(**data)
 
+    def is_fallback_plan(self, plan: BusinessPlan) -> bool:
+        return plan.executive_summary.startswith(FALLBACK_SUMMARY_PREFIX)
+
     # ------------------------------------------------------------------
     # 🔹 CHAT WITH CONTEXT
     # ------------------------------------------------------------------
-    async def chat_with_context(
+    def _build_chat_messages(
         self,
         history: List[Dict[str, str]],
         context: str,
         topic: str,
-        user_message: str
-    ) -> str:
+        user_message: str,
+        summary: str = "",
+    ) -> List[Dict[str, str]]:
         
         system_prompt = f"""
 You are a specialized business consultant assistant. 
@@ -314,28 +622,79 @@ Context from the plan:
 
 Answer the user's question specifically related to this context. 
 Keep answers concise, professional, and helpful.
+"""
+        if summary:
+            system_prompt += f"""
+Summary of the earlier conversation:
+{summary}
 """
         # Construct messages for chat template
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(history)
         messages.append({"role": "user", "content": user_message})
+        return messages
 
-        # Apply chat template
-        prompt_text = self._pipeline.tokenizer.apply_chat_template(
-            messages, 
-            tokenize=False, 
-            add_generation_prompt=True
+    @staticmethod
+    def _chat_cache_key(session_id: Optional[str], topic: str) -> Optional[str]:
+        """KV state is kept per (session, topic) conversation between turns."""
+        return f"chat:{session_id}:{topic}" if session_id else None
+
+    async def chat_with_context(
+        self,
+        history: List[Dict[str, str]],
+        context: str,
+        topic: str,
+        user_message: str,
+        session_id: Optional[str] = None,
+        summary: str = "",
+    ) -> str:
+        messages = self._build_chat_messages(history, context, topic, user_message, summary)
+        return await self._complete(
+            messages, task="chat", cache_key=self._chat_cache_key(session_id, topic)
         )
 
-        outputs = self._pipeline(
-            prompt_text,
-            max_new_tokens=1024,
-            do_sample=True,
-            temperature=0.7,
-            return_full_text=False
+    async def stream_chat_with_context(
+        self,
+        history: List[Dict[str, str]],
+        context: str,
+        topic: str,
+        user_message: str,
+        session_id: Optional[str] = None,
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        messages = self._build_chat_messages(history, context, topic, user_message, summary)
+        async for chunk in self._stream(
+            messages, task="chat", cache_key=self._chat_cache_key(session_id, topic)
+        ):
+            yield chunk
+
+    async def summarize_chat(
+        self,
+        topic: str,
+        summary: str,
+        messages: List[Dict[str, str]],
+    ) -> str:
+        """Fold `messages` into the running `summary` of a topic chat."""
+        transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+        prompt = f"""
+Previous summary:
+{summary or "(none)"}
+
+New messages:
+{transcript}
+"""
+        system_prompt = (
+            f'You maintain a running summary of a conversation with a business consultant about the "{topic}" '
+            "section of a business plan. Merge the previous summary and the new messages into one concise "
+            "summary of at most 150 words. Keep facts, figures, decisions and open questions. "
+            "Output only the summary."
         )
-        
-        return outputs[0]["generated_text"]
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        return (await self._complete(messages, task="chat_summary")).strip()
+
 
 
 llm_client = LLMClient()
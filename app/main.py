@@ -1,26 +1,48 @@
+import os
+import hmac
 import uuid
+import json
+import asyncio
 import logging
 from typing import Dict, Any
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 from app.schemas import (
     IdeaInput, ClarificationQuestion, ClarificationResponse, 
-    DashboardData, BusinessPlan, ChatRequest
+    DashboardData, BusinessPlan, ChatRequest, ProfileRequest
 )
 from dotenv import load_dotenv
 
 load_dotenv() # Load environment variables
 
-from app.llm_service import llm_client
+from app.llm_service import llm_client, PLAN_SECTIONS
 from app.rag import rag_service
+from app.inference import inference_executor, InferenceQueueFull
+from app.jobs import plan_jobs
+from app.session_store import session_store
+from app.response_cache import plan_cache
+from app.chat_history import chat_history
+from app.readiness import components, ComponentNotReady, MODEL_LOADING, MODEL_RETRY_AFTER_SECONDS
+from app.warmup import warmup
+from app import tracing
+from app.profiling import profiler, ProfilerBusy
+from app.admission import admission, AdmissionRejected
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("BusinessAdvisor")
 
+# Chunks retrieved for a plan; the prompt-token budget decides how many are used
+PLAN_CONTEXT_CHUNKS = int(os.getenv("PLAN_CONTEXT_CHUNKS", "5"))
+# single: one generation for the whole plan | sectioned: one per section, stored as each finishes
+PLAN_GENERATION_MODE = os.getenv("PLAN_GENERATION_MODE", "sectioned")
+PLAN_SECTION_CONTEXT_CHUNKS = int(os.getenv("PLAN_SECTION_CONTEXT_CHUNKS", "3"))
+# Bearer token for the /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
 app = FastAPI(title="Business Advice Assistant", version="1.0")
 
 # CORS
@@ -32,8 +54,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-Memory Storage (Replace with DB in Production)
-sessions: Dict[str, Dict] = {}
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # One trace per request; stages below add spans to it. Streamed bodies
+    # finish after this returns, so their trace covers up to the headers.
+    with tracing.trace("http") as root, profiler.scope(request.url.path):
+        response = await call_next(request)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        root.name = f"{request.method} {path}"
+        root.set(status=response.status_code)
+    tracing.registry.inc(
+        "http_requests_total", method=request.method, route=path, status=response.status_code
+    )
+    return response
+
+@app.on_event("startup")
+async def start_model_loading():
+    # Models load in background threads so the server binds its port right away;
+    # /readyz reports when they are usable
+    if MODEL_LOADING == "background":
+        components.start_all()
+        # Representative prompts once loaded, so the first user sees steady-state latency
+        app.state.warmup_task = asyncio.create_task(warmup.run())
+    else:
+        warmup.enabled, warmup.state = False, "disabled"
+
+@app.on_event("shutdown")
+async def close_llm_backend():
+    # Closes the pooled HTTP client of a remote inference backend
+    await llm_client.aclose()
+
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.exception_handler(ComponentNotReady)
+async def component_not_ready_handler(request: Request, exc: ComponentNotReady):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "component": exc.name, "state": exc.state},
+        headers={"Retry-After": str(MODEL_RETRY_AFTER_SECONDS)},
+    )
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving, whether or not the models are loaded."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness: 200 once every model component is loaded and warm-up has
+    finished, 503 with per-component state until then.
+    """
+    status = components.status()
+    status["warmup"] = warmup.status()
+    status["ready"] = status["ready"] and warmup.finished
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# Session store calls block (SQLite waits up to 30s for a write lock), so
+# async endpoints run them with asyncio.to_thread
+def _get_session(session_id: str) -> Dict[str, Any]:
+    session = session_store.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+def _start_plan(session_id: str, answers: Dict[str, str]) -> Dict[str, Any]:
+    """Store the answers and reset the plan before a new generation."""
+    session_store.update_answers(session_id, answers)
+    session_store.clear_plan(session_id)
+    session_store.update_session(session_id, status="generating_plan", error=None, section_status={})
+    return session_store.get_session(session_id)
 
 @app.post("/api/idea/submit", response_model=Dict[str, Any])
 async def submit_idea(input_data: IdeaInput):
@@ -42,21 +143,19 @@ async def submit_idea(input_data: IdeaInput):
     Server: Generates session, finds Clarification Questions.
     """
     session_id = input_data.session_id if input_data.session_id else str(uuid.uuid4())
+    ticket = admission.admit("clarification", session_id)
     
-    # Store initial state
-    sessions[session_id] = {
-        "idea": input_data.idea_text,
-        "clarifications_needed": [],
-        "answers": {},
-        "plan": None,
-        "chats": {}, # topic -> history list
-        "status": "clarification_needed"
-    }
-    
-    # Generate questions
     try:
-        questions = await llm_client.generate_clarification_questions(input_data.idea_text)
-        sessions[session_id]["clarifications_needed"] = questions
+        # Store initial state
+        await asyncio.to_thread(session_store.create_session, session_id, input_data.idea_text)
+
+        # Generate questions
+        async with ticket:
+            questions = await llm_client.generate_clarification_questions(input_data.idea_text)
+        await asyncio.to_thread(
+            session_store.update_session,
+            session_id, clarifications_needed=[q.dict() for q in questions],
+        )
         
         return {
             "session_id": session_id,
@@ -65,45 +164,153 @@ async def submit_idea(input_data: IdeaInput):
             "message": "Please answer the following questions to refine the plan."
         }
         
+    except (InferenceQueueFull, ComponentNotReady, AdmissionRejected):
+        raise
     except Exception as e:
         logger.error(f"Error in submit_idea: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
+
+async def _plan_context(idea_text: str, answers: Dict[str, str]) -> str:
+    """RAG retrieval + token-budgeted context assembly for a plan prompt."""
+    docs = await rag_service.aretrieve(idea_text + " " + " ".join(answers.values()), k=PLAN_CONTEXT_CHUNKS)
+    return await asyncio.to_thread(llm_client.assemble_plan_context, idea_text, answers, docs)
 
-@app.post("/api/idea/clarify", response_model=Dict[str, Any])
+async def _plan_section_contexts(idea_text: str, answers: Dict[str, str]) -> Dict[str, str]:
+    """Per-section RAG retrieval (queries run concurrently) + context assembly."""
+    queries = [llm_client.section_query(section, idea_text, answers) for section in PLAN_SECTIONS]
+    results = await asyncio.gather(*(
+        rag_service.aretrieve(query, k=PLAN_SECTION_CONTEXT_CHUNKS) for query in queries
+    ))
+    contexts = {}
+    for section, docs in zip(PLAN_SECTIONS, results):
+        contexts[section] = await asyncio.to_thread(
+            llm_client.assemble_section_context, section, idea_text, answers, docs
+        )
+    return contexts
+
+async def _generate_plan_sections(session_id: str, idea_text: str, answers: Dict[str, str], contexts: Dict[str, str]) -> bool:
+    """
+    Generate the plan section by section, storing each section and its
+    status as soon as it finishes. Returns True if every section succeeded.
+    """
+    status = {section: "pending" for section in PLAN_SECTIONS}
+    await asyncio.to_thread(session_store.update_session, session_id, section_status=status)
+
+    all_ok = True
+    async for section, data, ok in llm_client.generate_plan_sections(idea_text, answers, contexts):
+        await asyncio.to_thread(session_store.set_plan_section, session_id, section, data)
+        status = {**status, section: "complete" if ok else "failed"}
+        await asyncio.to_thread(session_store.update_session, session_id, section_status=status)
+        all_ok = all_ok and ok
+        logger.info(f"Plan section {section} {status[section]} for session {session_id}")
+    return all_ok
+
+async def _generate_plan_job(session_id: str, ticket, bypass_cache: bool = False):
+    """
+    Background job: RAG retrieval + plan generation for one session.
+    Drives session["status"] from `generating_plan` to `complete` / `error`.
+    In sectioned mode the plan fills in one section at a time. `ticket` is
+    the admission reserved by the request; its slot and the session claim
+    are held only while the LLM runs, so the session's chat still works
+    while context is retrieved.
+    """
+    session = await asyncio.to_thread(session_store.get_session, session_id)
+    idea_text = session["idea"]
+    answers = session["answers"]
+    sectioned = PLAN_GENERATION_MODE == "sectioned"
+
+    with tracing.trace("plan_job", session_id=session_id, mode=PLAN_GENERATION_MODE), profiler.scope("plan_job"):
+        try:
+            # No client is waiting on this job, so it waits out model loading
+            await components.wait(timeout=None)
+
+            # RAG Retrieval, fitted to the prompt-token budget(s)
+            if sectioned:
+                contexts = await _plan_section_contexts(idea_text, answers)
+                rag_context = "\n\n".join(contexts.values())
+            else:
+                rag_context = await _plan_context(idea_text, answers)
+
+            # Serve near-identical ideas from the plan cache
+            plan_data = await asyncio.to_thread(
+                plan_cache.get, idea_text, answers, rag_context, bypass_cache
+            )
+            tracing.cache_lookup("plan", plan_data is not None)
+
+            # Generate Plan; only a cache miss needs an LLM slot
+            if plan_data is None:
+                await ticket.acquire()
+            if plan_data is not None:
+                await asyncio.to_thread(session_store.set_plan, session_id, plan_data)
+            elif sectioned:
+                all_ok = await _generate_plan_sections(session_id, idea_text, answers, contexts)
+                ticket.release()
+                if all_ok:
+                    plan_data = (await asyncio.to_thread(session_store.get_session, session_id))["plan"]
+                    await asyncio.to_thread(plan_cache.put, idea_text, answers, rag_context, plan_data)
+            else:
+                plan = await llm_client.generate_business_plan(idea_text, answers, rag_context)
+                ticket.release()
+                plan_data = plan.dict() # Store as dict
+                await asyncio.to_thread(session_store.set_plan, session_id, plan_data)
+                if not llm_client.is_fallback_plan(plan):
+                    await asyncio.to_thread(plan_cache.put, idea_text, answers, rag_context, plan_data)
+
+            if plan_data is not None:
+                await asyncio.to_thread(
+                    session_store.update_session,
+                    session_id, section_status={section: "complete" for section in plan_data},
+                )
+            await asyncio.to_thread(session_store.update_session, session_id, status="complete")
+            logger.info(f"Plan generated for session {session_id}")
+        except Exception as e:
+            logger.error(f"Error generating plan: {e}")
+            await asyncio.to_thread(session_store.update_session, session_id, status="error", error=str(e))
+        finally:
+            ticket.release()
+
+@app.post("/api/idea/clarify", response_model=Dict[str, Any], status_code=202)
 async def submit_clarification(response: ClarificationResponse):
     """
     Step 2: User answers questions.
-    Server: Generates Full Business Plan.
+    Server: Starts Business Plan generation in the background and returns
+    immediately; poll /api/dashboard/{session_id} for the result.
     """
     session_id = response.session_id
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-        
-    session = sessions[session_id]
-    session["answers"].update(response.answers)
-    session["status"] = "generating_plan"
-    
-    # RAG Retrieval
-    idea_text = session["idea"]
-    rag_context = rag_service.search(idea_text + " " + " ".join(response.answers.values()))
-    
-    # Generate Plan
+    await asyncio.to_thread(_get_session, session_id)
+
+    # A retrying client must not start a second generation
+    if plan_jobs.is_active(session_id):
+        return {
+            "session_id": session_id,
+            "status": "generating_plan",
+            "message": "Business Plan generation already in progress"
+        }
+
+    # Shed load here, while the client can still be told to retry
+    ticket = admission.admit("plan", session_id, background=True)
+
     try:
-        plan = await llm_client.generate_business_plan(idea_text, session["answers"], rag_context)
-        session["plan"] = plandict = plan.dict() # Store as dict
-        session["status"] = "complete"
-        
+        await asyncio.to_thread(_start_plan, session_id, response.answers)
+    except BaseException:
+        ticket.release()
+        raise
+    if not plan_jobs.submit(session_id, lambda: _generate_plan_job(session_id, ticket, response.bypass_cache)):
+        # Another request started a job while the answers were being stored
+        ticket.release()
         return {
             "session_id": session_id,
-            "status": "complete",
-            "message": "Business Plan Generated Successfully"
+            "status": "generating_plan",
+            "message": "Business Plan generation already in progress"
         }
-    except Exception as e:
-        logger.error(f"Error generating plan: {e}")
-        session["status"] = "error"
-        logger.error(f"Error generating plan: {e}")
-        session["status"] = "error"
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "session_id": session_id,
+        "status": "generating_plan",
+        "message": "Business Plan generation started"
+    }
 
 @app.post("/api/assistant/chat", response_model=Dict[str, Any])
 async def chat_assistant(request: ChatRequest):
@@ -111,55 +318,275 @@ async def chat_assistant(request: ChatRequest):
     Step 3: Per-Section Chat.
     """
     session_id = request.session_id
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-        
-    session = sessions[session_id]
-    
-    # Initialize chat history for this topic if not exists
-    if request.topic not in session["chats"]:
-        session["chats"][request.topic] = []
-        
-    history = session["chats"][request.topic]
+    await asyncio.to_thread(_get_session, session_id)
+
+    # Recent turns verbatim + a running summary of older ones
+    history, summary = await chat_history.window(session_id, request.topic)
     
     try:
-        reply = await llm_client.chat_with_context(
-            history=history,
-            context=request.context,
-            topic=request.topic,
-            user_message=request.message
-        )
+        async with admission.admit("chat", session_id):
+            reply = await llm_client.chat_with_context(
+                history=history,
+                context=request.context,
+                topic=request.topic,
+                user_message=request.message,
+                session_id=session_id,
+                summary=summary,
+            )
         
         # Update History
-        session["chats"][request.topic].append({"role": "user", "content": request.message})
-        session["chats"][request.topic].append({"role": "assistant", "content": reply})
+        await chat_history.record_turn(session_id, request.topic, request.message, reply)
         
         return {
             "reply": reply,
             "topic": request.topic
         }
+    except (InferenceQueueFull, ComponentNotReady, AdmissionRejected):
+        raise
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ------------------------------------------------------------------
+# Streaming (Server-Sent Events)
+# ------------------------------------------------------------------
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class _AdmittedStream(StreamingResponse):
+    """
+    A StreamingResponse holding an admission ticket. The ticket is released
+    however the response ends - also when the client disconnects or the
+    response fails before the generator runs, where its own `finally`
+    never does.
+    """
+
+    def __init__(self, content, ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+@app.post("/api/assistant/chat/stream")
+async def chat_assistant_stream(request: ChatRequest):
+    """
+    Step 3 (streaming): same as /api/assistant/chat, but the reply is sent
+    as `token` events while it is generated, followed by a `done` event.
+    """
+    session_id = request.session_id
+    await asyncio.to_thread(_get_session, session_id)
+
+    history, summary = await chat_history.window(session_id, request.topic)
+
+    # The slot is taken before the response starts, so overload is still a
+    # 429; it is given back once the reply is generated, or when the
+    # response ends early
+    ticket = admission.admit("chat", session_id)
+    await ticket.acquire()
+
+    async def event_stream():
+        chunks = []
+        try:
+            async for chunk in llm_client.stream_chat_with_context(
+                history=history,
+                context=request.context,
+                topic=request.topic,
+                user_message=request.message,
+                session_id=session_id,
+                summary=summary,
+            ):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        finally:
+            ticket.release()
+
+        reply = "".join(chunks)
+        await chat_history.record_turn(session_id, request.topic, request.message, reply)
+        yield _sse("done", {"reply": reply, "topic": request.topic})
+
+    return _AdmittedStream(event_stream(), ticket, media_type="text/event-stream")
+
+@app.post("/api/idea/clarify/stream")
+async def submit_clarification_stream(response: ClarificationResponse):
+    """
+    Step 2 (streaming): streams the raw plan JSON as `token` events, then
+    stores the parsed plan and sends a final `done` event.
+    """
+    session_id = response.session_id
+    await asyncio.to_thread(_get_session, session_id)
+    if plan_jobs.is_active(session_id):
+        raise HTTPException(status_code=409, detail="Business Plan generation already in progress")
+    ticket = admission.admit("plan", session_id)
+
+    try:
+        session = await asyncio.to_thread(_start_plan, session_id, response.answers)
+        idea_text = session["idea"]
+        answers = session["answers"]
+        rag_context = await _plan_context(idea_text, answers)
+
+        plan_data = await asyncio.to_thread(
+            plan_cache.get, idea_text, answers, rag_context, response.bypass_cache
+        )
+        tracing.cache_lookup("plan", plan_data is not None)
+        if plan_data is None:
+            await ticket.acquire()
+        else:
+            ticket.release()
+    except BaseException:
+        ticket.release()
+        raise
+
+    async def event_stream():
+        cached = plan_data is not None
+        if cached:
+            await asyncio.to_thread(session_store.set_plan, session_id, plan_data)
+        else:
+            chunks = []
+            try:
+                async for chunk in llm_client.stream_business_plan(idea_text, answers, rag_context):
+                    chunks.append(chunk)
+                    yield _sse("token", {"text": chunk})
+                plan = llm_client.parse_business_plan("".join(chunks))
+            except Exception as e:
+                logger.error(f"Plan stream error: {e}")
+                await asyncio.to_thread(session_store.update_session, session_id, status="error", error=str(e))
+                yield _sse("error", {"detail": str(e)})
+                return
+            finally:
+                ticket.release()
+
+            await asyncio.to_thread(session_store.set_plan, session_id, plan.dict())
+            if not llm_client.is_fallback_plan(plan):
+                await asyncio.to_thread(plan_cache.put, idea_text, answers, rag_context, plan.dict())
+
+        await asyncio.to_thread(
+            session_store.update_session,
+            session_id,
+            status="complete",
+            section_status={section: "complete" for section in BusinessPlan.model_fields},
+        )
+        yield _sse("done", {
+            "session_id": session_id,
+            "status": "complete",
+            "cached": cached,
+            "message": "Business Plan Generated Successfully"
+        })
+
+    return _AdmittedStream(event_stream(), ticket, media_type="text/event-stream")
+
 @app.get("/api/dashboard/{session_id}", response_model=DashboardData)
 def get_dashboard(session_id: str):
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-        
-    sess = sessions[session_id]
+    sess = _get_session(session_id)
     
-    # Reconstruct objects if needed, or return raw dict if schema matches
-    plan_obj = BusinessPlan(**sess["plan"]) if sess["plan"] else None
+    # Reconstruct objects if needed, or return raw dict if schema matches.
+    # A plan still being generated section by section is returned as-is.
+    plan = sess["plan"] or {}
+    complete = all(section in plan for section in BusinessPlan.model_fields)
+    plan_obj = BusinessPlan(**plan) if plan and complete else None
     
     return DashboardData(
         session_id=session_id,
         idea_summary=sess["idea"],
         plan=plan_obj,
         status=sess["status"],
-        clarification_questions=sess["clarifications_needed"] if not sess["plan"] else []
+        error=sess.get("error"),
+        clarification_questions=sess["clarifications_needed"] if not sess["plan"] else [],
+        partial_plan=plan if plan and not complete else None,
+        section_status=sess.get("section_status") or {},
     )
 
+@app.get("/api/metrics", response_model=Dict[str, Any])
+def get_metrics():
+    """
+    Runtime metrics for the inference executor (queue depth, wait times),
+    the generation batcher (batch sizes, tokens per second), plan jobs,
+    admission control (slots, queue, rejections),
+    the session store, the plan cache, RAG query embedding, chat history
+    and the startup warm-up timings.
+    """
+    return {
+        "inference": inference_executor.metrics(),
+        "generation": llm_client.metrics(),
+        "plan_jobs": plan_jobs.metrics(),
+        "admission": admission.metrics(),
+        "sessions": session_store.metrics(),
+        "plan_cache": plan_cache.metrics(),
+        "rag": rag_service.metrics(),
+        "chat_history": chat_history.metrics(),
+        "warmup": warmup.metrics(),
+    }
+
+def _runtime_gauges():
+    inference = inference_executor.metrics()
+    jobs = plan_jobs.metrics()
+    yield "inference_queue_depth", {}, inference["queue_depth"]
+    yield "inference_busy_workers", {}, inference["busy_workers"]
+    yield "plan_jobs_running", {}, jobs["running"]
+    yield "plan_jobs_waiting", {}, jobs["waiting"]
+    for name, state in components.status()["components"].items():
+        yield "component_ready", {"component": name}, state["state"] == "ready"
+    yield "warmup_finished", {}, warmup.finished
+    yield "admission_in_flight", {}, admission.in_flight
+    yield "admission_queued", {}, admission.queued
+
+tracing.registry.gauges(_runtime_gauges)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus text format: stage durations (span_duration_seconds),
+    token and cache counters, HTTP requests, queue and readiness gauges.
+    """
+    return PlainTextResponse(tracing.registry.render(), media_type="text/plain; version=0.0.4")
+
+def _require_admin(request: Request):
+    # 404 rather than 401 when disabled, so the surface is invisible by default
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/admin/profile/start", response_model=Dict[str, Any])
+def start_profile(body: ProfileRequest, request: Request):
+    """
+    Start the sampling profiler for a time window, or for the next N
+    requests to a route. The profile is written to PROFILE_DIR when it ends.
+    """
+    _require_admin(request)
+    try:
+        return profiler.start(
+            seconds=body.seconds,
+            route=body.route,
+            requests=body.requests,
+            interval_ms=body.interval_ms,
+            fmt=body.format,
+            include_idle=body.include_idle,
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/profile/stop", response_model=Dict[str, Any])
+def stop_profile(request: Request):
+    """End the running profile early and write what was sampled."""
+    _require_admin(request)
+    return profiler.stop()
+
+@app.get("/admin/profile", response_model=Dict[str, Any])
+def profile_status(request: Request):
+    _require_admin(request)
+    return profiler.status()
+
 # Static Files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -0,0 +1,43 @@
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats:
+    """
+    Thread-safe rolling latency statistics (seconds).
+    Keeps running totals plus a bounded window of recent samples for percentiles.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+            self._recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return 0.0
+        idx = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[idx]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
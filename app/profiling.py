@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Upper bound on any profiling session, so a forgotten one cannot run forever
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+
+PROFILE_FORMATS = ("speedscope", "collapsed")
+
+# Leaf frames of threads that are parked rather than working (idle pool
+# workers, the event loop waiting in select); left out unless include_idle
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is started while another one is running."""
+
+
+class _Session:
+    __slots__ = (
+        "route", "requests", "seconds", "interval", "fmt", "include_idle",
+        "started_at", "deadline", "samples", "sample_count", "in_flight", "finished_requests", "stop",
+    )
+
+    def __init__(self, route, requests, seconds, interval, fmt, include_idle):
+        self.route = route
+        self.requests = requests
+        self.seconds = seconds
+        self.interval = interval
+        self.fmt = fmt
+        self.include_idle = include_idle
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.in_flight = 0
+        self.finished_requests = 0
+        self.stop = threading.Event()
+
+    @property
+    def sampling(self) -> bool:
+        # Route sessions only sample while a matching request or job is running
+        return self.route is None or self.in_flight > 0
+
+
+class SamplingProfiler:
+    """
+        description:
+            A statistical profiler for the running server, without a
+            dependency or a restart. A background thread reads every
+            thread's Python stack (`sys._current_frames`) each interval and
+            counts identical stacks; the event loop, the inference workers
+            and the RAG threads are all included.
+
+            A session either runs for a time window, or follows the next N
+            requests whose path matches a route pattern (fnmatch, e.g.
+            `/api/idea/clarify` or `/api/dashboard/*`; `plan_job` matches
+            background plan generation) and samples only while one of them
+            is in flight (for a streamed response, until its headers are
+            sent; follow plan_job for plan generation). When it ends the stacks are written to
+            PROFILE_DIR as speedscope JSON or collapsed stacks (for
+            flamegraph.pl / speedscope / inferno).
+
+            Outside a session `scope()` is a single attribute check.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.output_dir = output_dir
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._session: Optional[_Session] = None
+        self._thread: Optional[threading.Thread] = None
+        self.last_output: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # 🔹 CONTROL
+    # ------------------------------------------------------------------
+    def start(
+        self,
+        seconds: Optional[float] = None,
+        route: Optional[str] = None,
+        requests: Optional[int] = None,
+        interval_ms: Optional[float] = None,
+        fmt: str = "speedscope",
+        include_idle: bool = False,
+    ) -> Dict[str, Any]:
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format '{fmt}', expected one of {PROFILE_FORMATS}")
+        if route is None and not seconds:
+            raise ValueError("Give either a time window (seconds) or a route to follow")
+        if route is not None and requests is None:
+            requests = 1
+
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusy("A profiling session is already running")
+            interval = max(interval_ms or self.interval_ms, 0.5) / 1000
+            session = _Session(route, requests, seconds, interval, fmt, include_idle)
+            self._session = session
+            self.last_error = None
+            self._thread = threading.Thread(
+                target=self._run, args=(session,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Profiling started: {self._describe(session)}")
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """End the running session early; its samples are still written."""
+        session, thread = self._session, self._thread
+        if session is not None:
+            session.stop.set()
+            thread.join()
+        return self.status()
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Mark a request or job as running, for sessions that follow a route."""
+        session = self._session
+        if session is None or session.route is None or not fnmatch(name, session.route):
+            yield
+            return
+        with self._lock:
+            session.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                session.in_flight -= 1
+                session.finished_requests += 1
+                if session.finished_requests >= session.requests:
+                    session.stop.set()
+
+    # ------------------------------------------------------------------
+    # 🔹 SAMPLING
+    # ------------------------------------------------------------------
+    def _run(self, session: _Session):
+        own = threading.get_ident()
+        try:
+            while not session.stop.wait(session.interval) and time.monotonic() < session.deadline:
+                if session.sampling:
+                    self._sample(session, own)
+                    session.sample_count += 1
+            self.last_output = self._write(session)
+            logger.info(f"Profile written to {self.last_output} ({session.sample_count} samples)")
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("Profiling failed")
+        finally:
+            with self._lock:
+                self._session = None
+
+    def _sample(self, session: _Session, own: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if not stack:
+                continue
+            leaf = stack[0]
+            if not session.include_idle and (os.path.basename(leaf[1]), leaf[0]) in _IDLE_LEAVES:
+                continue
+            stack.reverse()
+            session.samples[(names.get(ident, f"thread-{ident}"), tuple(stack))] += 1
+
+    # ------------------------------------------------------------------
+    # 🔹 OUTPUT
+    # ------------------------------------------------------------------
+    def _write(self, session: _Session) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        label = (session.route or "window").strip("/").replace("/", "_").replace("*", "x") or "root"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+        if session.fmt == "collapsed":
+            path = os.path.join(self.output_dir, f"profile-{stamp}-{label}.collapsed.txt")
+            content = self._collapsed(session)
+        else:
+            path = os.path.join(self.output_dir, f"profile-{stamp}-{label}.speedscope.json")
+            content = json.dumps(self._speedscope(session, label))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    @staticmethod
+    def _frame_name(frame: Frame) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def _collapsed(self, session: _Session) -> str:
+        lines = []
+        for (thread, stack), count in session.samples.most_common():
+            frames = ";".join(self._frame_name(frame) for frame in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _speedscope(self, session: _Session, label: str) -> Dict[str, Any]:
+        """One sampled profile per thread, weighted in seconds (speedscope file format)."""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread, stack), count in session.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+            })
+            weight = count * session.interval
+            profile["samples"].append(indices)
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"business_assistant {label}",
+            "exporter": "app.profiling",
+            "shared": {"frames": frames},
+            "profiles": sorted(profiles.values(), key=lambda p: -p["endValue"]),
+        }
+
+    # ------------------------------------------------------------------
+    # 🔹 STATUS
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _describe(session: _Session) -> str:
+        if session.route is None:
+            return f"{session.seconds}s window, every {session.interval * 1000:g}ms"
+        return f"next {session.requests} '{session.route}' request(s), every {session.interval * 1000:g}ms"
+
+    def status(self) -> Dict[str, Any]:
+        session = self._session
+        status = {
+            "running": session is not None,
+            "last_output": self.last_output,
+            "last_error": self.last_error,
+        }
+        if session is not None:
+            status.update(
+                session=self._describe(session),
+                format=session.fmt,
+                elapsed_seconds=round(time.time() - session.started_at, 3),
+                samples=session.sample_count,
+                in_flight=session.in_flight,
+                finished_requests=session.finished_requests,
+            )
+        return status
+
+
+profiler = SamplingProfiler()
@@ -1,13 +1,26 @@
 import os
+import re
+import asyncio
 import logging
-from typing import List
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import threading
+from collections import OrderedDict
+from typing import List, Optional
 from itertools import islice
 
+from app.batching import MicroBatcher
+from app.lexical import BM25Index, BM25_INDEX_FILE, reciprocal_rank_fusion
+from app.context_budget import format_document
+from app.readiness import components
+from app import tracing
+
 MAX_BATCH = 500
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+QUERY_BATCH_SIZE = int(os.getenv("RAG_QUERY_BATCH_SIZE", "32"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("RAG_QUERY_BATCH_WAIT_MS", "5"))
+HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "true").lower() == "true"
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RRF_CANDIDATES = int(os.getenv("RAG_RRF_CANDIDATES", "20"))
+
 def batched(iterable, n):
     """Yield successive n-sized chunks from iterable."""
     """
@@ -34,19 +47,59 @@ def batched(iterable, n):
 
 logger = logging.getLogger(__name__)
 
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and lowercase (all-MiniLM-L6-v2 is uncased, so this is lossless)."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+class QueryEmbeddingCache:
+    """
+        description:
+            Thread-safe LRU cache of query embeddings keyed by normalized query
+            text, so repeated or identical searches skip the embedding model.
+    """
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
 # singleton instance of RAGService for use across the app
-IS_EMBEDDINGS_LOADED = False
 class EmbbedingLoader:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
         self.embedding_function = HuggingFaceEmbeddings(model_name=model_name)
 
     def load_embeddings(self, documents: List[str]):
         """Convert documents to embeddings."""
-        global IS_EMBEDDINGS_LOADED
-        if IS_EMBEDDINGS_LOADED:
-            logger.info("Embeddings already loaded, skipping.")
-            return
-        IS_EMBEDDINGS_LOADED = True
         return self.embedding_function.embed_documents(documents)
 
 class RAGService:
@@ -61,12 +114,43 @@ class RAGService:
         # Inject Token for Hugging Face Embeddings
         if os.getenv("HF_TOKEN"):
             os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.environ.get("HF_TOKEN")
-        
+
+        # Embedder, vector store and lexical index are loaded in the background
+        # (see app/readiness.py); public methods wait for them via `_ready`.
+        self.embedding_function = None
+        self.vector_store = None
+        self.lexical_index_path = os.path.join(persist_directory, BM25_INDEX_FILE)
+        self.lexical_index = BM25Index()
+        self._stores = components.register("rag", self._load)
+
+        # Query side: embedding cache + micro-batcher for concurrent searches
+        self.query_cache = QueryEmbeddingCache()
+        self._query_batcher = MicroBatcher(
+            self._embed_query_batch,
+            max_batch_size=QUERY_BATCH_SIZE,
+            max_wait_ms=QUERY_BATCH_WAIT_MS,
+            name="rag-query-batcher",
+        )
+
+    def _load(self):
+        from langchain_chroma import Chroma
+        from langchain_huggingface import HuggingFaceEmbeddings
+
         self.embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
         self.vector_store = Chroma(
-            persist_directory=persist_directory,
+            persist_directory=self.persist_directory,
             embedding_function=self.embedding_function
         )
+        # Lexical (BM25) index persisted next to the vector store, for hybrid search
+        self.lexical_index = BM25Index.load(self.lexical_index_path)
+        return self
+
+    def _ready(self):
+        """Wait for the embedder and stores (off the event loop only); raises ComponentNotReady."""
+        self._stores.get()
+
+    async def _aready(self):
+        await self._stores.aget()
 
     def ingest_documents(self, directory_path: str):
         """Read PDFs from directory and add to vector store."""
@@ -88,53 +172,153 @@ class RAGService:
             logger.warning(f"Data directory {directory_path} does not exist.")
             return
 
-        documents = []
+        from app.ingestion import IngestionPipeline, IngestionManifest, MANIFEST_FILE
+
+        self._stores.get(timeout=None)
+
         files = [f for f in os.listdir(directory_path) if f.endswith(".pdf")]
         
         for f in files:
             print('-----------------------------------')
             print(f"Found file: {f}")
             
-        logger.info(f"Found {len(files)} PDFs to ingest.")
-        
-        
-        # Load and process each PDF
-        for file in files:
-            file_path = os.path.join(directory_path, file)
-            try:
-                loader = PyPDFLoader(file_path)
-                docs = loader.load()
-                documents.extend(docs)
-                logger.info(f"Loaded {file}")
-            except Exception as e:
-                logger.error(f"Error loading {file}: {e}")
-
-        # Split documents into chunks and add to vector store
-        if documents:
-            # split documents
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            splits = text_splitter.split_documents(documents)
-            
-            # Ingest in batches to avoid memory issues 
-            """
-                description:
-                    To efficiently handle large volumes of document chunks without overwhelming
-                    memory, the method processes and adds them to the vector store in batches.
-            """
-            for batch in batched(splits, MAX_BATCH):
-                try:
-                    self.vector_store.add_documents(batch)
-                    logger.info(f"Ingested {len(splits)} chunks from {len(files)} files.")
-                except Exception as e:
-                    print(f"Failed batch: {e}")
-            
-        else:
-            logger.info("No documents found/loaded.")
+        logger.info(f"Found {len(files)} PDFs in {directory_path}.")
+
+        # Parse/split in parallel and embed in MAX_BATCH-sized batches
+        """
+            description:
+                The manifest next to the vector store records what was already
+                ingested, so only new or changed PDFs are parsed and embedded and
+                deleted PDFs have their vectors removed. PDFs are parsed and split
+                across CPU cores while the embedding stage consumes chunks from a
+                bounded queue. See app/ingestion.py.
+        """
+        if not os.path.exists(self.lexical_index_path) and self.vector_store._collection.count() > 0:
+            self.rebuild_lexical_index()
+
+        manifest = IngestionManifest(os.path.join(self.persist_directory, MANIFEST_FILE))
+        pipeline = IngestionPipeline(
+            self.vector_store, max_batch=MAX_BATCH, manifest=manifest, lexical_index=self.lexical_index
+        )
+        stats = pipeline.run([os.path.join(directory_path, f) for f in files])
+        os.makedirs(self.persist_directory, exist_ok=True)
+        self.lexical_index.save(self.lexical_index_path)
+        return stats
+
+    def rebuild_lexical_index(self):
+        """Build the BM25 index from every chunk already in the vector store."""
+        self._stores.get(timeout=None)
+        logger.info("Building BM25 index from the existing vector store...")
+        index = BM25Index()
+        offset = 0
+        while True:
+            page = self.vector_store.get(limit=MAX_BATCH, offset=offset, include=["documents"])
+            if not page["ids"]:
+                break
+            for doc_id, text in zip(page["ids"], page["documents"]):
+                index.add(doc_id, text or "")
+            offset += len(page["ids"])
+        self.lexical_index = index
+        os.makedirs(self.persist_directory, exist_ok=True)
+        index.save(self.lexical_index_path)
+        logger.info(f"BM25 index built with {len(index)} chunks.")
+
+    # ------------------------------------------------------------------
+    # Query embedding
+    # ------------------------------------------------------------------
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, using the LRU cache (blocking)."""
+        self._ready()
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        tracing.cache_lookup("query_embedding", vector is not None)
+        if vector is None:
+            vector = self.embedding_function.embed_documents([key])[0]
+            self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+            description:
+                Async variant of `embed_query`. Cache misses from concurrent
+                callers are merged by the micro-batcher into a single
+                `embed_documents` call that runs off the event loop.
+        """
+        await self._aready()
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        tracing.cache_lookup("query_embedding", vector is not None)
+        if vector is None:
+            with tracing.span("rag.embed"):
+                vector = await self._query_batcher.submit(key)
+        return vector
+
+    async def _embed_query_batch(self, keys: List[str]) -> List[List[float]]:
+        unique = list(dict.fromkeys(keys))
+        vectors = await asyncio.to_thread(self.embedding_function.embed_documents, unique)
+        by_key = dict(zip(unique, vectors))
+        for key, vector in by_key.items():
+            self.query_cache.put(key, vector)
+        return [by_key[key] for key in keys]
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _format_results(self, results) -> str:
+        return "\n\n".join([format_document(doc) for doc in results])
+
+    def _retrieve(self, query: str, embedding: List[float], k: int):
+        """
+            description:
+                Hybrid retrieval: the vector store and the BM25 index each return
+                their top candidates, and the two rankings are merged with
+                reciprocal-rank fusion. Falls back to pure vector search when the
+                lexical index is empty or hybrid search is disabled.
+        """
+        if not HYBRID_SEARCH or len(self.lexical_index) == 0:
+            return self.vector_store.similarity_search_by_vector(embedding, k=k)
+
+        candidates = max(k, RRF_CANDIDATES)
+        vector_docs = self.vector_store.similarity_search_by_vector(embedding, k=candidates)
+        docs_by_id = {(doc.id or doc.metadata.get("chunk_id")): doc for doc in vector_docs}
+        lexical_ids = [doc_id for doc_id, _ in self.lexical_index.search(query, candidates)]
+
+        fused = reciprocal_rank_fusion([list(docs_by_id), lexical_ids], k=RRF_K)
+        top_ids = [doc_id for doc_id, _ in fused[:k]]
+
+        missing = [doc_id for doc_id in top_ids if doc_id not in docs_by_id]
+        if missing:
+            for doc in self.vector_store.get_by_ids(missing):
+                docs_by_id[doc.id] = doc
+        return [docs_by_id[doc_id] for doc_id in top_ids if doc_id in docs_by_id]
+
+    def retrieve(self, query: str, k: int = 3):
+        """Retrieve the k most relevant chunks as Documents, best first."""
+        self._ready()
+        return self._retrieve(query, self.embed_query(query), k)
+
+    async def aretrieve(self, query: str, k: int = 3):
+        """`retrieve` without blocking the event loop."""
+        with tracing.span("rag.retrieve", k=k):
+            embedding = await self.aembed_query(query)
+            with tracing.span("rag.search"):
+                return await asyncio.to_thread(self._retrieve, query, embedding, k)
 
     def search(self, query: str, k: int = 3) -> str:
         """Retrieve relevant context string."""
-        results = self.vector_store.similarity_search(query, k=k)
-        context = "\n\n".join([f"Source: {doc.metadata.get('source', 'unknown')}\nContent: {doc.page_content}" for doc in results])
-        return context
+        return self._format_results(self.retrieve(query, k))
+
+    async def asearch(self, query: str, k: int = 3) -> str:
+        """Retrieve relevant context string without blocking the event loop."""
+        return self._format_results(await self.aretrieve(query, k))
+
+    def metrics(self):
+        return {
+            "hybrid_search": HYBRID_SEARCH,
+            "stores": self._stores.status(),
+            "lexical_index_chunks": len(self.lexical_index),
+            "query_cache": self.query_cache.metrics(),
+            "query_batcher": self._query_batcher.metrics(),
+        }
 
 rag_service = RAGService(persist_directory="/content/business_assistant/chroma_db")
@@ -0,0 +1,167 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# background: start loading every model when the app starts | lazy: load on first use
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+# Seconds a request waits for a model that is still loading before it gets a 503
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "30"))
+# Retry-After sent with that 503
+MODEL_RETRY_AFTER_SECONDS = int(os.getenv("MODEL_RETRY_AFTER_SECONDS", "5"))
+
+_POLL_SECONDS = 0.05
+
+
+class ComponentNotReady(RuntimeError):
+    """Raised when a request needs a component that is still loading or failed to load."""
+
+    def __init__(self, name: str, state: str, error: Optional[str] = None):
+        self.name = name
+        self.state = state
+        self.error = error
+        if state == "failed":
+            message = f"{name} failed to load: {error}"
+        else:
+            message = f"{name} is still loading, retry in a few seconds"
+        super().__init__(message)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class Component:
+    """
+        description:
+            A heavy resource (model, vector store) loaded once in a background
+            thread. `start()` is idempotent; `get()` / `aget()` start the load
+            if needed and return the loaded value, waiting at most `timeout`
+            seconds, or raise ComponentNotReady.
+
+            state: pending -> loading -> ready | failed. A failed load is not
+            retried; /readyz reports it and the process should be restarted.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any]):
+        self.name = name
+        self._load = load
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._value: Any = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._run, name=f"load-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        started = time.perf_counter()
+        logger.info(f"Loading {self.name}...")
+        try:
+            self._value = self._load()
+            self.state = "ready"
+            logger.info(f"{self.name} ready in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+            logger.exception(f"Loading {self.name} failed")
+        finally:
+            self.load_seconds = time.perf_counter() - started
+            self._done.set()
+
+    def _result(self) -> Any:
+        if self.state == "ready":
+            return self._value
+        raise ComponentNotReady(self.name, self.state, self.error)
+
+    def get(self, timeout: Optional[float] = MODEL_READY_TIMEOUT) -> Any:
+        """
+            description:
+                Blocking accessor for worker threads. Called on the event loop
+                thread it never waits, so a request cannot stall the loop.
+        """
+        if self.state == "ready":
+            return self._value
+        self.start()
+        if not _on_event_loop():
+            self._done.wait(timeout)
+        return self._result()
+
+    async def aget(self, timeout: Optional[float] = MODEL_READY_TIMEOUT) -> Any:
+        """`get` for coroutines: waits without blocking the event loop (timeout=None waits for good)."""
+        if self.state == "ready":
+            return self._value
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._done.is_set() and (deadline is None or time.monotonic() < deadline):
+            await asyncio.sleep(_POLL_SECONDS)
+        return self._result()
+
+    def peek(self) -> Any:
+        """The loaded value, or None without starting or waiting for a load."""
+        return self._value if self.state == "ready" else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ComponentRegistry:
+    """Every lazily loaded component of the process, for startup loading and /readyz."""
+
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+
+    def register(self, name: str, load: Callable[[], Any]) -> Component:
+        component = Component(name, load)
+        self._components[name] = component
+        return component
+
+    def __getitem__(self, name: str) -> Component:
+        return self._components[name]
+
+    def start_all(self):
+        """Load every component concurrently in the background."""
+        for component in self._components.values():
+            component.start()
+
+    async def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """Wait until the named (default: all) components are ready; raises ComponentNotReady."""
+        for name in names or list(self._components):
+            await self._components[name].aget(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return all(component.ready for component in self._components.values())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "components": {name: c.status() for name, c in self._components.items()},
+        }
+
+
+components = ComponentRegistry()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.rag import rag_service
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "512"))
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", str(24 * 3600)))
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", "0.92"))
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class ResponseCache:
+    """
+        description:
+            LRU/TTL cache for expensive LLM responses (business plans).
+
+            Lookup is two-tiered:
+              1. exact match on a hash of the normalized idea, clarification
+                 answers and retrieved context;
+              2. semantic match: cosine similarity between the embedding of the
+                 idea + answers and the embeddings of cached entries, accepted
+                 when it reaches `similarity_threshold`.
+
+            `embed_fn` is blocking (sentence-transformers); call `get` / `put`
+            from a worker thread when used from async code.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = PLAN_CACHE_TTL_SECONDS,
+        similarity_threshold: float = PLAN_CACHE_SIMILARITY,
+        enabled: bool = PLAN_CACHE_ENABLED,
+    ):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()  # semantic text -> unit vector
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # 🔹 KEYS
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _semantic_text(idea_text: str, clarifications: Dict[str, str]) -> str:
+        answers = " ".join(_normalize(clarifications[k]) for k in sorted(clarifications))
+        return f"{_normalize(idea_text)} {answers}".strip()
+
+    @staticmethod
+    def _exact_key(idea_text: str, clarifications: Dict[str, str], rag_context: str) -> str:
+        payload = json.dumps(
+            {
+                "idea": _normalize(idea_text),
+                "answers": {k: _normalize(v) for k, v in clarifications.items()},
+                "context": _normalize(rag_context),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        with self._lock:
+            if text in self._embeddings:
+                self._embeddings.move_to_end(text)
+                return self._embeddings[text]
+
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._lock:
+            self._embeddings[text] = vector
+            while len(self._embeddings) > self.max_entries:
+                self._embeddings.popitem(last=False)
+        return vector
+
+    # ------------------------------------------------------------------
+    # 🔹 LOOKUP / STORE
+    # ------------------------------------------------------------------
+    def _expire(self, now: float):
+        """Drop entries older than the TTL. Caller holds the lock."""
+        if not self.ttl_seconds:
+            return
+        for key in [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]:
+            del self._entries[key]
+
+    def get(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+        bypass: bool = False,
+    ) -> Optional[Any]:
+        if not self.enabled or bypass:
+            self.bypassed += 1
+            return None
+
+        key = self._exact_key(idea_text, clarifications, rag_context)
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["value"]
+
+        query = self._embed(self._semantic_text(idea_text, clarifications))
+        if query is not None:
+            with self._lock:
+                best_key, best_score = None, -1.0
+                for k, e in self._entries.items():
+                    if e["embedding"] is None:
+                        continue
+                    score = float(np.dot(query, e["embedding"]))
+                    if score > best_score:
+                        best_key, best_score = k, score
+                if best_key is not None and best_score >= self.similarity_threshold:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    logger.info(f"Plan cache semantic hit (similarity {best_score:.3f})")
+                    return self._entries[best_key]["value"]
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        idea_text: str,
+        clarifications: Dict[str, str],
+        rag_context: str,
+        value: Any,
+    ) -> None:
+        if not self.enabled:
+            return
+
+        key = self._exact_key(idea_text, clarifications, rag_context)
+        embedding = self._embed(self._semantic_text(idea_text, clarifications))
+        with self._lock:
+            self._entries[key] = {"value": value, "embedding": embedding, "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._embeddings.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+# Reuses the MiniLM embedder already loaded by RAGService
+plan_cache = ResponseCache(embed_fn=lambda text: rag_service.embed_query(text))
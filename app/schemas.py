@@ -13,6 +13,7 @@ class ClarificationQuestion(BaseModel):
 class ClarificationResponse(BaseModel):
     session_id: str
     answers: Dict[str, str] = Field(..., description="Map of question_id to user answer.")
+    bypass_cache: bool = Field(False, description="Always generate a fresh plan, ignoring cached plans.")
 
 class KPI(BaseModel):
     name: str
@@ -53,10 +54,21 @@ class DashboardData(BaseModel):
     idea_summary: str
     plan: Optional[BusinessPlan]
     status: str
+    error: Optional[str] = None
     clarification_questions: Optional[List[ClarificationQuestion]]
+    partial_plan: Optional[Dict[str, Any]] = Field(None, description="Sections finished so far, while the plan is generated section by section.")
+    section_status: Dict[str, str] = Field(default_factory=dict, description="Map of plan section to pending / complete / failed.")
 
 class ChatRequest(BaseModel):
     session_id: str
     topic: str
     context: str
     message: str
+
+class ProfileRequest(BaseModel):
+    seconds: Optional[float] = Field(None, gt=0, description="Profile for this time window; with a route, the longest to wait for its requests.")
+    route: Optional[str] = Field(None, description="Only sample while requests to this path pattern run (fnmatch, e.g. /api/dashboard/*; plan_job for background plan generation).")
+    requests: Optional[int] = Field(None, ge=1, description="Number of matching requests to follow (default 1).")
+    interval_ms: Optional[float] = Field(None, gt=0, description="Sampling interval in milliseconds.")
+    format: str = Field("speedscope", description="speedscope (JSON) or collapsed (flamegraph stacks).")
+    include_idle: bool = Field(False, description="Keep samples of threads that are parked waiting.")
@@ -0,0 +1,446 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # memory | sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Scalar session fields that can be written with `update_session`
+SESSION_FIELDS = ("idea", "status", "error", "clarifications_needed", "section_status")
+# Fields stored as JSON text by the SQLite store
+_JSON_FIELDS = ("clarifications_needed", "section_status")
+
+
+class SessionStore(ABC):
+    """
+        description:
+            Storage for per-session state used by the API endpoints.
+
+            A session is returned by `get_session` as a plain dict with the keys
+            `idea`, `status`, `error`, `clarifications_needed`,
+            `section_status`, `answers` and `plan`. Answers, plan sections and
+            chat messages are written individually, so large sessions are
+            never rewritten as a whole. While a plan is generated section by
+            section, `plan` holds the sections finished so far and
+            `section_status` maps each section to pending / complete / failed.
+    """
+
+    @abstractmethod
+    def create_session(self, session_id: str, idea: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def exists(self, session_id: str) -> bool:
+        return self.get_session(session_id) is not None
+
+    @abstractmethod
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        """Set scalar fields (see SESSION_FIELDS)."""
+
+    @abstractmethod
+    def update_answers(self, session_id: str, answers: Dict[str, str]) -> None:
+        """Merge clarification answers into the session."""
+
+    @abstractmethod
+    def set_plan_section(self, session_id: str, section: str, data: Any) -> None:
+        ...
+
+    def set_plan(self, session_id: str, plan: Dict[str, Any]) -> None:
+        for section, data in plan.items():
+            self.set_plan_section(session_id, section, data)
+
+    @abstractmethod
+    def clear_plan(self, session_id: str) -> None:
+        """Drop all plan sections, before a new plan is generated."""
+
+    @abstractmethod
+    def get_chat_history(self, session_id: str, topic: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def append_chat_messages(self, session_id: str, topic: str, messages: List[Dict[str, str]]) -> None:
+        ...
+
+    @abstractmethod
+    def get_chat_summary(self, session_id: str, topic: str) -> str:
+        """Running summary of the chat messages folded out of the history ("" if none)."""
+
+    @abstractmethod
+    def fold_chat_history(self, session_id: str, topic: str, summary: str, count: int) -> None:
+        """Replace the summary and drop the `count` oldest messages it now covers."""
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+def _check_fields(fields: Dict[str, Any]):
+    unknown = set(fields) - set(SESSION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown session fields: {sorted(unknown)}")
+
+
+# ------------------------------------------------------------------
+# 🔹 IN-MEMORY (LRU + TTL)
+# ------------------------------------------------------------------
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store. Least recently used sessions are evicted beyond
+    `max_entries`, and sessions idle for longer than `ttl_seconds` expire.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an entry and mark it as recently used. Caller holds the lock."""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if self.ttl_seconds and now - entry["touched"] > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        entry["touched"] = now
+        self._sessions.move_to_end(session_id)
+        return entry
+
+    def _require(self, session_id: str) -> Dict[str, Any]:
+        entry = self._entry(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        return entry
+
+    def create_session(self, session_id: str, idea: str) -> None:
+        with self._lock:
+            self._sessions[session_id] = {
+                "fields": {
+                    "idea": idea,
+                    "status": "clarification_needed",
+                    "error": None,
+                    "clarifications_needed": [],
+                    "section_status": {},
+                },
+                "answers": {},
+                "plan": {},
+                "chats": {},  # topic -> history list
+                "chat_summaries": {},  # topic -> summary of folded messages
+                "touched": time.monotonic(),
+            }
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is None:
+                return None
+            return {
+                **entry["fields"],
+                "answers": dict(entry["answers"]),
+                "plan": dict(entry["plan"]) or None,
+            }
+
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        _check_fields(fields)
+        with self._lock:
+            self._require(session_id)["fields"].update(fields)
+
+    def update_answers(self, session_id: str, answers: Dict[str, str]) -> None:
+        with self._lock:
+            self._require(session_id)["answers"].update(answers)
+
+    def set_plan_section(self, session_id: str, section: str, data: Any) -> None:
+        with self._lock:
+            self._require(session_id)["plan"][section] = data
+
+    def clear_plan(self, session_id: str) -> None:
+        with self._lock:
+            self._require(session_id)["plan"].clear()
+
+    def get_chat_history(self, session_id: str, topic: str) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self._require(session_id)["chats"].get(topic, []))
+
+    def append_chat_messages(self, session_id: str, topic: str, messages: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self._require(session_id)["chats"].setdefault(topic, []).extend(messages)
+
+    def get_chat_summary(self, session_id: str, topic: str) -> str:
+        with self._lock:
+            return self._require(session_id)["chat_summaries"].get(topic, "")
+
+    def fold_chat_history(self, session_id: str, topic: str, summary: str, count: int) -> None:
+        with self._lock:
+            entry = self._require(session_id)
+            entry["chat_summaries"][topic] = summary
+            del entry["chats"].get(topic, [])[:count]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ------------------------------------------------------------------
+# 🔹 SQLITE (WAL)
+# ------------------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    idea TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    clarifications_needed TEXT NOT NULL DEFAULT '[]',
+    section_status TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    session_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    PRIMARY KEY (session_id, question_id)
+);
+CREATE TABLE IF NOT EXISTS plan_sections (
+    session_id TEXT NOT NULL,
+    section TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, section)
+);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    session_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (session_id, topic)
+);
+CREATE INDEX IF NOT EXISTS idx_chat_session_topic ON chat_messages (session_id, topic, id);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    File-backed store shared by every uvicorn worker on the host.
+    Uses WAL journaling so readers never block the writer; each thread
+    keeps its own connection. Sessions idle past `ttl_seconds` are purged.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._conn().executescript(_SCHEMA)
+        self._migrate()
+        logger.info(f"SQLite session store at {path}")
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database file was created."""
+        conn = self._conn()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "section_status" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN section_status TEXT NOT NULL DEFAULT '{}'")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _touch(self, conn: sqlite3.Connection, session_id: str) -> None:
+        cur = conn.execute(
+            "UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id)
+        )
+        if cur.rowcount == 0:
+            raise KeyError(session_id)
+
+    def purge_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._transaction() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,)
+            )]
+            for table in ("answers", "plan_sections", "chat_messages", "chat_summaries", "sessions"):
+                conn.executemany(f"DELETE FROM {table} WHERE session_id = ?", [(s,) for s in expired])
+        if expired:
+            logger.info(f"Purged {len(expired)} expired sessions")
+        return len(expired)
+
+    def create_session(self, session_id: str, idea: str) -> None:
+        with self._transaction() as conn:
+            for table in ("answers", "plan_sections", "chat_messages", "chat_summaries"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, idea, status, error, clarifications_needed, updated_at) "
+                "VALUES (?, ?, 'clarification_needed', NULL, '[]', ?)",
+                (session_id, idea, time.time()),
+            )
+
+        # Opportunistic TTL cleanup, at most once a minute per process
+        if time.monotonic() - self._last_purge > 60:
+            self._last_purge = time.monotonic()
+            self.purge_expired()
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT idea, status, error, clarifications_needed, section_status, updated_at "
+            "FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        idea, status, error, questions, section_status, updated_at = row
+        if self.ttl_seconds and time.time() - updated_at > self.ttl_seconds:
+            return None
+
+        answers = dict(conn.execute(
+            "SELECT question_id, answer FROM answers WHERE session_id = ?", (session_id,)
+        ).fetchall())
+        plan = {
+            section: json.loads(data)
+            for section, data in conn.execute(
+                "SELECT section, data FROM plan_sections WHERE session_id = ?", (session_id,)
+            )
+        }
+        return {
+            "idea": idea,
+            "status": status,
+            "error": error,
+            "clarifications_needed": json.loads(questions),
+            "section_status": json.loads(section_status),
+            "answers": answers,
+            "plan": plan or None,
+        }
+
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        _check_fields(fields)
+        for name in _JSON_FIELDS:
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            conn.execute(
+                f"UPDATE sessions SET {assignments} WHERE session_id = ?",
+                (*fields.values(), session_id),
+            )
+
+    def update_answers(self, session_id: str, answers: Dict[str, str]) -> None:
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            conn.executemany(
+                "INSERT OR REPLACE INTO answers (session_id, question_id, answer) VALUES (?, ?, ?)",
+                [(session_id, q, a) for q, a in answers.items()],
+            )
+
+    def set_plan_section(self, session_id: str, section: str, data: Any) -> None:
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_sections (session_id, section, data) VALUES (?, ?, ?)",
+                (session_id, section, json.dumps(data)),
+            )
+
+    def clear_plan(self, session_id: str) -> None:
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            conn.execute("DELETE FROM plan_sections WHERE session_id = ?", (session_id,))
+
+    def get_chat_history(self, session_id: str, topic: str) -> List[Dict[str, str]]:
+        rows = self._conn().execute(
+            "SELECT role, content FROM chat_messages WHERE session_id = ? AND topic = ? ORDER BY id",
+            (session_id, topic),
+        )
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append_chat_messages(self, session_id: str, topic: str, messages: List[Dict[str, str]]) -> None:
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, topic, role, content) VALUES (?, ?, ?, ?)",
+                [(session_id, topic, m["role"], m["content"]) for m in messages],
+            )
+
+    def get_chat_summary(self, session_id: str, topic: str) -> str:
+        row = self._conn().execute(
+            "SELECT summary FROM chat_summaries WHERE session_id = ? AND topic = ?",
+            (session_id, topic),
+        ).fetchone()
+        return row[0] if row else ""
+
+    def fold_chat_history(self, session_id: str, topic: str, summary: str, count: int) -> None:
+        with self._transaction() as conn:
+            self._touch(conn, session_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_summaries (session_id, topic, summary) VALUES (?, ?, ?)",
+                (session_id, topic, summary),
+            )
+            conn.execute(
+                "DELETE FROM chat_messages WHERE id IN ("
+                "SELECT id FROM chat_messages WHERE session_id = ? AND topic = ? ORDER BY id LIMIT ?)",
+                (session_id, topic, count),
+            )
+
+    def metrics(self) -> Dict[str, Any]:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": count}
+
+
+def create_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+
+
+session_store = create_session_store()
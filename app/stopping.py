@@ -0,0 +1,244 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_BUDGET_QUANTILE = float(os.getenv("LLM_BUDGET_QUANTILE", "0.99"))
+LLM_BUDGET_HEADROOM = float(os.getenv("LLM_BUDGET_HEADROOM", "1.25"))
+LLM_BUDGET_MIN_SAMPLES = int(os.getenv("LLM_BUDGET_MIN_SAMPLES", "20"))
+
+# task -> (floor, ceiling) for max_new_tokens; the ceiling is also the
+# budget used until enough outputs have been observed
+TASK_TOKEN_LIMITS: Dict[str, Tuple[int, int]] = {
+    "clarification_questions": (128, 1024),
+    "business_plan": (1024, 4096),
+    "chat": (256, 1024),
+    "chat_summary": (64, 256),
+    # Sectioned plan generation (one request per BusinessPlan field)
+    "plan_section:executive_summary": (128, 512),
+    "plan_section:market_analysis": (256, 1536),
+    "plan_section:business_model": (256, 1536),
+    "plan_section:kpis": (256, 1536),
+    "plan_section:assumptions_constraints": (64, 512),
+    "plan_section:recommendations": (128, 512),
+}
+
+# Warm-up traffic runs as "warmup:<task>": a short fixed budget, never learned from
+WARMUP_TASK_PREFIX = "warmup:"
+WARMUP_MAX_NEW_TOKENS = int(os.getenv("WARMUP_MAX_NEW_TOKENS", "32"))
+
+
+class BalancedJsonStoppingCriteria:
+    """
+        description:
+            transformers stopping criteria that ends a row as soon as its
+            generated text holds a complete top-level JSON object or array,
+            i.e. the first `{` / `[` has been closed again (brackets inside
+            strings are ignored). Anything sampled after that is discarded by
+            the parser anyway.
+
+            Works on raw token bytes (see app.constrained.token_bytes_table),
+            one bracket-depth state per batch row. Rows not in `watched`
+            (free-text requests in a mixed batch) are never stopped.
+    """
+
+    def __init__(
+        self,
+        token_bytes: List[Optional[bytes]],
+        batch_size: int,
+        watched: Optional[List[bool]] = None,
+    ):
+        self.token_bytes = token_bytes
+        self._watched = list(watched) if watched is not None else [True] * batch_size
+        self._depth = [0] * batch_size
+        self._in_string = [False] * batch_size
+        self._escape = [False] * batch_size
+        self._done = [False] * batch_size
+        self._prompt_length: Optional[int] = None
+
+    def _feed(self, row: int, data: bytes):
+        depth, in_string, escape = self._depth[row], self._in_string[row], self._escape[row]
+        for byte in data:
+            if in_string:
+                if escape:
+                    escape = False
+                elif byte == 0x5C:  # backslash
+                    escape = True
+                elif byte == 0x22:  # quote
+                    in_string = False
+            elif byte == 0x22 and depth > 0:
+                in_string = True
+            elif byte in (0x7B, 0x5B):  # { [
+                depth += 1
+            elif byte in (0x7D, 0x5D) and depth > 0:  # } ]
+                depth -= 1
+                if depth == 0:
+                    self._done[row] = True
+                    break
+        self._depth[row], self._in_string[row], self._escape[row] = depth, in_string, escape
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1] - 1
+        for row in range(input_ids.shape[0]):
+            if self._done[row] or not self._watched[row]:
+                continue
+            for token_id in input_ids[row, self._prompt_length:].tolist():
+                data = self.token_bytes[token_id] if token_id < len(self.token_bytes) else None
+                if data:
+                    self._feed(row, data)
+        self._prompt_length = input_ids.shape[1]
+        return torch.tensor(self._done, dtype=torch.bool, device=input_ids.device)
+
+
+class RowTokenLimits:
+    """
+        description:
+            transformers stopping criteria giving each batch row its own
+            max_new_tokens, for batches that mix requests with different
+            budgets. The batch runs with the largest limit; rows with a
+            smaller one are ended once they reach it.
+    """
+
+    def __init__(self, limits: List[int]):
+        self.limits = list(limits)
+        self._prompt_length: Optional[int] = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1] - 1
+        generated = input_ids.shape[1] - self._prompt_length
+        return torch.tensor(
+            [generated >= limit for limit in self.limits], dtype=torch.bool, device=input_ids.device
+        )
+
+
+class RowFinishedCallback:
+    """
+        description:
+            transformers stopping criteria that never stops anything itself: it
+            calls `on_finished(row, generated_token_ids)` once per batch row as
+            soon as that row has ended, so a short output in a padded batch can
+            be handed back before the longest row is done.
+
+            A row counts as ended once its last two tokens are EOS / padding
+            (generate() keeps padding finished rows); a single stray pad token
+            in the middle of a row is not enough. Trailing stop tokens are
+            stripped from the ids passed on.
+    """
+
+    def __init__(self, stop_token_ids: List[int], on_finished: Callable[[int, List[int]], None], batch_size: int):
+        self.stop_token_ids = set(stop_token_ids)
+        self.on_finished = on_finished
+        self._reported = [False] * batch_size
+        self._prompt_length: Optional[int] = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1] - 1
+        if input_ids.shape[1] - self._prompt_length >= 2:
+            for row, last_two in enumerate(input_ids[:, -2:].tolist()):
+                if self._reported[row] or not all(t in self.stop_token_ids for t in last_two):
+                    continue
+                self._reported[row] = True
+                token_ids = input_ids[row, self._prompt_length:].tolist()
+                while token_ids and token_ids[-1] in self.stop_token_ids:
+                    token_ids.pop()
+                try:
+                    self.on_finished(row, token_ids)
+                except Exception as e:
+                    logger.error(f"Row completion callback failed: {e}")
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class FirstTokenTimer:
+    """
+        description:
+            transformers stopping criteria that never stops anything itself: it
+            records when generate() has produced the first new token, which
+            splits a generation into prefill (the prompt) and decode time.
+            Must come first in the criteria list.
+    """
+
+    def __init__(self):
+        self.at: Optional[float] = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.at is None:
+            self.at = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class TokenBudgets:
+    """
+        description:
+            Per-task max_new_tokens learned from the output lengths (in tokens)
+            of past requests: `quantile` of the recent lengths times `headroom`,
+            clamped to the task's (floor, ceiling). Until `min_samples` outputs
+            are seen the ceiling is used.
+
+            An output that used its whole budget was probably cut off, so it is
+            recorded at twice the budget, which raises the next budgets
+            quickly instead of learning the truncated length. Warm-up tasks
+            (WARMUP_TASK_PREFIX) get WARMUP_MAX_NEW_TOKENS and are not
+            recorded.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]] = TASK_TOKEN_LIMITS,
+        quantile: float = LLM_BUDGET_QUANTILE,
+        headroom: float = LLM_BUDGET_HEADROOM,
+        min_samples: int = LLM_BUDGET_MIN_SAMPLES,
+        window: int = 512,
+    ):
+        self.limits = dict(limits)
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {task: deque(maxlen=window) for task in self.limits}
+        self._truncated: Dict[str, int] = {task: 0 for task in self.limits}
+        self._lock = threading.Lock()
+
+    def budget(self, task: str) -> int:
+        if task.startswith(WARMUP_TASK_PREFIX):
+            return WARMUP_MAX_NEW_TOKENS
+        floor, ceiling = self.limits[task]
+        with self._lock:
+            samples = sorted(self._samples[task])
+        if len(samples) < self.min_samples:
+            return ceiling
+        index = min(len(samples) - 1, int(self.quantile * (len(samples) - 1) + 0.5))
+        return max(floor, min(ceiling, int(samples[index] * self.headroom)))
+
+    def observe(self, task: Optional[str], output_tokens: int, max_new_tokens: int):
+        # Unknown and warm-up tasks are not learned from
+        if task not in self.limits:
+            return
+        with self._lock:
+            if output_tokens >= max_new_tokens:
+                self._truncated[task] += 1
+                output_tokens = 2 * max_new_tokens
+            self._samples[task].append(output_tokens)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            task: {
+                "budget": self.budget(task),
+                "samples": len(self._samples[task]),
+                "truncated": self._truncated[task],
+            }
+            for task in self.limits
+        }
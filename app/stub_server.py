@@ -0,0 +1,165 @@
+"""
+Deterministic OpenAI-compatible inference server for tests and load tests.
+
+    python -m app.stub_server            # listens on STUB_HOST:STUB_PORT
+    LLM_BACKEND=openai LLM_API_BASE=http://localhost:8001/v1 uvicorn app.main:app
+
+Replies depend only on the request messages, so the same prompt always gets
+the same answer. With a `response_format` JSON schema the reply is a valid
+instance of that schema; otherwise it is a short text derived from the last
+user message. STUB_TOKEN_DELAY_MS simulates generation time per token and
+STUB_ERROR_RATE makes a share of requests fail with 503 to exercise retries.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_HOST = os.getenv("STUB_HOST", "127.0.0.1")
+STUB_PORT = int(os.getenv("STUB_PORT", "8001"))
+STUB_TOKEN_DELAY_MS = float(os.getenv("STUB_TOKEN_DELAY_MS", "0"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_MODEL = os.getenv("STUB_MODEL", "stub-model")
+
+_WORDS = (
+    "market growth customers revenue pricing channel partner costs demand "
+    "retention launch pilot segment brand margin scale"
+).split()
+_TOKEN_RE = re.compile(r"\s*\S+")
+
+app = FastAPI(title="LLM Stub Server", version="1.0")
+
+
+def _rng(messages: List[Dict[str, Any]]) -> random.Random:
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _sample(schema: Optional[Dict[str, Any]], defs: Dict[str, Any], rng: random.Random) -> Any:
+    """A small valid instance of a (pydantic-style) JSON schema."""
+    while schema and "$ref" in schema:
+        schema = defs[schema["$ref"].split("/")[-1]]
+    if not schema:
+        return " ".join(rng.choices(_WORDS, k=3))
+    if "anyOf" in schema:
+        return _sample(schema["anyOf"][0], defs, rng)
+
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        return {
+            name: _sample(prop, defs, rng)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        low = schema.get("minItems", 1)
+        high = max(low, schema.get("maxItems", low + 2))
+        return [_sample(schema.get("items"), defs, rng) for _ in range(rng.randint(low, high))]
+    if kind == "integer":
+        return rng.randint(1, 100)
+    if kind == "number":
+        return round(rng.uniform(1, 100), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    return " ".join(rng.choices(_WORDS, k=rng.randint(3, 8))).capitalize()
+
+
+def _reply(body: Dict[str, Any]) -> str:
+    messages = body.get("messages") or []
+    rng = _rng(messages)
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(_sample(schema, schema.get("$defs", {}), rng))
+    if response_format.get("type") == "json_object":
+        return json.dumps({"reply": " ".join(rng.choices(_WORDS, k=8))})
+
+    last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    words = " ".join(last_user.split()[:12])
+    text = f"Stub reply to: {words}. " + " ".join(rng.choices(_WORDS, k=rng.randint(10, 30))) + "."
+    # Free text is cut at max_tokens, JSON is always returned whole
+    return "".join(_TOKEN_RE.findall(text)[:body.get("max_tokens") or None])
+
+
+def _count(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": STUB_MODEL, "object": "model", "owned_by": "stub"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if STUB_ERROR_RATE and random.random() < STUB_ERROR_RATE:
+        return JSONResponse(status_code=503, content={"error": {"message": "stub: simulated overload"}})
+
+    text = _reply(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    model = body.get("model", STUB_MODEL)
+    usage = {
+        "prompt_tokens": sum(_count(m.get("content") or "") for m in body.get("messages") or []),
+        "completion_tokens": _count(text),
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    delay = STUB_TOKEN_DELAY_MS / 1000.0
+
+    if not body.get("stream"):
+        await asyncio.sleep(delay * usage["completion_tokens"])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+        event = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(event)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant"})
+        for token in _TOKEN_RE.findall(text):
+            await asyncio.sleep(delay)
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [], "usage": usage}
+            yield f"data: {json.dumps(event)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=STUB_HOST, port=STUB_PORT)
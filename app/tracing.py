@@ -0,0 +1,289 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Log the span tree of any trace slower than this many seconds (0 = off)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+
+# Histogram buckets (seconds): sub-millisecond stages up to multi-minute plan jobs
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Span:
+    """One timed stage of a request; children are the stages it ran."""
+
+    __slots__ = ("name", "attrs", "children", "start", "end")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], start: Optional[float] = None):
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def format_tree(self, depth: int = 0, origin: Optional[float] = None) -> str:
+        """Indented span tree: duration, offset from the root's start, attributes."""
+        origin = self.start if origin is None else origin
+        attrs = " ".join(f"{k}={v}" for k, v in self.attrs.items())
+        offset = (self.start - origin) * 1000
+        line = f"{'  ' * depth}{self.name} {self.duration * 1000:.1f}ms (+{offset:.1f}ms) {attrs}".rstrip()
+        return "\n".join([line] + [child.format_tree(depth + 1, origin) for child in self.children])
+
+
+class _NoopSpan:
+    name = ""
+    attrs: Dict[str, Any] = {}
+    duration = 0.0
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+# ------------------------------------------------------------------
+# 🔹 PROMETHEUS METRICS
+# ------------------------------------------------------------------
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+        description:
+            Counters, duration histograms and gauge callbacks, rendered in the
+            Prometheus text exposition format by `render()`. Counters and
+            histograms are updated under one lock (a dict lookup and an add);
+            gauges are read from the existing metrics objects at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(value)
+
+    def gauges(self, collect: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """Register a callback yielding (name, labels, value) at scrape time."""
+        self._gauges.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {k: (list(h.counts), h.sum, h.count) for k, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            lines += self._header(name, "counter")
+            lines += [f"{name}{_format_labels(k)} {v:g}" for k, v in sorted(series.items())]
+
+        for name, series in sorted(histograms.items()):
+            lines += self._header(name, "histogram")
+            for key, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, n in zip(DURATION_BUCKETS, counts):
+                    cumulative += n
+                    le = 'le="%g"' % bound
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                inf = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_format_labels(key, inf)} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        gauges: Dict[str, List[str]] = {}
+        for collect in self._gauges:
+            try:
+                for name, labels, value in collect():
+                    gauges.setdefault(name, []).append(f"{name}{_format_labels(_labels(labels))} {float(value):g}")
+            except Exception as e:
+                logger.error(f"Gauge collection failed: {e}")
+        for name, samples in sorted(gauges.items()):
+            lines += self._header(name, "gauge") + samples
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, kind: str) -> List[str]:
+        lines = [f"# HELP {name} {self._help[name]}"] if name in self._help else []
+        return lines + [f"# TYPE {name} {kind}"]
+
+
+registry = MetricsRegistry()
+registry.describe("span_duration_seconds", "Duration of traced stages (retrieval, prompt, prefill, decode, ...).")
+registry.describe("llm_prompt_tokens_total", "Prompt tokens sent to the model, by task.")
+registry.describe("llm_output_tokens_total", "Tokens generated by the model, by task.")
+registry.describe("llm_cached_prompt_tokens_total", "Prompt tokens served from cached KV state, by task.")
+registry.describe("cache_requests_total", "Cache lookups by cache and result (hit / miss).")
+registry.describe("http_requests_total", "HTTP requests by method, route and status code.")
+
+
+# ------------------------------------------------------------------
+# 🔹 SPANS
+# ------------------------------------------------------------------
+def _finish(span: Span, root: bool):
+    span.end = time.perf_counter()
+    registry.observe("span_duration_seconds", span.duration, span=span.name)
+    if root:
+        if SLOW_REQUEST_SECONDS and span.duration >= SLOW_REQUEST_SECONDS:
+            logger.warning(f"Slow {span.name} ({span.duration:.2f}s):\n{span.format_tree()}")
+
+
+def _reset(token, previous: Optional[Span]):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Closed from another context (e.g. an abandoned async generator)
+        _current.set(previous)
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Span]:
+    """Start a new trace (a root span), even inside another one; e.g. one per request or job."""
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+    previous = _current.get()
+    root = Span(name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        _reset(token, previous)
+        _finish(root, root=True)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """A child span of the current one (or a no-op outside any trace)."""
+    parent = _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        _reset(token, parent)
+        _finish(child, root=False)
+
+
+def current_span():
+    return _current.get() or _NOOP
+
+
+def record(name: str, start: float, end: float, **attrs):
+    """Add a stage measured elsewhere (e.g. on a worker thread) as a child of the current span."""
+    if end < start:
+        return
+    registry.observe("span_duration_seconds", end - start, span=name)
+    parent = _current.get()
+    if parent is None:
+        return
+    child = Span(name, attrs, start=start)
+    child.end = end
+    parent.children.append(child)
+
+
+def cache_lookup(cache: str, hit: bool):
+    registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+    current_span().set(**{f"{cache}_hit": hit})
+
+
+def record_generation(task: str, timings: Dict[str, Any]):
+    """
+        description:
+            Turn the timestamps a backend collected for one generation
+            (time.perf_counter values: enqueued_at, started_at, tokenized_at,
+            first_token_at, finished_at) into child spans of the current span
+            - queue wait, tokenize, prefill, decode - plus token counters.
+            For a remote backend prefill is the time to the first streamed
+            token (network and server queue included), and a non-streamed
+            call is a single llm.request span.
+    """
+    started, first_token = timings.get("started_at"), timings.get("first_token_at")
+    stages = [
+        ("llm.queue_wait", timings.get("enqueued_at"), started),
+        ("llm.tokenize", started, timings.get("tokenized_at")),
+        ("llm.prefill", timings.get("tokenized_at", started), first_token),
+        ("llm.decode", first_token, timings.get("finished_at")),
+    ]
+    if first_token is None:
+        stages.append(("llm.request", started, timings.get("finished_at")))
+    for name, start, end in stages:
+        if start is not None and end is not None:
+            record(name, start, end)
+    for counter, key in (
+        ("llm_prompt_tokens_total", "prompt_tokens"),
+        ("llm_output_tokens_total", "output_tokens"),
+        ("llm_cached_prompt_tokens_total", "cached_tokens"),
+    ):
+        if timings.get(key) is not None:
+            registry.inc(counter, timings[key], task=task)
+    current_span().set(**{
+        k: v for k, v in timings.items()
+        if k in ("prompt_tokens", "output_tokens", "cached_tokens", "batch_size", "attempts")
+    })
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from app.llm_service import llm_client, PLAN_SECTIONS, SECTION_SYSTEM_PROMPTS
+from app.rag import rag_service
+from app.readiness import components
+from app.stopping import WARMUP_TASK_PREFIX
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Passes over the warm-up prompts; the first is cold, later ones show steady state
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "1"))
+# Compile the local model's forward pass with torch.compile before the first pass
+WARMUP_TORCH_COMPILE = os.getenv("WARMUP_TORCH_COMPILE", "false").lower() == "true"
+
+WARMUP_IDEA = "A subscription coffee delivery service for university students"
+WARMUP_ANSWERS = {
+    "Who is your target customer?": "Students living on or near campus",
+    "What is your revenue model?": "Monthly subscription with a free first week",
+}
+WARMUP_QUERIES = [
+    "coffee subscription market size growth",
+    "student customer segment retention",
+    "delivery cost structure pricing",
+]
+
+
+class Warmup:
+    """
+        description:
+            Runs representative traffic once the models have loaded, so the
+            first real request does not pay for CUDA kernel selection,
+            allocator growth, tokenizer caches, the cached system-prompt KV
+            state or the embedder's first batch.
+
+            Each round sends a clarification request, the plan sections as
+            one batch, a chat turn and a few RAG searches, and records how
+            long each step took. The generations run as "warmup:" tasks:
+            they are cut to WARMUP_MAX_NEW_TOKENS and do not feed the
+            learned token budgets. /readyz stays 503 until warm-up finishes;
+            a failed warm-up is logged and does not block readiness.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = WARMUP_ENABLED,
+        rounds: int = WARMUP_ROUNDS,
+        torch_compile: bool = WARMUP_TORCH_COMPILE,
+    ):
+        self.enabled = enabled
+        self.rounds = max(1, rounds)
+        self.torch_compile = torch_compile
+        self.state = "pending" if enabled else "disabled"
+        self.error = None
+        self.compiled = False
+        self.total_seconds = None
+        self.timings: List[Dict[str, float]] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed", "disabled")
+
+    async def run(self):
+        """Wait for the models, then warm them up. Runs as a task on the server's event loop."""
+        if not self.enabled:
+            return
+        started = None
+        try:
+            # Raises ComponentNotReady if a model fails to load
+            await components.wait(timeout=None)
+            self.state = "running"
+            started = time.perf_counter()
+            if self.torch_compile:
+                # Compilation itself happens lazily in the first round
+                self.compiled = await asyncio.to_thread(llm_client.backend.compile)
+            for round_index in range(self.rounds):
+                self.timings.append(await self._round())
+                logger.info(f"Warm-up round {round_index + 1}/{self.rounds}: {self.timings[-1]}")
+            self.state = "done"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+            logger.exception("Warm-up failed; serving cold")
+        finally:
+            if started is not None:
+                self.total_seconds = time.perf_counter() - started
+
+    async def _round(self) -> Dict[str, float]:
+        timings = {}
+
+        async def timed(name, awaitable):
+            step_started = time.perf_counter()
+            result = await awaitable
+            timings[name] = round(time.perf_counter() - step_started, 3)
+            return result
+
+        await timed("clarification_questions", llm_client._generate(
+            f'Analyze this business idea:\n"{WARMUP_IDEA}"\n\nIdentify 3-5 missing critical details.',
+            system_prompt="You are a strict JSON generator. Output only valid JSON.",
+            task=WARMUP_TASK_PREFIX + "clarification_questions",
+            json_schema="clarification_questions",
+        ))
+        # All sections at once, as a real plan does: warms the batched path
+        await timed("plan_sections", asyncio.gather(*(
+            llm_client._generate(
+                llm_client._build_section_prompt(section, WARMUP_IDEA, WARMUP_ANSWERS, ""),
+                system_prompt=SECTION_SYSTEM_PROMPTS[section],
+                task=f"{WARMUP_TASK_PREFIX}plan_section:{section}",
+                cache_system_prompt=True,
+                json_schema=f"plan_section:{section}",
+            )
+            for section in PLAN_SECTIONS
+        )))
+        chat = llm_client._build_chat_messages([], WARMUP_IDEA, "kpis", "Which KPI should we track first?")
+        await timed("chat", llm_client._generate(
+            chat[-1]["content"], system_prompt=chat[0]["content"], task=WARMUP_TASK_PREFIX + "chat"
+        ))
+        for i, query in enumerate(WARMUP_QUERIES):
+            await timed(f"rag_search_{i + 1}", asyncio.to_thread(rag_service.search, query))
+        return timings
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "seconds": round(self.total_seconds, 3) if self.total_seconds is not None else None,
+            "error": self.error,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.status(),
+            "rounds": self.rounds,
+            "torch_compile": self.torch_compile,
+            "compiled": self.compiled,
+            "timings": self.timings,
+        }
+
+
+warmup = Warmup()
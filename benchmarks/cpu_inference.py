@@ -0,0 +1,188 @@
+"""
+Compare CPU inference configurations for the local LLM backend:
+tokens/sec, time to first token, load time and peak memory.
+
+    python benchmarks/cpu_inference.py
+    python benchmarks/cpu_inference.py --modes fp32 int8 onnx-int8 --threads 8 --runs 5
+
+Modes:
+    fp32       float32 transformers model (the default pipeline without bitsandbytes)
+    int8       fp32 model with dynamic int8 quantization of the Linear layers
+    onnx       ONNX Runtime export via optimum (needs optimum[onnxruntime])
+    onnx-int8  ONNX Runtime export with dynamic int8 quantization
+    cuda-4bit  the default 4-bit bitsandbytes GPU pipeline, for reference (needs CUDA)
+
+Each mode runs in its own subprocess so that peak RSS is measured per
+configuration. Prompts are a clarification-question request and a chat
+turn, the traffic CPU nodes are meant to serve. Decoding is greedy so all
+modes generate comparable lengths.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    "fp32": ("torch", "none"),
+    "int8": ("torch", "int8"),
+    "onnx": ("onnx", "none"),
+    "onnx-int8": ("onnx", "int8"),
+    "cuda-4bit": None,
+}
+
+PROMPTS = [
+    [
+        {"role": "system", "content": "You are a strict JSON generator. Output only valid JSON."},
+        {"role": "user", "content": (
+            'Analyze this business idea:\n"A subscription coffee delivery service for university students"\n\n'
+            "Identify 3-5 missing critical details.\n\nReturn ONLY a JSON array:\n"
+            '[\n  { "question_id": "q1", "question_text": "question" }\n]'
+        )},
+    ],
+    [
+        {"role": "system", "content": (
+            'You are a specialized business consultant assistant.\nYou are discussing the "KPIs" section '
+            "of a business plan with the user.\nKeep answers concise, professional, and helpful."
+        )},
+        {"role": "user", "content": "Which KPI should we track first, and how often?"},
+    ],
+]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _load(mode: str, model_name: str, threads: int):
+    if MODES[mode] is None:
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
+        started = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            quantization_config=BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+            ),
+            device_map="auto",
+        )
+        return model, tokenizer, {"load_seconds": time.perf_counter() - started}
+
+    from app.cpu_inference import load_cpu_model
+
+    runtime, quantization = MODES[mode]
+    return load_cpu_model(model_name, runtime=runtime, quantization=quantization, threads=threads)
+
+
+def run_child(mode: str, model_name: str, threads: int, runs: int, max_new_tokens: int) -> dict:
+    import torch
+    from transformers import StoppingCriteria
+
+    model, tokenizer, info = _load(mode, model_name, threads)
+    device = getattr(model, "device", "cpu")
+
+    class _FirstToken(StoppingCriteria):
+        def __init__(self):
+            self.at = None
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.at is None:
+                self.at = time.perf_counter()
+            return False
+
+    def generate(messages):
+        text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        inputs = tokenizer(text, return_tensors="pt").to(device)
+        first = _FirstToken()
+        started = time.perf_counter()
+        with torch.no_grad():
+            output = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+                stopping_criteria=[first],
+            )
+        elapsed = time.perf_counter() - started
+        generated = output.shape[1] - inputs["input_ids"].shape[1]
+        return generated, elapsed, (first.at or time.perf_counter()) - started
+
+    generate(PROMPTS[0])  # warm-up (allocations, kernel selection)
+
+    tokens, seconds, ttfts = 0, 0.0, []
+    for _ in range(runs):
+        for messages in PROMPTS:
+            generated, elapsed, ttft = generate(messages)
+            tokens += generated
+            seconds += elapsed
+            ttfts.append(ttft)
+
+    return {
+        "mode": mode,
+        **info,
+        "requests": len(ttfts),
+        "generated_tokens": tokens,
+        "tokens_per_second": tokens / seconds if seconds else 0.0,
+        "avg_time_to_first_token": sum(ttfts) / len(ttfts),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("LLM_MODEL", "Qwen/Qwen3-4B-Instruct-2507"))
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8"], choices=sorted(MODES))
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = all available cores")
+    parser.add_argument("--runs", type=int, default=3, help="passes over the prompt set per mode")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.child, args.model, args.threads, args.runs, args.max_new_tokens)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"Benchmarking {mode}...", file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--model", args.model,
+             "--threads", str(args.threads), "--runs", str(args.runs),
+             "--max-new-tokens", str(args.max_new_tokens)],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"  {mode} failed:\n{proc.stderr[-2000:]}", file=sys.stderr)
+            results.append({"mode": mode, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<10} {'tok/s':>8} {'ttft s':>8} {'load s':>8} {'peak MB':>9}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<10} error: {r['error']}")
+            continue
+        print(
+            f"{r['mode']:<10} {r['tokens_per_second']:>8.1f} {r['avg_time_to_first_token']:>8.2f} "
+            f"{r['load_seconds']:>8.1f} {r['peak_rss_mb']:>9.0f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
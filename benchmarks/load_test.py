@@ -0,0 +1,374 @@
+"""
+Load test for the HTTP API: concurrent virtual users running the full
+workflow (idea -> clarification -> plan -> chat), arriving at a given rate.
+
+    # against a running server (real model)
+    python benchmarks/load_test.py --base-url http://localhost:8000 --rate 2 --duration 120
+
+    # without a GPU: starts app.stub_server and the API (LLM_BACKEND=openai) itself
+    python benchmarks/load_test.py --stub --rate 5 --duration 60 --output results.json
+
+    # compare with an earlier run (e.g. on the previous commit)
+    python benchmarks/load_test.py --stub --output new.json --compare old.json
+
+Each virtual user:
+    1. POST /api/idea/submit
+    2. POST /api/idea/clarify, then polls GET /api/dashboard/{id} until the plan is done
+    3. --chat-turns turns on POST /api/assistant/chat/stream (time to first token, tokens/sec)
+       alternating with POST /api/assistant/chat
+
+Users arrive as a Poisson process at --rate users/sec for --duration seconds
+(open loop: arrivals do not wait for earlier users to finish); at most
+--max-users run at once and arrivals beyond that are counted as dropped.
+Reported per endpoint: request count, error rate and p50/p95/p99 latency;
+plus time to first token, streamed tokens/sec and plan completion times.
+With --output the results, config and git commit are written as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IDEAS = [
+    "A subscription-based specialty coffee delivery service for remote workers.",
+    "A marketplace connecting local farmers with restaurants in mid-sized cities.",
+    "An AI tutoring app for high-school mathematics with weekly progress reports.",
+    "A mobile bike repair service that comes to offices during working hours.",
+    "A B2B platform that rents refurbished laptops to startups on monthly plans.",
+]
+ANSWER = "Global market, high income remote workers, $50k budget."
+CHAT_TOPICS = ["executive_summary", "market_analysis", "business_model", "kpis", "recommendations"]
+CHAT_MESSAGES = [
+    "Which KPI should we track first, and how often?",
+    "What is the biggest risk in the first year?",
+    "How should we price the entry plan?",
+]
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) if samples else 0.0,
+        "p50": _percentile(samples, 0.50),
+        "p95": _percentile(samples, 0.95),
+        "p99": _percentile(samples, 0.99),
+        "max": max(samples) if samples else 0.0,
+    }
+
+
+class Recorder:
+    """Collects latencies, errors and streaming stats from every virtual user."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.ttft: List[float] = []
+        self.tokens_per_second: List[float] = []
+        self.plan_seconds: List[float] = []
+        self.first_section_seconds: List[float] = []
+        self.users = {"started": 0, "completed": 0, "failed": 0, "dropped": 0}
+
+    def request(self, endpoint: str, seconds: float, status: Optional[int]):
+        self.latencies[endpoint].append(seconds)
+        if status is not None:
+            self.status_codes[endpoint][status] += 1
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+
+    def results(self) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                **_summary(samples),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(samples),
+                "status_codes": {str(code): n for code, n in sorted(self.status_codes[endpoint].items())},
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        return {
+            "users": self.users,
+            "requests": total,
+            "error_rate": sum(self.errors.values()) / total if total else 0.0,
+            "endpoints": endpoints,
+            "time_to_first_token": _summary(self.ttft),
+            "stream_tokens_per_second": _summary(self.tokens_per_second),
+            "plan_seconds": _summary(self.plan_seconds),
+            "plan_first_section_seconds": _summary(self.first_section_seconds),
+        }
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, args, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+
+    async def _call(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.request(endpoint, time.perf_counter() - started, None)
+            return None
+        self.recorder.request(endpoint, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def run(self) -> bool:
+        session_id = str(uuid.uuid4())
+        response = await self._call("POST /api/idea/submit", "POST", "/api/idea/submit", json={
+            "idea_text": self.rng.choice(IDEAS),
+            "session_id": session_id,
+        })
+        if response is None or response.status_code != 200:
+            return False
+        questions = response.json().get("questions") or []
+
+        response = await self._call("POST /api/idea/clarify", "POST", "/api/idea/clarify", json={
+            "session_id": session_id,
+            "answers": {q["question_id"]: ANSWER for q in questions},
+            "bypass_cache": self.args.bypass_cache,
+        })
+        if response is None or response.status_code >= 400:
+            return False
+        if not await self._wait_for_plan(session_id):
+            return False
+
+        for turn in range(self.args.chat_turns):
+            payload = {
+                "session_id": session_id,
+                "topic": self.rng.choice(CHAT_TOPICS),
+                "message": self.rng.choice(CHAT_MESSAGES),
+                "context": "",
+            }
+            ok = await (self._chat_stream(payload) if turn % 2 == 0 else self._chat(payload))
+            if not ok:
+                return False
+        return True
+
+    async def _wait_for_plan(self, session_id: str) -> bool:
+        started = time.perf_counter()
+        first_section = None
+        while time.perf_counter() - started < self.args.plan_timeout:
+            await asyncio.sleep(self.args.poll_interval)
+            response = await self._call(
+                "GET /api/dashboard/{id}", "GET", f"/api/dashboard/{session_id}"
+            )
+            if response is None or response.status_code != 200:
+                continue
+            dashboard = response.json()
+            sections = dashboard.get("section_status") or {}
+            if first_section is None and "complete" in sections.values():
+                first_section = time.perf_counter() - started
+                self.recorder.first_section_seconds.append(first_section)
+            if dashboard["status"] == "complete":
+                self.recorder.plan_seconds.append(time.perf_counter() - started)
+                return True
+            if dashboard["status"] == "error":
+                return False
+        return False
+
+    async def _chat(self, payload: Dict[str, Any]) -> bool:
+        response = await self._call("POST /api/assistant/chat", "POST", "/api/assistant/chat", json=payload)
+        return response is not None and response.status_code == 200
+
+    async def _chat_stream(self, payload: Dict[str, Any]) -> bool:
+        endpoint = "POST /api/assistant/chat/stream"
+        started = time.perf_counter()
+        first_token = None
+        tokens = 0
+        event = None
+        try:
+            async with self.client.stream("POST", "/api/assistant/chat/stream", json=payload) as response:
+                status = response.status_code
+                if status == 200:
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: ") and event == "token":
+                            tokens += 1
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                        elif line.startswith("data: ") and event == "error":
+                            status = 500
+        except httpx.HTTPError:
+            status = None
+        finished = time.perf_counter()
+        self.recorder.request(endpoint, finished - started, status)
+        if first_token is not None:
+            self.recorder.ttft.append(first_token - started)
+            if finished > first_token and tokens > 1:
+                self.recorder.tokens_per_second.append((tokens - 1) / (finished - first_token))
+        return status == 200
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float):
+    """Wait for /readyz (servers without it are taken as ready once they answer)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/readyz")
+            if response.status_code in (200, 404):
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+async def run_load(args) -> Dict[str, Any]:
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_users * 2, max_keepalive_connections=args.max_users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.request_timeout, limits=limits) as client:
+        await _wait_ready(client, args.ready_timeout)
+        active = set()
+
+        async def user():
+            recorder.users["started"] += 1
+            ok = await VirtualUser(client, recorder, args, random.Random(rng.random())).run()
+            recorder.users["completed" if ok else "failed"] += 1
+
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.duration:
+            await asyncio.sleep(rng.expovariate(args.rate))
+            if len(active) >= args.max_users:
+                recorder.users["dropped"] += 1
+                continue
+            task = asyncio.create_task(user())
+            active.add(task)
+            task.add_done_callback(active.discard)
+
+        if active:
+            await asyncio.wait(active, timeout=args.drain_timeout)
+            for task in active:
+                task.cancel()
+        elapsed = time.perf_counter() - started
+
+    results = recorder.results()
+    results["elapsed_seconds"] = elapsed
+    results["throughput_rps"] = results["requests"] / elapsed if elapsed else 0.0
+    return results
+
+
+def _start_stub_stack(args) -> List[subprocess.Popen]:
+    """app.stub_server plus the API pointed at it, as child processes."""
+    env = {
+        **os.environ,
+        "STUB_PORT": str(args.stub_port),
+        "STUB_TOKEN_DELAY_MS": str(args.stub_token_delay_ms),
+        "LLM_BACKEND": "openai",
+        "LLM_API_BASE": f"http://127.0.0.1:{args.stub_port}/v1",
+    }
+    stub = subprocess.Popen([sys.executable, "-m", "app.stub_server"], cwd=ROOT, env=env)
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    args.base_url = f"http://127.0.0.1:{args.api_port}"
+    return [stub, api]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(results: Dict[str, Any]):
+    users = results["users"]
+    print(f"\nusers: {users['started']} started, {users['completed']} completed, "
+          f"{users['failed']} failed, {users['dropped']} dropped")
+    print(f"requests: {results['requests']} ({results['throughput_rps']:.1f}/s), "
+          f"error rate {results['error_rate']:.2%}\n")
+    print(f"{'endpoint':<34} {'count':>6} {'err%':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for endpoint, r in results["endpoints"].items():
+        print(f"{endpoint:<34} {r['count']:>6} {r['error_rate']:>6.1%} "
+              f"{r['p50']:>8.3f} {r['p95']:>8.3f} {r['p99']:>8.3f}")
+    for name in ("time_to_first_token", "stream_tokens_per_second", "plan_seconds", "plan_first_section_seconds"):
+        r = results[name]
+        print(f"{name:<34} {r['count']:>6} {'':>6} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['p99']:>8.3f}")
+
+
+def _print_comparison(results: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\np95 vs baseline ({baseline.get('git_commit') or 'unknown commit'}):")
+    rows = [(e, r, baseline["endpoints"].get(e)) for e, r in results["endpoints"].items()]
+    rows += [(n, results[n], baseline.get(n)) for n in ("time_to_first_token", "plan_seconds")]
+    for name, new, old in rows:
+        if not old or not old["count"] or not new["count"]:
+            continue
+        change = (new["p95"] - old["p95"]) / old["p95"] if old["p95"] else 0.0
+        print(f"  {name:<34} {old['p95']:>8.3f} -> {new['p95']:>8.3f}  ({change:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=1.0, help="virtual user arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds during which users arrive")
+    parser.add_argument("--max-users", type=int, default=100, help="concurrent virtual users cap")
+    parser.add_argument("--chat-turns", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--plan-timeout", type=float, default=600.0)
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--drain-timeout", type=float, default=600.0, help="wait for in-flight users after arrivals stop")
+    parser.add_argument("--ready-timeout", type=float, default=600.0, help="wait for /readyz before starting")
+    parser.add_argument("--bypass-cache", action="store_true", help="skip the plan cache for every plan")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub", action="store_true", help="start app.stub_server and the API locally")
+    parser.add_argument("--stub-port", type=int, default=8001)
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--stub-token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --output file to compare p95 latencies against")
+    args = parser.parse_args()
+
+    processes = _start_stub_stack(args) if args.stub else []
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+
+    results = {
+        "git_commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": "stub" if args.stub else args.base_url,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        **results,
+    }
+    _print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            _print_comparison(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Time each stage of RAG ingestion and search, on the data/ PDFs and on
+synthetic corpora 10x / 100x their size.
+
+    python benchmarks/rag_bench.py
+    python benchmarks/rag_bench.py --scales 1 10 --files 10 --ks 3 5 --output rag.json
+
+Ingestion stages (what RAGService.ingest_documents does, one at a time):
+    parse   PyPDFLoader page extraction
+    split   RecursiveCharacterTextSplitter (CHUNK_SIZE / CHUNK_OVERLAP)
+    embed   all-MiniLM-L6-v2 over MAX_BATCH-sized batches
+    write   Chroma upsert of the precomputed vectors
+    bm25    lexical index build + save
+The real pipeline overlaps these stages across processes; its end-to-end
+time on the PDFs is reported as ingest_documents for comparison.
+
+Search stages, per corpus size and k:
+    embed_query    query embedding (cache bypassed)
+    vector_search  Chroma similarity_search_by_vector
+    bm25_search    lexical index lookup
+    retrieve       the full hybrid RAGService path (both + RRF + fetch)
+
+The scale-N corpus is the real chunks plus (N-1)x as many synthetic chunks
+resampled from their sentences: same vocabulary and length, no true answer.
+Parse and split are measured on the real PDFs only. recall@k is the share of
+labelled queries (benchmarks/rag_queries.json) with a chunk from one of their
+relevant PDFs in the top k, for hybrid and vector-only retrieval. Memory is
+the RSS high-water mark of this process during each stage.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.rag import RAGService, MAX_BATCH, RRF_CANDIDATES, batched, normalize_query  # noqa: E402
+from app.ingestion import CHUNK_SIZE, CHUNK_OVERLAP  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # No /proc: lifetime peak instead (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PeakRSS:
+    """RSS high-water mark over a `with` block, sampled by a background thread."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __enter__(self):
+        self.peak_mb = _rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+class Stage:
+    """Accumulates time and peak memory of one stage over several `with` blocks."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak_rss_mb = 0.0
+
+    def __enter__(self):
+        self._rss = PeakRSS().__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._started
+        self._rss.__exit__(*exc)
+        self.peak_rss_mb = max(self.peak_rss_mb, self._rss.peak_mb)
+
+    def result(self) -> Dict[str, float]:
+        return {"seconds": self.seconds, "peak_rss_mb": self.peak_rss_mb}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def _latency(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean": sum(samples) / len(samples) if samples else 0.0,
+        "p50": _percentile(samples, 0.50),
+        "p95": _percentile(samples, 0.95),
+    }
+
+
+def parse_and_split(pdfs: List[str]):
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    parse, split = Stage(), Stage()
+    chunks, pages = [], 0
+    for path in pdfs:
+        try:
+            with parse:
+                docs = PyPDFLoader(path).load()
+        except Exception as e:
+            print(f"  skipping {os.path.basename(path)}: {e}", file=sys.stderr)
+            continue
+        pages += len(docs)
+        with split:
+            chunks.extend(splitter.split_documents(docs))
+    for doc in chunks:
+        doc.metadata["source"] = os.path.basename(doc.metadata.get("source", ""))
+    return chunks, {"files": len(pdfs), "pages": pages, "parse": parse.result(), "split": split.result()}
+
+
+def synthetic_corpus(chunks, scale: int, seed: int) -> List[Dict[str, Any]]:
+    """The real chunks plus (scale-1)x as many sentence-resampled distractor chunks."""
+    records = [
+        {"id": f"real-{i:07d}", "text": doc.page_content, "metadata": {"source": doc.metadata["source"]}}
+        for i, doc in enumerate(chunks)
+    ]
+    sentences = [s for doc in chunks for s in _SENTENCE_RE.split(doc.page_content) if s.strip()]
+    rng = random.Random(seed)
+    for i in range(len(chunks) * (scale - 1)):
+        parts, length = [], 0
+        while length < CHUNK_SIZE * 0.8:
+            sentence = rng.choice(sentences)
+            parts.append(sentence)
+            length += len(sentence) + 1
+        records.append({"id": f"synth-{i:07d}", "text": " ".join(parts), "metadata": {"source": "synthetic"}})
+    return records
+
+
+def ingest(service: RAGService, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    embed, write, bm25 = Stage(), Stage(), Stage()
+    for batch in batched(records, MAX_BATCH):
+        texts = [r["text"] for r in batch]
+        with embed:
+            vectors = service.embedding_function.embed_documents(texts)
+        with write:
+            service.vector_store._collection.upsert(
+                ids=[r["id"] for r in batch],
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[r["metadata"] for r in batch],
+            )
+        with bm25:
+            for r in batch:
+                service.lexical_index.add(r["id"], r["text"])
+    with bm25:
+        service.lexical_index.save(service.lexical_index_path)
+    return {"chunks": len(records), "embed": embed.result(), "write": write.result(), "bm25": bm25.result()}
+
+
+def search(service: RAGService, queries: List[Dict[str, Any]], ks: List[int], repeats: int) -> Dict[str, Any]:
+    results = {}
+    for k in ks:
+        timings = {"embed_query": [], "vector_search": [], "bm25_search": [], "retrieve": []}
+        hits = {"hybrid": 0, "vector": 0}
+        with PeakRSS() as rss:
+            for _ in range(repeats):
+                for labelled in queries:
+                    query = labelled["query"]
+                    started = time.perf_counter()
+                    embedding = service.embedding_function.embed_documents([normalize_query(query)])[0]
+                    timings["embed_query"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    vector_docs = service.vector_store.similarity_search_by_vector(embedding, k=k)
+                    timings["vector_search"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    service.lexical_index.search(query, max(k, RRF_CANDIDATES))
+                    timings["bm25_search"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    hybrid_docs = service._retrieve(query, embedding, k)
+                    timings["retrieve"].append(time.perf_counter() - started)
+
+                    relevant = set(labelled["relevant_sources"])
+                    hits["hybrid"] += any(d.metadata.get("source") in relevant for d in hybrid_docs)
+                    hits["vector"] += any(d.metadata.get("source") in relevant for d in vector_docs)
+        total = len(queries) * repeats
+        results[str(k)] = {
+            **{stage: _latency(samples) for stage, samples in timings.items()},
+            "recall_hybrid": hits["hybrid"] / total,
+            "recall_vector": hits["vector"] / total,
+            "peak_rss_mb": rss.peak_mb,
+        }
+    return results
+
+
+def ingest_documents_end_to_end(pdfs: List[str], workdir: str) -> Dict[str, float]:
+    """The real (pipelined, multi-process) ingestion path on the PDFs, for comparison."""
+    source = os.path.join(workdir, "pdfs")
+    os.makedirs(source, exist_ok=True)
+    for path in pdfs:
+        os.symlink(os.path.abspath(path), os.path.join(source, os.path.basename(path)))
+    service = RAGService(persist_directory=os.path.join(workdir, "pipeline_db"))
+    with Stage() as stage:
+        stats = service.ingest_documents(source)
+    return {**stage.result(), "chunks": stats["chunks"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "data"))
+    parser.add_argument("--files", type=int, default=0, help="use only the first N PDFs (0 = all)")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--ks", nargs="+", type=int, default=[1, 3, 5, 10])
+    parser.add_argument("--queries", default=os.path.join(ROOT, "benchmarks", "rag_queries.json"))
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the query set per k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-pipeline", action="store_true", help="skip the end-to-end ingest_documents run")
+    parser.add_argument("--workdir", help="where the temporary vector stores go (default: a temp dir)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    pdfs = sorted(
+        os.path.join(args.data_dir, f) for f in os.listdir(args.data_dir) if f.endswith(".pdf")
+    )[:args.files or None]
+    with open(args.queries) as f:
+        queries = json.load(f)
+    workdir = tempfile.mkdtemp(prefix="rag-bench-", dir=args.workdir)
+
+    try:
+        print(f"Parsing and splitting {len(pdfs)} PDFs...", file=sys.stderr)
+        chunks, parsed = parse_and_split(pdfs)
+        results: Dict[str, Any] = {"parse_split": parsed, "scales": {}}
+
+        if not args.skip_pipeline:
+            print("Running ingest_documents end to end...", file=sys.stderr)
+            results["ingest_documents"] = ingest_documents_end_to_end(pdfs, workdir)
+
+        for scale in sorted(args.scales):
+            print(f"Scale {scale}x: ingesting...", file=sys.stderr)
+            records = synthetic_corpus(chunks, scale, args.seed)
+            service = RAGService(persist_directory=os.path.join(workdir, f"scale_{scale}"))
+            service._ready()
+            scale_results = ingest(service, records)
+            print(f"Scale {scale}x: searching...", file=sys.stderr)
+            scale_results["search"] = search(service, queries, args.ks, args.repeats)
+            results["scales"][str(scale)] = scale_results
+            del service, records
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{parsed['files']} PDFs, {parsed['pages']} pages, {len(chunks)} chunks")
+    print(f"{'stage':<18} {'seconds':>9} {'peak MB':>9}")
+    for stage in ("parse", "split"):
+        print(f"{stage:<18} {parsed[stage]['seconds']:>9.2f} {parsed[stage]['peak_rss_mb']:>9.0f}")
+    if "ingest_documents" in results:
+        r = results["ingest_documents"]
+        print(f"{'ingest_documents':<18} {r['seconds']:>9.2f} {r['peak_rss_mb']:>9.0f}  (pipelined, 1x)")
+
+    print(f"\n{'scale':>5} {'chunks':>8} {'embed s':>9} {'write s':>9} {'bm25 s':>8} {'peak MB':>9}")
+    for scale, r in results["scales"].items():
+        peak = max(r[s]["peak_rss_mb"] for s in ("embed", "write", "bm25"))
+        print(f"{scale:>4}x {r['chunks']:>8} {r['embed']['seconds']:>9.2f} {r['write']['seconds']:>9.2f} "
+              f"{r['bm25']['seconds']:>8.2f} {peak:>9.0f}")
+
+    print(f"\n{'scale':>5} {'k':>3} {'embed ms':>9} {'vector ms':>10} {'bm25 ms':>8} {'retrieve ms':>12} "
+          f"{'p95 ms':>8} {'recall':>7} {'vec only':>9}")
+    for scale, r in results["scales"].items():
+        for k, s in r["search"].items():
+            print(f"{scale:>4}x {k:>3} {s['embed_query']['p50'] * 1000:>9.1f} {s['vector_search']['p50'] * 1000:>10.1f} "
+                  f"{s['bm25_search']['p50'] * 1000:>8.1f} {s['retrieve']['p50'] * 1000:>12.1f} "
+                  f"{s['retrieve']['p95'] * 1000:>8.1f} {s['recall_hybrid']:>7.2f} {s['recall_vector']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
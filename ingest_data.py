@@ -1,17 +1,21 @@
 import asyncio
-from app.rag import rag_service
 import os
 
 DATA_DIR = "/content/business_assistant/data"
 
 def main():
+    # Imported here, not at module level: the ingestion worker processes are
+    # spawned and re-import this script, and must not load the RAG stack
+    from app.rag import rag_service
+
     print(f"Starting ingestion from {DATA_DIR}...")
     if not os.path.exists(DATA_DIR):
         print(f"Error: Directory {DATA_DIR} not found.")
         return
 
-    rag_service.ingest_documents(DATA_DIR)
-    print("Ingestion complete. Vector DB is ready.")
+    # Incremental: only new/changed PDFs are embedded, deleted ones are removed
+    stats = rag_service.ingest_documents(DATA_DIR)
+    print(f"Ingestion complete. Vector DB is ready. {stats}")
 
 if __name__ == "__main__":
     # Ensure this runs in a way that respects dependencies (sync/async mismatch handling if needed, 
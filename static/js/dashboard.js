@@ -9,10 +9,22 @@ document.addEventListener('DOMContentLoaded', async () => {
     }
 
     try {
-        const response = await fetch(`/api/dashboard/${sessionId}`);
-        if (!response.ok) throw new Error("Failed to fetch dashboard data");
+        // Plan generation runs in the background; poll until it settles,
+        // rendering each plan section as soon as it is available
+        let data;
+        while (true) {
+            const response = await fetch(`/api/dashboard/${sessionId}`);
+            if (!response.ok) throw new Error("Failed to fetch dashboard data");
+
+            data = await response.json();
+            if (data.status !== 'generating_plan') break;
+
+            renderSections(data);
+            document.getElementById('loading-text').innerText = "Generating your Business Plan...";
+            await new Promise(resolve => setTimeout(resolve, 2000));
+        }
 
-        const data = await response.json();
+        if (data.status === 'error') throw new Error(data.error || "Plan generation failed");
         renderDashboard(data);
     } catch (error) {
         console.error(error);
@@ -21,35 +33,81 @@ document.addEventListener('DOMContentLoaded', async () => {
     }
 });
 
-function renderDashboard(data) {
-    // Hide loading, show content
+// Plan section -> renderer; market_analysis also fills the Risks card
+const SECTION_RENDERERS = {
+    executive_summary: renderExecutiveSummary,
+    business_model: renderBusinessModel,
+    market_analysis: renderMarketAnalysis,
+    kpis: renderKpis,
+    recommendations: renderRecommendations,
+};
+// Where a section shows its "Generating..." placeholder
+const SECTION_PLACEHOLDERS = {
+    executive_summary: 'exec-summary',
+    business_model: 'bmc-value',
+    market_analysis: 'market-analysis-text',
+    kpis: 'kpi-container',
+    recommendations: 'recommendations-text',
+};
+const renderedSections = new Set();
+
+function showDashboard() {
     document.getElementById('loading-overlay').classList.add('d-none');
     document.getElementById('dashboard-content').classList.remove('d-none');
+}
+
+function renderDashboard(data) {
+    showDashboard();
+    renderSections(data);
+}
 
-    const plan = data.plan;
-    if (!plan) return;
+// Render the sections that arrived since the last poll; returns false until the first one does
+function renderSections(data) {
+    const plan = data.plan || data.partial_plan;
+    if (!plan) return false;
+    showDashboard();
+
+    const status = data.section_status || {};
+    Object.entries(SECTION_RENDERERS).forEach(([section, render]) => {
+        const placeholder = document.getElementById(SECTION_PLACEHOLDERS[section]);
+        if (renderedSections.has(section)) return;
+        if (!(section in plan)) {
+            placeholder.innerHTML = '<span class="spinner-border spinner-border-sm" role="status"></span> <span class="small text-muted">Generating...</span>';
+            return;
+        }
+        placeholder.innerHTML = '';
+        render(plan[section]);
+        renderedSections.add(section);
+        if (status[section] === 'failed') {
+            placeholder.insertAdjacentHTML('beforeend', '<p class="small text-danger mb-0">This section could not be generated.</p>');
+        }
+    });
+    return true;
+}
 
-    // Executive Summary
-    const execSummaryText = marked.parse(plan.executive_summary);
+function renderExecutiveSummary(executiveSummary) {
+    const execSummaryText = marked.parse(executiveSummary);
     document.getElementById('exec-summary').innerHTML = execSummaryText;
     // Add Chat Button to Exec Summary Card Title
     addChatButton(
         document.querySelector('#exec-summary').previousElementSibling, // The h2 title
         "Executive Summary",
-        () => plan.executive_summary
+        () => executiveSummary
     );
+}
 
+function renderBusinessModel(businessModel) {
     // Business Model Canvas
     const bmcMappings = [
-        { id: 'bmc-partners', topic: 'Key Partners', data: plan.business_model.key_partners },
-        { id: 'bmc-activities', topic: 'Key Activities', data: plan.business_model.key_activities },
-        { id: 'bmc-resources', topic: 'Key Resources', data: plan.business_model.key_resources },
-        { id: 'bmc-value', topic: 'Value Proposition', data: plan.business_model.value_proposition },
-        { id: 'bmc-relationships', topic: 'Customer Relationships', data: plan.business_model.customer_relationships },
-        { id: 'bmc-channels', topic: 'Channels', data: plan.business_model.channels },
-        { id: 'bmc-customers', topic: 'Customer Segments', data: plan.business_model.customer_segments },
-        { id: 'bmc-costs', topic: 'Cost Structure', data: plan.business_model.cost_structure },
-        { id: 'bmc-revenue', topic: 'Revenue Streams', data: plan.business_model.revenue_streams },
+        { id: 'bmc-partners', topic: 'Key Partners', data: businessModel.key_partners },
+        { id: 'bmc-activities', topic: 'Key Activities', data: businessModel.key_activities },
+        { id: 'bmc-resources', topic: 'Key Resources', data: businessModel.key_resources },
+        { id: 'bmc-value', topic: 'Value Proposition', data: businessModel.value_proposition },
+        { id: 'bmc-relationships', topic: 'Customer Relationships', data: businessModel.customer_relationships },
+        { id: 'bmc-channels', topic: 'Channels', data: businessModel.channels },
+        { id: 'bmc-customers', topic: 'Customer Segments', data: businessModel.customer_segments },
+        { id: 'bmc-costs', topic: 'Cost Structure', data: businessModel.cost_structure },
+        { id: 'bmc-revenue', topic: 'Revenue Streams', data: businessModel.revenue_streams },
     ];
 
     bmcMappings.forEach(item => {
@@ -58,26 +116,38 @@ function renderDashboard(data) {
         const wrapper = document.getElementById(item.id).closest('.bmc-card');
         addChatButton(wrapper, item.topic, () => item.data.join('\n'));
     });
+}
 
+function renderMarketAnalysis(marketAnalysis) {
     // Market Analysis
     const marketHtml = `
-        <p><strong>Market Size:</strong> ${plan.market_analysis.market_size}</p>
+        <p><strong>Market Size:</strong> ${marketAnalysis.market_size}</p>
         <h6>Growth Trends:</h6>
-        <ul>${plan.market_analysis.growth_trends.map(x => `<li>${x}</li>`).join('')}</ul>
+        <ul>${marketAnalysis.growth_trends.map(x => `<li>${x}</li>`).join('')}</ul>
         <h6>Competitors:</h6>
-        <ul>${plan.market_analysis.competitors.map(x => `<li>${x}</li>`).join('')}</ul>
+        <ul>${marketAnalysis.competitors.map(x => `<li>${x}</li>`).join('')}</ul>
     `;
     const marketContainer = document.getElementById('market-analysis-text');
     marketContainer.innerHTML = marketHtml;
     addChatButton(
         marketContainer.closest('.card').querySelector('.card-title'),
         "Market Analysis",
-        () => `Market Size: ${plan.market_analysis.market_size}\nTrends: ${plan.market_analysis.growth_trends.join(', ')}\nCompetitors: ${plan.market_analysis.competitors.join(', ')}`
+        () => `Market Size: ${marketAnalysis.market_size}\nTrends: ${marketAnalysis.growth_trends.join(', ')}\nCompetitors: ${marketAnalysis.competitors.join(', ')}`
     );
 
+    // Risks
+    populateList('risk-list', marketAnalysis.risks);
+    addChatButton(
+        document.getElementById('risk-list').previousElementSibling, // h5 alert heading
+        "Risks",
+        () => marketAnalysis.risks.join('\n')
+    );
+}
+
+function renderKpis(kpis) {
     // KPIs
     const kpiContainer = document.getElementById('kpi-container');
-    plan.kpis.forEach(kpi => {
+    kpis.forEach(kpi => {
         const div = document.createElement('div');
         div.className = 'mb-3 pb-2 border-bottom border-secondary';
         div.innerHTML = `
@@ -97,22 +167,16 @@ function renderDashboard(data) {
     addChatButton(
         kpiContainer.closest('.card').querySelector('.card-title'),
         "KPIs",
-        () => JSON.stringify(plan.kpis, null, 2)
-    );
-
-    // Risks & Recommendations
-    populateList('risk-list', plan.market_analysis.risks);
-    addChatButton(
-        document.getElementById('risk-list').previousElementSibling, // h5 alert heading
-        "Risks",
-        () => plan.market_analysis.risks.join('\n')
+        () => JSON.stringify(kpis, null, 2)
     );
+}
 
-    document.getElementById('recommendations-text').innerHTML = marked.parse(plan.recommendations);
+function renderRecommendations(recommendations) {
+    document.getElementById('recommendations-text').innerHTML = marked.parse(recommendations);
     addChatButton(
         document.getElementById('recommendations-text').previousElementSibling,
         "Recommendations",
-        () => plan.recommendations
+        () => recommendations
     );
 }
 
@@ -242,7 +306,7 @@ async function sendChatMessage() {
     // Save to local cache
     chatHistoryMap[topic] = chatHistoryDiv.innerHTML;
 
-    // 2. Add Loading Bubble
+    // 2. Add Loading Bubble (replaced by streamed tokens as they arrive)
     const loadingId = 'chat-loading-' + Date.now();
     chatHistoryDiv.innerHTML += `<div id="${loadingId}" class="message-bubble ai-msg me-auto"><span class="spinner-border spinner-border-sm" role="status"></span> Thinking...</div>`;
     chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
@@ -251,7 +315,7 @@ async function sendChatMessage() {
         const urlParams = new URLSearchParams(window.location.search);
         const sessionId = urlParams.get('session_id');
 
-        const response = await fetch('/api/assistant/chat', {
+        const response = await fetch('/api/assistant/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -262,23 +326,17 @@ async function sendChatMessage() {
             })
         });
 
-        const data = await response.json();
-
-        // Remove loading
-        document.getElementById(loadingId).remove();
-
-        if (response.ok) {
-            // Add AI Message
-            let replyHtml = data.reply;
-            if (typeof marked !== 'undefined') replyHtml = marked.parse(replyHtml);
-
-            chatHistoryDiv.innerHTML += `<div class="message-bubble ai-msg me-auto">${replyHtml}</div>`;
-        } else {
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            document.getElementById(loadingId).remove();
             chatHistoryDiv.innerHTML += `<div class="message-bubble ai-msg me-auto text-danger">Error: ${data.detail || 'Unknown error'}</div>`;
+        } else {
+            await readChatStream(response, loadingId, chatHistoryDiv);
         }
 
     } catch (e) {
-        document.getElementById(loadingId).remove();
+        const bubble = document.getElementById(loadingId);
+        if (bubble) bubble.remove();
         chatHistoryDiv.innerHTML += `<div class="message-bubble ai-msg me-auto text-danger">Network Error: ${e.message}</div>`;
     }
 
@@ -286,3 +344,50 @@ async function sendChatMessage() {
     chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
     chatHistoryMap[topic] = chatHistoryDiv.innerHTML;
 }
+
+// Read Server-Sent Events from a streaming fetch response and render tokens as they arrive
+async function readChatStream(response, bubbleId, chatHistoryDiv) {
+    const bubble = document.getElementById(bubbleId);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyText = '';
+
+    const render = (markdown) => {
+        bubble.innerHTML = (typeof marked !== 'undefined') ? marked.parse(markdown) : markdown;
+        chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let eventName = 'message';
+            let dataLine = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) dataLine += line.slice(6);
+            });
+            if (!dataLine) continue;
+            const payload = JSON.parse(dataLine);
+
+            if (eventName === 'token') {
+                replyText += payload.text;
+                render(replyText);
+            } else if (eventName === 'done') {
+                render(payload.reply);
+            } else if (eventName === 'error') {
+                bubble.classList.add('text-danger');
+                bubble.innerText = `Error: ${payload.detail || 'Unknown error'}`;
+            }
+        }
+    }
+    bubble.removeAttribute('id');
+}
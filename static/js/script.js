@@ -116,21 +116,53 @@ async function handleClarification(answerText) {
 
     const data = await response.json();
 
-    if (data.status === 'complete') {
+    if (data.status === 'generating_plan') {
         addMessage(`
-            <i class="bi bi-check-circle-fill text-success me-2"></i>
-            <strong>Plan Generated Successfully!</strong>
-            <p>Redirecting you to your dashboard in a moment...</p>
+            <span class="spinner-border spinner-border-sm me-2" role="status"></span>
+            <strong>Generating your Business Plan...</strong>
+            <p class="small mt-2"><em>This can take a minute. You will be redirected when it is ready.</em></p>
         `, 'ai');
-
-        setTimeout(() => {
-            window.location.href = `/static/results.html?session_id=${sessionId}`;
-        }, 2000);
+        await waitForPlan();
+    } else if (data.status === 'complete') {
+        redirectToDashboard();
     } else {
         addMessage("Something unexpected happened. Status: " + data.status, 'ai');
     }
 }
 
+// Poll the dashboard endpoint until the background plan job finishes
+async function waitForPlan(intervalMs = 2000) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+
+        const response = await fetch(`/api/dashboard/${sessionId}`);
+        if (!response.ok) {
+            throw new Error(`API Error (${response.status}): ${response.statusText}`);
+        }
+
+        const data = await response.json();
+        if (data.status === 'complete') {
+            redirectToDashboard();
+            return;
+        }
+        if (data.status === 'error') {
+            throw new Error(data.error || "Plan generation failed");
+        }
+    }
+}
+
+function redirectToDashboard() {
+    addMessage(`
+        <i class="bi bi-check-circle-fill text-success me-2"></i>
+        <strong>Plan Generated Successfully!</strong>
+        <p>Redirecting you to your dashboard in a moment...</p>
+    `, 'ai');
+
+    setTimeout(() => {
+        window.location.href = `/static/results.html?session_id=${sessionId}`;
+    }, 2000);
+}
+
 function addMessage(html, sender) {
     const div = document.createElement('div');
     div.classList.add('message-bubble', sender === 'user' ? 'user-msg' : 'ai-msg');
@@ -3,6 +3,9 @@ import asyncio
 import uuid
 
 BASE_URL = "http://localhost:8000"
+# /api/idea/clarify returns 202; the dashboard is polled until the plan is done
+PLAN_POLL_SECONDS = 2
+PLAN_POLL_ATTEMPTS = 300
 
 async def test_workflow():
     print("--- Starting API Integration Test ---")
@@ -40,17 +43,27 @@ async def test_workflow():
             print(f"Failed Clarify: {e}")
             return
 
-        # 3. Get Dashboard Data
+        # 3. Get Dashboard Data (the plan is generated in the background)
         print("\n3. Testing /api/dashboard/{id}...")
         try:
-            resp = await client.get(f"{BASE_URL}/api/dashboard/{session_id}")
-            print(f"Status: {resp.status_code}")
-            dashboard = resp.json()
+            for _ in range(PLAN_POLL_ATTEMPTS):
+                resp = await client.get(f"{BASE_URL}/api/dashboard/{session_id}")
+                dashboard = resp.json()
+                sections = dashboard.get('section_status') or {}
+                done = sum(state != "pending" for state in sections.values())
+                print(f"Status: {resp.status_code} - {dashboard['status']} ({done}/{len(sections)} sections)")
+                if dashboard['status'] in ("complete", "error"):
+                    break
+                await asyncio.sleep(PLAN_POLL_SECONDS)
+
             if dashboard['plan']:
                 print("✅ Business Plan Generated Successfully!")
                 print(f"Executive Summary snippet: {dashboard['plan']['executive_summary'][:100]}...")
+            elif dashboard.get('partial_plan'):
+                print(f"⚠️ Partial Business Plan: {', '.join(dashboard['partial_plan'])}")
+                print(f"Section status: {sections}")
             else:
-                print("❌ Business Plan is empty.")
+                print(f"❌ Business Plan is empty. {dashboard.get('error') or ''}")
         except Exception as e:
             print(f"Failed Dashboard: {e}")
 
@@ -0,0 +1,249 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+
+def controller(**kwargs) -> AdmissionController:
+    kwargs.setdefault("max_concurrency", 1)
+    kwargs.setdefault("chat_reserved_slots", 0)
+    kwargs.setdefault("queue_size", 4)
+    kwargs.setdefault("max_wait", {"chat": 60, "clarification": 60, "plan": 600, "summary": 600})
+    ac = AdmissionController(**kwargs)
+    # Short service times, so estimated waits stay under the limits
+    ac.service_seconds = {kind: 0.1 for kind in ac.service_seconds}
+    return ac
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_grants_free_slot_and_releases_it():
+    async def scenario():
+        ac = controller()
+        ticket = ac.admit("chat", "s1")
+        assert ac.queued == 1
+        await ticket.acquire()
+        assert ticket.state == "running"
+        assert (ac.in_flight, ac.queued, ac.admitted) == (1, 0, 1)
+        ticket.release()
+        assert (ac.in_flight, ac.queued) == (0, 0)
+        assert ac._sessions == {}
+
+    run(scenario())
+
+
+def test_release_is_idempotent():
+    async def scenario():
+        ac = controller(max_concurrency=2)
+        first = ac.admit("chat", "s1")
+        second = ac.admit("chat", "s2")
+        await first.acquire()
+        await second.acquire()
+        first.release()
+        first.release()
+        assert ac.in_flight == 1
+        assert second.state == "running"
+        second.release()
+        assert (ac.in_flight, ac.queued) == (0, 0)
+
+    run(scenario())
+
+
+def test_waiting_requests_are_served_by_priority():
+    async def scenario():
+        ac = controller()
+        holder = ac.admit("plan", "p0", background=True)
+        await holder.acquire()
+
+        order = []
+
+        async def job(kind, session_id, background=False):
+            async with ac.admit(kind, session_id, background):
+                order.append(kind)
+
+        tasks = [asyncio.create_task(job("plan", "p1", True))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("clarification", "c1")))
+        tasks.append(asyncio.create_task(job("chat", "u1")))
+        await asyncio.sleep(0)
+        assert ac.queued == 3
+
+        holder.release()
+        await asyncio.gather(*tasks)
+        assert order == ["chat", "clarification", "plan"]
+
+    run(scenario())
+
+
+def test_aging_lets_a_long_waiting_request_go_first():
+    async def scenario():
+        ac = controller(aging_seconds=0.01)
+        holder = ac.admit("chat", "h")
+        await holder.acquire()
+        plan = ac.admit("plan", "p", background=True)
+        plan_task = asyncio.create_task(plan.acquire())
+        await asyncio.sleep(0.05)  # ages the plan past priority 0
+        chat = ac.admit("chat", "c")
+        chat_task = asyncio.create_task(chat.acquire())
+        await asyncio.sleep(0)
+
+        holder.release()
+        await plan_task
+        assert (plan.state, chat.state) == ("running", "queued")
+        plan.release()
+        await chat_task
+        chat.release()
+
+    run(scenario())
+
+
+def test_chat_reserved_slot_is_not_given_to_plans():
+    async def scenario():
+        ac = controller(max_concurrency=2, chat_reserved_slots=1)
+        plan = ac.admit("plan", "p1", background=True)
+        await plan.acquire()
+        waiting = ac.admit("plan", "p2", background=True)
+        waiting_task = asyncio.create_task(waiting.acquire())
+        await asyncio.sleep(0)
+        assert waiting.state == "queued"
+
+        async with ac.admit("chat", "u1") as chat:
+            assert chat.state == "running"
+
+        plan.release()
+        await waiting_task
+        waiting.release()
+
+    run(scenario())
+
+
+def test_busy_session_is_rejected():
+    ac = controller()
+    ac.admit("chat", "s1")
+    with pytest.raises(AdmissionRejected) as rejected:
+        ac.admit("chat", "s1")
+    assert rejected.value.reason == "session_busy"
+    assert rejected.value.retry_after >= 1
+    assert ac.rejected == {"session_busy": 1}
+
+
+def test_full_queue_is_rejected():
+    ac = controller(queue_size=2)
+    ac.admit("chat", "a")
+    ac.admit("chat", "b")
+    with pytest.raises(AdmissionRejected) as rejected:
+        ac.admit("chat", "c")
+    assert rejected.value.reason == "queue_full"
+    assert ac.queued == 2
+
+
+def test_estimated_wait_over_the_limit_is_rejected():
+    async def scenario():
+        ac = controller(max_wait={"chat": 5, "clarification": 5, "plan": 600, "summary": 600})
+        ac.service_seconds["plan"] = 100.0
+        plan = ac.admit("plan", "p", background=True)
+        await plan.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            ac.admit("clarification", "c")
+        assert rejected.value.reason == "overloaded"
+        assert rejected.value.retry_after == 95
+        plan.release()
+
+    run(scenario())
+
+
+def test_timeout_while_queued_releases_the_reservation():
+    async def scenario():
+        ac = controller(max_wait={"chat": 0.05, "clarification": 60, "plan": 600, "summary": 600})
+        ac.service_seconds["plan"] = 0.0
+        plan = ac.admit("plan", "p", background=True)
+        await plan.acquire()
+        chat = ac.admit("chat", "c")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await chat.acquire()
+        assert rejected.value.reason == "timeout"
+        assert chat.state == "done"
+        assert (ac.in_flight, ac.queued) == (1, 0)
+        assert "c" not in ac._sessions
+        plan.release()
+
+    run(scenario())
+
+
+def test_cancelled_wait_releases_the_reservation():
+    async def scenario():
+        ac = controller()
+        holder = ac.admit("plan", "p", background=True)
+        await holder.acquire()
+        chat = ac.admit("chat", "c")
+        waiter = asyncio.create_task(chat.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert chat.state == "done"
+        assert (ac.in_flight, ac.queued) == (1, 0)
+        holder.release()
+        assert ac.in_flight == 0
+
+    run(scenario())
+
+
+def test_background_ticket_claims_its_session_only_when_running():
+    async def scenario():
+        ac = controller(max_concurrency=2)
+        plan = ac.admit("plan", "s1", background=True)
+        # The session's chat still works while the plan job prepares
+        chat = ac.admit("chat", "s1")
+        with pytest.raises(AdmissionRejected):
+            ac.admit("clarification", "s1")
+
+        await chat.acquire()
+        plan_task = asyncio.create_task(plan.acquire())
+        await asyncio.sleep(0)
+        assert plan.state == "queued"  # waits for the chat turn
+
+        chat.release()
+        await plan_task
+        assert plan.state == "running"
+        with pytest.raises(AdmissionRejected):
+            ac.admit("chat", "s1")
+        plan.release()
+        ac.admit("chat", "s1").release()
+
+    run(scenario())
+
+
+def test_stream_releases_its_ticket_when_the_client_disconnects():
+    from starlette.requests import ClientDisconnect
+
+    from app.main import _AdmittedStream
+
+    async def scenario():
+        ac = controller()
+        ticket = ac.admit("chat", "s1")
+        await ticket.acquire()
+
+        async def body():
+            yield "event: token\n\n"
+            yield "event: done\n\n"
+
+        async def receive():
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                raise OSError("client went away")
+
+        response = _AdmittedStream(body(), ticket, media_type="text/event-stream")
+        with pytest.raises((OSError, ClientDisconnect)):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        assert ticket.state == "done"
+        assert (ac.in_flight, ac.queued) == (0, 0)
+        assert ac._sessions == {}
+
+    run(scenario())
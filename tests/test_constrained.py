@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from app.constrained import COMPLETE, MAX_WHITESPACE, JsonMatcher, JsonSchema
+from app.llm_service import JSON_SCHEMAS
+
+ITEM = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "count": {"type": "integer"},
+        "score": {"anyOf": [{"type": "number"}, {"type": "null"}]},
+        "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 2},
+    },
+    "required": ["name", "count"],
+}
+
+
+def advance(schema, text):
+    compiled = JsonSchema(schema)
+    return JsonMatcher(compiled).advance(compiled.initial_state(), text.encode("utf-8"))
+
+
+def matches(schema, text) -> bool:
+    return advance(schema, text) == COMPLETE
+
+
+def accepts_prefix(schema, text) -> bool:
+    return advance(schema, text) is not None
+
+
+@pytest.mark.parametrize("text", [
+    '{"name": "a", "count": 1}',
+    '{"name": "a", "count": -20, "score": 0.5}',
+    '{"name": "a", "count": 0, "score": null, "tags": ["x", "y"]}',
+    '{"name": "a", "count": 3, "tags": []}',
+    '{"name": "esc \\" \\\\ \\u00e9", "count": 1}',
+    '{"name": "a", "count": 1, "score": 1.5e-3}',
+    '  {\n  "name" : "a" ,\n  "count" : 2\n}',
+])
+def test_accepts_matching_objects(text):
+    assert matches(ITEM, text)
+
+
+@pytest.mark.parametrize("text", [
+    '{"count": 1, "name": "a"}',           # properties out of schema order
+    '{"name": "a"}',                       # missing required property
+    '{"name": "a", "count": 1.5}',         # float for an integer
+    '{"name": 1, "count": 1}',             # number for a string
+    '{"name": "a", "count": 1, "x": 1}',   # unknown key
+    '{"name": "a", "count": 1, "tags": ["x", "y", "z"]}',  # too many items
+    '{"name": "a", "count": 01}',          # leading zero
+    '{"name": "a\x01", "count": 1}',       # control character in a string
+    '{"name": "a", "count": 1,}',          # trailing comma
+])
+def test_rejects_invalid_objects(text):
+    assert not matches(ITEM, text)
+
+
+def test_prefixes_of_valid_output_stay_alive():
+    text = '{"name": "a", "count": 12, "tags": ["x"]}'
+    for end in range(len(text)):
+        assert accepts_prefix(ITEM, text[:end]), text[:end]
+    assert matches(ITEM, text)
+
+
+def test_nothing_is_accepted_after_the_value():
+    assert not accepts_prefix(ITEM, '{"name": "a", "count": 1} ')
+
+
+def test_whitespace_runs_are_bounded():
+    assert accepts_prefix(ITEM, "{" + " " * MAX_WHITESPACE)
+    assert not accepts_prefix(ITEM, "{" + " " * (MAX_WHITESPACE + 1))
+
+
+def test_properties_without_required_list_are_optional():
+    schema = {"type": "object", "properties": {"a": {"type": "string"}, "b": {"type": "integer"}}}
+    assert matches(schema, "{}")
+    assert matches(schema, '{"b": 1}')
+    assert matches(schema, '{"a": "x", "b": 1}')
+
+
+def test_array_item_bounds():
+    schema = {"type": "array", "items": {"type": "boolean"}, "minItems": 1, "maxItems": 2}
+    assert matches(schema, "[true]")
+    assert matches(schema, "[true, false]")
+    assert not matches(schema, "[]")
+    assert not accepts_prefix(schema, "[true, false, ")
+
+
+def test_free_form_values():
+    schema = {"type": "object", "properties": {"extra": {}}, "required": ["extra"]}
+    assert matches(schema, '{"extra": {"any": [1, "two", null, {"k": false}]}}')
+
+
+def test_refs_are_resolved():
+    schema = {
+        "type": "object",
+        "properties": {"item": {"$ref": "#/$defs/Item"}},
+        "required": ["item"],
+        "$defs": {"Item": ITEM},
+    }
+    assert matches(schema, '{"item": {"name": "a", "count": 1}}')
+    assert not matches(schema, '{"item": {"name": "a"}}')
+
+
+def test_clarification_questions_schema():
+    compiled = JSON_SCHEMAS["clarification_questions"]
+    matcher = JsonMatcher(compiled)
+    question = {"question_id": "q1", "question_text": "Who buys it?", "context": None}
+
+    three = json.dumps([question] * 3).encode("utf-8")
+    two = json.dumps([question] * 2).encode("utf-8")
+    assert matcher.advance(compiled.initial_state(), three) == COMPLETE
+    assert matcher.advance(compiled.initial_state(), two) is None
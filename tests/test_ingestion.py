@@ -0,0 +1,81 @@
+import os
+
+from app.ingestion import IngestionManifest, chunk_id, file_sha256
+
+
+def write(path, content: bytes, mtime=None):
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def recorded(manifest, path, ids):
+    manifest.record(os.path.abspath(path), file_sha256(path), ids)
+
+
+def test_chunk_ids_are_deterministic():
+    assert chunk_id("ab" * 32, 7) == chunk_id("ab" * 32, 7) == "ab" * 16 + "-00007"
+    assert chunk_id("ab" * 32, 7) != chunk_id("ab" * 32, 8)
+
+
+def test_plan_new_unchanged_changed_and_removed(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    same = write(tmp_path / "same.pdf", b"same", mtime=1000)
+    changed = write(tmp_path / "changed.pdf", b"before", mtime=1000)
+    gone = write(tmp_path / "gone.pdf", b"gone")
+    for path in (same, changed, gone):
+        recorded(manifest, path, [f"{os.path.basename(path)}-0"])
+    os.remove(gone)
+    write(tmp_path / "changed.pdf", b"after!", mtime=2000)
+    new = write(tmp_path / "new.pdf", b"new")
+
+    to_ingest, removed, unchanged = manifest.plan([same, changed, new])
+    assert to_ingest == [
+        (os.path.abspath(changed), file_sha256(changed)),
+        (os.path.abspath(new), file_sha256(new)),
+    ]
+    assert removed == [os.path.abspath(gone)]
+    assert unchanged == [os.path.abspath(same)]
+
+
+def test_touched_file_with_same_content_is_unchanged(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    path = write(tmp_path / "doc.pdf", b"content", mtime=1000)
+    recorded(manifest, path, ["id-0"])
+    os.utime(path, (5000, 5000))
+
+    to_ingest, removed, unchanged = manifest.plan([path])
+    assert (to_ingest, removed, unchanged) == ([], [], [os.path.abspath(path)])
+    # The stat info is refreshed, so the next plan skips hashing
+    assert manifest.files[os.path.abspath(path)]["mtime"] == 5000
+
+
+def test_save_and_reload(tmp_path):
+    manifest_path = str(tmp_path / "store" / "manifest.json")
+    manifest = IngestionManifest(manifest_path)
+    assert not manifest.exists
+    path = write(tmp_path / "doc.pdf", b"content")
+    recorded(manifest, path, ["id-0", "id-1"])
+    manifest.save()
+
+    reloaded = IngestionManifest(manifest_path)
+    assert reloaded.exists
+    assert reloaded.files == manifest.files
+    assert reloaded.plan([path]) == ([], [], [os.path.abspath(path)])
+    assert not os.path.exists(manifest_path + ".tmp")
+
+
+def test_forget_keeps_chunk_ids_shared_with_other_files(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    first = write(tmp_path / "a.pdf", b"identical")
+    copy = write(tmp_path / "b.pdf", b"identical")
+    other = write(tmp_path / "c.pdf", b"other")
+    recorded(manifest, first, ["x-0", "x-1"])
+    recorded(manifest, copy, ["x-0", "x-1"])
+    recorded(manifest, other, ["y-0"])
+
+    assert manifest.forget(os.path.abspath(first)) == []
+    assert manifest.forget(os.path.abspath(copy)) == ["x-0", "x-1"]
+    assert manifest.forget(os.path.abspath(copy)) == []
+    assert list(manifest.files) == [os.path.abspath(other)]
@@ -0,0 +1,65 @@
+from app.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def index_of(docs):
+    index = BM25Index()
+    for doc_id, text in docs.items():
+        index.add(doc_id, text)
+    return index
+
+
+DOCS = {
+    "cac": "Customer acquisition cost (CAC) and LTV for subscription coffee",
+    "tam": "TAM/SAM estimates: the market grew 3.5% in 2025",
+    "ops": "Delivery routes, couriers and packaging costs",
+}
+
+
+def test_tokenize_keeps_figures_and_splits_acronyms():
+    assert tokenize("The TAM/SAM grew 3.5% in 2025, with 1,200 users") == [
+        "tam", "sam", "grew", "3.5%", "2025", "1,200", "users",
+    ]
+
+
+def test_search_ranks_exact_terms_first():
+    index = index_of(DOCS)
+    assert [doc_id for doc_id, _ in index.search("CAC LTV", k=3)] == ["cac"]
+    assert index.search("3.5% market", k=1)[0][0] == "tam"
+    assert index.search("the of and", k=3) == []
+    assert index.search("unrelated", k=3) == []
+
+
+def test_rarer_terms_score_higher():
+    index = index_of({"a": "coffee beans", "b": "coffee cups", "c": "coffee roaster"})
+    scores = dict(index.search("coffee roaster", k=3))
+    assert scores["c"] > scores["a"] == scores["b"]
+
+
+def test_remove_and_replace():
+    index = index_of(DOCS)
+    index.remove(["cac", "missing"])
+    assert len(index) == 2
+    assert index.search("CAC", k=3) == []
+    index.add("tam", "couriers only")
+    assert len(index) == 2
+    assert {doc_id for doc_id, _ in index.search("couriers", k=3)} == {"tam", "ops"}
+    assert index.search("2025", k=3) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = index_of(DOCS)
+    index.remove(["ops"])
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 2
+    assert loaded.search("CAC subscription", k=3) == index.search("CAC subscription", k=3)
+    assert len(BM25Index.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert dict(fused)["b"] == 1 / 62 + 1 / 61
+    assert reciprocal_rank_fusion([]) == []
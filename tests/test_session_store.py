@@ -0,0 +1,120 @@
+import sqlite3
+
+import pytest
+
+from app.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_session_round_trip(store):
+    store.create_session("s1", "coffee delivery")
+    assert store.exists("s1")
+    assert not store.exists("missing")
+    assert store.get_session("missing") is None
+
+    store.update_session("s1", status="generating_plan", clarifications_needed=[{"question_id": "q1"}])
+    store.update_answers("s1", {"q1": "students"})
+    store.update_answers("s1", {"q1": "remote workers", "q2": "$20"})
+    session = store.get_session("s1")
+    assert session["idea"] == "coffee delivery"
+    assert session["status"] == "generating_plan"
+    assert session["clarifications_needed"] == [{"question_id": "q1"}]
+    assert session["answers"] == {"q1": "remote workers", "q2": "$20"}
+    assert session["plan"] is None
+    assert session["section_status"] == {}
+
+
+def test_plan_sections(store):
+    store.create_session("s1", "idea")
+    store.set_plan_section("s1", "kpis", [{"name": "CAC"}])
+    store.update_session("s1", section_status={"kpis": "complete"})
+    session = store.get_session("s1")
+    assert session["plan"] == {"kpis": [{"name": "CAC"}]}
+    assert session["section_status"] == {"kpis": "complete"}
+
+    store.set_plan("s1", {"kpis": [], "executive_summary": "x"})
+    assert store.get_session("s1")["plan"] == {"kpis": [], "executive_summary": "x"}
+    store.clear_plan("s1")
+    assert store.get_session("s1")["plan"] is None
+
+
+def test_recreating_a_session_resets_it(store):
+    store.create_session("s1", "first")
+    store.update_answers("s1", {"q1": "a"})
+    store.append_chat_messages("s1", "kpis", [{"role": "user", "content": "hi"}])
+    store.create_session("s1", "second")
+    session = store.get_session("s1")
+    assert (session["idea"], session["answers"]) == ("second", {})
+    assert store.get_chat_history("s1", "kpis") == []
+
+
+def test_chat_history_fold(store):
+    store.create_session("s1", "idea")
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": str(i)} for i in range(6)]
+    store.append_chat_messages("s1", "kpis", messages)
+    assert store.get_chat_history("s1", "kpis") == messages
+    assert store.get_chat_summary("s1", "kpis") == ""
+
+    store.fold_chat_history("s1", "kpis", "summary of 0-3", 4)
+    assert store.get_chat_history("s1", "kpis") == messages[4:]
+    assert store.get_chat_summary("s1", "kpis") == "summary of 0-3"
+    assert store.get_chat_history("s1", "other") == []
+
+
+def test_unknown_fields_and_sessions_are_rejected(store):
+    store.create_session("s1", "idea")
+    with pytest.raises(ValueError):
+        store.update_session("s1", plan={})
+    with pytest.raises(KeyError):
+        store.update_session("missing", status="complete")
+
+
+def test_expired_sessions_are_gone(store):
+    store.ttl_seconds = 1e-9
+    store.create_session("s1", "idea")
+    assert store.get_session("s1") is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_entries=2)
+    store.create_session("a", "idea")
+    store.create_session("b", "idea")
+    store.get_session("a")
+    store.create_session("c", "idea")
+    assert store.exists("a") and store.exists("c")
+    assert not store.exists("b")
+    assert store.evictions == 1
+
+
+def test_sqlite_store_migrates_an_old_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, idea TEXT NOT NULL, status TEXT NOT NULL, "
+        "error TEXT, clarifications_needed TEXT NOT NULL DEFAULT '[]', updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO sessions VALUES ('old', 'idea', 'complete', NULL, '[]', strftime('%s', 'now'))"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path)
+    session = store.get_session("old")
+    assert (session["status"], session["section_status"]) == ("complete", {})
+    store.update_session("old", section_status={"kpis": "complete"})
+    assert store.get_session("old")["section_status"] == {"kpis": "complete"}
+    # Migrating twice is a no-op
+    SQLiteSessionStore(path)
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    SQLiteSessionStore(path).create_session("s1", "idea")
+    assert SQLiteSessionStore(path).get_session("s1")["idea"] == "idea"